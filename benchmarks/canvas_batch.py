@@ -0,0 +1,40 @@
+"""Compare drawing a Layout with batched Tcl scripts and with one call per
+canvas item.
+
+Run from the repository root with `python -m benchmarks.canvas_batch`,
+a display is needed to create the canvas.
+"""
+import timeit
+import tkinter as tk
+
+from ffx_sphere_grid_viewer.data.layout import LayoutType, get_layout
+from ffx_sphere_grid_viewer.tkspheregrid import TkSphereGrid
+
+
+def report(label: str, per_item: float, batched: float) -> None:
+    print(f'{label:<12} per item {per_item * 1000:8.3f} ms   '
+          f'batched {batched * 1000:8.3f} ms   '
+          f'speedup {per_item / batched:5.1f}x')
+
+
+def main(repeat: int = 10) -> None:
+    root = tk.Tk()
+    root.withdraw()
+    canvas = TkSphereGrid(root)
+
+    def best(layout, batch_items: bool) -> float:
+        canvas.batch_items = batch_items
+        return min(timeit.repeat(lambda: canvas.draw_layout(layout),
+                                 number=1, repeat=repeat))
+
+    for layout_type in LayoutType:
+        layout = get_layout(layout_type)
+        # the label placements are cached after the first draw
+        canvas.draw_layout(layout)
+        report(layout_type.name.lower(), best(layout, False),
+               best(layout, True))
+    root.destroy()
+
+
+if __name__ == '__main__':
+    main()
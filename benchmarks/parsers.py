@@ -0,0 +1,189 @@
+"""Compare the struct based parsers with the previous per-byte parsers.
+
+Run from the repository root with `python -m benchmarks.parsers`.
+
+The `.dat`/`.bin` game files are not shipped, so they are rebuilt from the
+`.csv` files into a temporary folder before timing.
+"""
+import os
+import tempfile
+import timeit
+from itertools import islice
+
+from ffx_sphere_grid_viewer.data.cluster import CLUSTER_LENGTH, Cluster
+from ffx_sphere_grid_viewer.data.content import (get_node_contents,
+                                                 parse_node_contents_dat)
+from ffx_sphere_grid_viewer.data.layout import (LAYOUT_FILES, Layout,
+                                                parse_layout_dat)
+from ffx_sphere_grid_viewer.data.link import LINK_LENGTH, Link
+from ffx_sphere_grid_viewer.data.node import NODE_LENGTH, Node
+from ffx_sphere_grid_viewer.data.node_types import (NODE_TYPE_STRUCT,
+                                                    NODETYPE_COLORS,
+                                                    AppearanceType, NodeType,
+                                                    get_node_types,
+                                                    parse_panel_bin)
+from ffx_sphere_grid_viewer.data.svg import get_appearances
+from ffx_sphere_grid_viewer.data.text_characters import (TEXT_CHARACTERS_FILE,
+                                                         get_text_characters)
+from ffx_sphere_grid_viewer.data.utils import (get_resource_path,
+                                               hex_csv_to_bytes, open_cp1252)
+
+
+def read_hex_csv(file_path: str) -> bytes:
+    with open_cp1252(get_resource_path(file_path)) as file_object:
+        return hex_csv_to_bytes(file_object.read())
+
+
+def write_game_files(directory: str) -> None:
+    for layout_file, node_contents_file in LAYOUT_FILES.values():
+        clusters = read_hex_csv(f'data_files/clusters_{layout_file}.csv')
+        nodes = read_hex_csv(f'data_files/nodes_{layout_file}.csv')
+        links = read_hex_csv(f'data_files/links_{layout_file}.csv')
+        header = bytearray(16)
+        header[2:4] = (len(clusters) // CLUSTER_LENGTH).to_bytes(2, 'little')
+        header[4:6] = (len(nodes) // NODE_LENGTH).to_bytes(2, 'little')
+        header[6:8] = (len(links) // LINK_LENGTH).to_bytes(2, 'little')
+        with open(os.path.join(directory, f'{layout_file}.dat'), 'wb') as f:
+            f.write(header + clusters + nodes + links)
+        node_contents = read_hex_csv(f'data_files/{node_contents_file}.csv')
+        with open(os.path.join(directory, f'{node_contents_file}.dat'),
+                  'wb') as f:
+            f.write(bytes(8) + node_contents)
+
+    with open_cp1252(get_resource_path('data_files/panel.csv')) as f:
+        *node_type_lines, string_line = f.read().splitlines()
+    node_types = hex_csv_to_bytes('\n'.join(node_type_lines))
+    header = bytearray(20)
+    header[10:12] = (len(node_type_lines) - 1).to_bytes(2, 'little')
+    header[12:14] = NODE_TYPE_STRUCT.size.to_bytes(2, 'little')
+    header[14:16] = len(node_types).to_bytes(2, 'little')
+    with open(os.path.join(directory, 'panel.bin'), 'wb') as f:
+        f.write(header + node_types + hex_csv_to_bytes(string_line))
+
+
+# previous implementation, kept here as the baseline
+def legacy_add_bytes(*values: int) -> int:
+    value = 0
+    for position, byte in enumerate(values):
+        value += byte * (256 ** position)
+    return value
+
+
+def legacy_s16(integer: int) -> int:
+    return ((integer & 0xffff) ^ 0x8000) - 0x8000
+
+
+def legacy_bytes_to_string(data: list[int], offset: int) -> str:
+    text_characters = get_text_characters(TEXT_CHARACTERS_FILE)
+    string = ''
+    for byte in islice(data, offset, None):
+        if byte == 0:
+            break
+        string += text_characters.get(byte, f'[0x{byte:x}]')
+    return string
+
+
+def legacy_parse_panel_bin(file_path: str) -> list[NodeType]:
+    with open(file_path, mode='rb') as file_object:
+        data = list(file_object.read())
+    min_index = legacy_add_bytes(*data[8:10])
+    max_index = legacy_add_bytes(*data[10:12])
+    node_type_length = legacy_add_bytes(*data[12:14])
+    total_length = legacy_add_bytes(*data[14:16])
+    data_bytes = data[20:20+total_length]
+    string_data = data[20+total_length:]
+    node_types = []
+    start = 0
+    for _ in range(max_index + 1 - min_index):
+        d = data_bytes[start:start + node_type_length]
+        start += node_type_length
+        name = legacy_bytes_to_string(string_data, legacy_add_bytes(*d[:2]))
+        dash = legacy_bytes_to_string(string_data, legacy_add_bytes(*d[4:6]))
+        description = legacy_bytes_to_string(
+            string_data, legacy_add_bytes(*d[8:10]))
+        other_text = legacy_bytes_to_string(
+            string_data, legacy_add_bytes(*d[12:14]))
+        appearance_type = AppearanceType(legacy_add_bytes(*d[22:24]))
+        node_types.append(NodeType(
+            legacy_add_bytes(*d[16:18]), legacy_add_bytes(*d[18:20]),
+            legacy_add_bytes(*d[20:22]), appearance_type, name, dash,
+            description, other_text, name, NODETYPE_COLORS[appearance_type],
+            get_appearances()[appearance_type]))
+    return node_types
+
+
+def legacy_parse_node_contents_dat(file_path: str) -> list[NodeType | None]:
+    with open(file_path, mode='rb') as file_object:
+        data = list(file_object.read())
+    node_types = get_node_types()
+    return [node_types[i] if i < len(node_types) else None for i in data[8:]]
+
+
+def legacy_parse_layout_dat(file_path: str,
+                            node_contents: list[NodeType],
+                            ) -> Layout:
+    with open(file_path, mode='rb') as file_object:
+        data = list(file_object.read())
+    node_types = get_node_types()
+    start = 16
+    clusters = []
+    for _ in range(legacy_add_bytes(*data[2:4])):
+        d = data[start:start + CLUSTER_LENGTH]
+        start += CLUSTER_LENGTH
+        clusters.append(Cluster(legacy_s16(legacy_add_bytes(*d[:2])),
+                                legacy_s16(legacy_add_bytes(*d[2:4])),
+                                legacy_add_bytes(*d[6:8])))
+    nodes = []
+    for _ in range(legacy_add_bytes(*data[4:6])):
+        d = data[start:start + NODE_LENGTH]
+        start += NODE_LENGTH
+        index = legacy_add_bytes(*d[6:8])
+        nodes.append(Node(legacy_s16(legacy_add_bytes(*d[:2])),
+                          legacy_s16(legacy_add_bytes(*d[2:4])),
+                          node_types[index] if index < len(node_types)
+                          else None,
+                          clusters[legacy_add_bytes(*d[8:10])]))
+    for node, content in zip(nodes, node_contents):
+        node.content = content
+    links = []
+    for _ in range(legacy_add_bytes(*data[6:8])):
+        d = data[start:start + LINK_LENGTH]
+        start += LINK_LENGTH
+        anchor_node_index = legacy_add_bytes(*d[4:6])
+        links.append(Link(
+            nodes[legacy_add_bytes(*d[:2])], nodes[legacy_add_bytes(*d[2:4])],
+            None if anchor_node_index == 0xffff else nodes[anchor_node_index]))
+    return Layout(clusters, nodes, links)
+
+
+def report(label: str, legacy: float, current: float) -> None:
+    print(f'{label:<12} legacy {legacy * 1000:8.3f} ms   '
+          f'struct {current * 1000:8.3f} ms   '
+          f'speedup {legacy / current:5.1f}x')
+
+
+def main(repeat: int = 20) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        write_game_files(directory)
+
+        def best(func, *args) -> float:
+            return min(timeit.repeat(lambda: func(*args), number=1,
+                                     repeat=repeat))
+
+        panel_path = os.path.join(directory, 'panel.bin')
+        report('panel.bin', best(legacy_parse_panel_bin, panel_path),
+               best(parse_panel_bin, panel_path))
+        for layout_file, node_contents_file in LAYOUT_FILES.values():
+            path = os.path.join(directory, f'{node_contents_file}.dat')
+            report(f'{node_contents_file}.dat',
+                   best(legacy_parse_node_contents_dat, path),
+                   best(parse_node_contents_dat, path))
+            node_contents = get_node_contents(node_contents_file)
+            path = os.path.join(directory, f'{layout_file}.dat')
+            report(f'{layout_file}.dat',
+                   best(legacy_parse_layout_dat, path, node_contents),
+                   best(parse_layout_dat, path, node_contents))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,20 @@
+import argparse
+
 from ffx_sphere_grid_viewer.logger import setup_main_logger
 from ffx_sphere_grid_viewer.main import main
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument(
+        '--tiled', action='store_true',
+        help='show the Sphere Grid as pre-rendered image tiles')
+    mode.add_argument(
+        '--virtual', action='store_true',
+        help='only create the canvas items near the visible area')
+    parser.add_argument(
+        '--profile', action='store_true',
+        help='time the main operations, the profile is saved on exit')
+    args = parser.parse_args()
     setup_main_logger()
-    main()
+    main(tiled=args.tiled, virtual=args.virtual, profile=args.profile)
@@ -0,0 +1,16 @@
+from collections.abc import Iterable, Iterator
+
+
+def iter_bits(bitset: int) -> Iterator[int]:
+    """Yield the indexes of the bits set in `bitset`, lowest first."""
+    while bitset:
+        low_bit = bitset & -bitset
+        yield low_bit.bit_length() - 1
+        bitset ^= low_bit
+
+
+def to_bitset(indexes: Iterable[int]) -> int:
+    bitset = 0
+    for index in indexes:
+        bitset |= 1 << index
+    return bitset
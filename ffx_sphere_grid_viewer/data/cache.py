@@ -0,0 +1,94 @@
+import hashlib
+import mmap
+import os
+import struct
+from collections.abc import Callable
+from logging import getLogger
+
+from .utils import get_resource_path
+
+
+def get_inputs_digest(file_paths: list[str]) -> bytes:
+    """Hash the name and contents of every input file.
+
+    Missing files are hashed too, so that switching between the `.dat`
+    files and the `.csv` fallbacks invalidates the cache.
+    """
+    digest = hashlib.sha256(CACHE_VERSION.to_bytes(2, 'little'))
+    for file_path in file_paths:
+        digest.update(file_path.encode() + b'\0')
+        try:
+            with open(get_resource_path(file_path), mode='rb') as file_object:
+                digest.update(file_object.read())
+        except FileNotFoundError:
+            digest.update(b'\0missing\0')
+    return digest.digest()
+
+
+def get_cache_directory() -> str:
+    """The cache folder next to the package folder, the same wherever
+    the program is run from.
+    """
+    package_directory = os.path.dirname(
+        os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(os.path.dirname(package_directory), CACHE_DIRECTORY)
+
+
+def get_cache_path(name: str) -> str:
+    return os.path.join(get_cache_directory(), f'{name}.bin')
+
+
+def read_cache(name: str, digest: bytes) -> memoryview | None:
+    try:
+        with open(get_cache_path(name), mode='rb') as file_object:
+            data = mmap.mmap(file_object.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    if len(data) < CACHE_HEADER_STRUCT.size:
+        return None
+    magic, version, cached_digest = CACHE_HEADER_STRUCT.unpack_from(data)
+    if (magic, version, cached_digest) != (CACHE_MAGIC, CACHE_VERSION, digest):
+        return None
+    return memoryview(data)[CACHE_HEADER_STRUCT.size:]
+
+
+def write_cache(name: str, digest: bytes, payload: bytes) -> None:
+    file_path = get_cache_path(name)
+    temporary_file_path = f'{file_path}.{os.getpid()}.tmp'
+    try:
+        os.makedirs(get_cache_directory(), exist_ok=True)
+        with open(temporary_file_path, mode='wb') as file_object:
+            file_object.write(CACHE_HEADER_STRUCT.pack(
+                CACHE_MAGIC, CACHE_VERSION, digest))
+            file_object.write(payload)
+        os.replace(temporary_file_path, file_path)
+    except OSError as error:
+        getLogger(__name__).warning(
+            f'Couldn\'t write cache file "{file_path}": {error}')
+
+
+def load_cached[T](name: str,
+                   input_files: list[str],
+                   parse: Callable[[], T],
+                   pack: Callable[[T], bytes],
+                   unpack: Callable[[memoryview], T],
+                   ) -> T:
+    """Load `name` from the cache, parsing and caching it if needed."""
+    digest = get_inputs_digest(input_files)
+    data = read_cache(name, digest)
+    if data is not None:
+        try:
+            return unpack(data)
+        except (struct.error, IndexError, ValueError) as error:
+            getLogger(__name__).warning(
+                f'Ignoring invalid cache file "{get_cache_path(name)}": '
+                f'{error}')
+    value = parse()
+    write_cache(name, digest, pack(value))
+    return value
+
+
+CACHE_DIRECTORY = 'ffx_sphere_grid_viewer_cache'
+CACHE_MAGIC = b'FFXC'
+CACHE_VERSION = 2
+CACHE_HEADER_STRUCT = struct.Struct('<4sH32s')
@@ -1,7 +1,6 @@
+import struct
 from dataclasses import dataclass
 
-from .utils import add_bytes, s16
-
 
 @dataclass
 class Cluster:
@@ -13,11 +12,14 @@ class Cluster:
         return f'Cluster @ ({self.x},{self.y})'
 
 
-def parse_cluster(data: list[int]) -> Cluster:
-    x = s16(add_bytes(*data[:2]))  # signed
-    y = s16(add_bytes(*data[2:4]))  # signed
-    maybe_type = add_bytes(*data[6:8])
-    return Cluster(x, y, maybe_type)
+def parse_cluster(data: bytes) -> Cluster:
+    # x and y are signed
+    return Cluster(*CLUSTER_STRUCT.unpack(data))
+
+
+def parse_clusters(data: bytes) -> list[Cluster]:
+    return [Cluster(*fields) for fields in CLUSTER_STRUCT.iter_unpack(data)]
 
 
-CLUSTER_LENGTH = 16
+CLUSTER_STRUCT = struct.Struct('<hh2xH8x')
+CLUSTER_LENGTH = CLUSTER_STRUCT.size
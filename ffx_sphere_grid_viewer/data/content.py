@@ -1,41 +1,63 @@
-from .node_types import NODE_TYPES, NodeType
-from .utils import get_resource_path, open_cp1252
+from functools import cache
 
+from ..profiler import profiled
+from .node_types import NodeType, get_node_types
+from .utils import get_resource_path, hex_csv_to_bytes, open_cp1252
 
-def parse_node_contents(node_contents_data: list[int],
+
+def parse_node_contents(node_contents_data: bytes,
                         ) -> list[NodeType | None]:
+    node_types = get_node_types()
     node_contents = []
     for i in node_contents_data:
-        if i >= len(NODE_TYPES):
+        if i >= len(node_types):
             node_contents.append(None)
         else:
-            node_contents.append(NODE_TYPES[i])
+            node_contents.append(node_types[i])
     return node_contents
 
 
-def parse_node_contents_dat(file_path: str) -> list[NodeType | None]:
+def read_node_contents_dat(file_path: str) -> bytes:
     with open(get_resource_path(file_path), mode='rb') as file_object:
-        data = list(file_object.read())
-    return parse_node_contents(data[8:])
+        data = memoryview(file_object.read())
+    return data[NODE_CONTENTS_HEADER_LENGTH:]
 
 
-def parse_node_contents_csv(file_path: str) -> list[NodeType | None]:
+def read_node_contents_csv(file_path: str) -> bytes:
     absolute_file_path = get_resource_path(file_path)
     with open_cp1252(absolute_file_path) as file_object:
-        data = file_object.read()
-    node_contents_data = [int(i, 16) for i in data.splitlines()]
-    return parse_node_contents(node_contents_data)
-
-
-try:
-    NODE_CONTENTS_ORIGINAL = parse_node_contents_dat('data_files/dat09.dat')
-except FileNotFoundError:
-    NODE_CONTENTS_ORIGINAL = parse_node_contents_csv('data_files/dat09.csv')
-try:
-    NODE_CONTENTS_STANDARD = parse_node_contents_dat('data_files/dat10.dat')
-except FileNotFoundError:
-    NODE_CONTENTS_STANDARD = parse_node_contents_csv('data_files/dat10.csv')
-try:
-    NODE_CONTENTS_EXPERT = parse_node_contents_dat('data_files/dat11.dat')
-except FileNotFoundError:
-    NODE_CONTENTS_EXPERT = parse_node_contents_csv('data_files/dat11.csv')
+        return hex_csv_to_bytes(file_object.read())
+
+
+@profiled()
+def parse_node_contents_dat(file_path: str) -> list[NodeType | None]:
+    return parse_node_contents(read_node_contents_dat(file_path))
+
+
+@profiled()
+def parse_node_contents_csv(file_path: str) -> list[NodeType | None]:
+    return parse_node_contents(read_node_contents_csv(file_path))
+
+
+NODE_CONTENTS_HEADER_LENGTH = 8
+
+
+@cache
+def get_node_contents(file_name: str) -> list[NodeType | None]:
+    try:
+        return parse_node_contents_dat(f'data_files/{file_name}.dat')
+    except FileNotFoundError:
+        return parse_node_contents_csv(f'data_files/{file_name}.csv')
+
+
+NODE_CONTENTS_FILES = {
+    'NODE_CONTENTS_ORIGINAL': 'dat09',
+    'NODE_CONTENTS_STANDARD': 'dat10',
+    'NODE_CONTENTS_EXPERT': 'dat11',
+}
+
+
+def __getattr__(name: str):
+    if name in NODE_CONTENTS_FILES:
+        return get_node_contents(NODE_CONTENTS_FILES[name])
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
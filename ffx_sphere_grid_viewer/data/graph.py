@@ -0,0 +1,237 @@
+from array import array
+from collections import deque
+from collections.abc import Callable, Collection
+from heapq import heappop, heappush
+from math import inf
+from typing import TYPE_CHECKING, Self
+
+from .link import NO_INDEX
+from .node_types import AppearanceType, NodeType, get_node_types
+
+if TYPE_CHECKING:
+    from .layout import Layout
+
+
+def get_lock_level(content: NodeType | None) -> int:
+    """Key Sphere level needed to move onto a Node, 0 if none is needed
+    and `IMPASSABLE` for missing Nodes.
+    """
+    if content is None:
+        return IMPASSABLE
+    return LOCK_LEVELS.get(content.appearance_type, 0)
+
+
+class LayoutGraph:
+    """Nodes and Links of a Layout as an undirected graph in compressed
+    sparse row form.
+
+    The neighbours of Node `i` are `neighbours[offsets[i]:offsets[i + 1]]`
+    and `links` holds the index of the Link to each of them. Moving onto
+    a Node needs a Key Sphere of its lock level, the searches take the
+    highest level available (all of them if None) and don't enter Nodes
+    with a higher one. Distances are in steps, -1 for unreachable Nodes.
+    """
+    def __init__(self,
+                 offsets: array,
+                 neighbours: array,
+                 links: array,
+                 lock_levels: array,
+                 ) -> None:
+        self.offsets = offsets
+        self.neighbours = neighbours
+        self.links = links
+        self.lock_levels = lock_levels
+        # all-pairs distance tables, by maximum lock level
+        self.distance_tables: dict[int, list[array]] = {}
+
+    @classmethod
+    def from_layout(cls, layout: 'Layout') -> Self:
+        arrays = layout.arrays
+        node_count = len(arrays.x)
+        degrees = [0] * node_count
+        for node_1, node_2 in zip(arrays.node_1, arrays.node_2):
+            degrees[node_1] += 1
+            degrees[node_2] += 1
+        offsets = array('I', [0])
+        for degree in degrees:
+            offsets.append(offsets[-1] + degree)
+        neighbours = array('H', bytes(2 * offsets[-1]))
+        links = array('H', bytes(2 * offsets[-1]))
+        ends = array('I', offsets[:-1])
+        for link, (node_1, node_2) in enumerate(
+                zip(arrays.node_1, arrays.node_2)):
+            for node, neighbour in ((node_1, node_2), (node_2, node_1)):
+                neighbours[ends[node]] = neighbour
+                links[ends[node]] = link
+                ends[node] += 1
+        node_types = get_node_types()
+        # custom Node Types are not in the arrays, only in the Nodes
+        lock_levels = array('B', (
+            get_lock_level(node.content if i == NO_INDEX else node_types[i])
+            for i, node in zip(arrays.content_index, layout.nodes)))
+        return cls(offsets, neighbours, links, lock_levels)
+
+    def with_contents(self,
+                      get_content: Callable[[int], NodeType | None],
+                      ) -> Self:
+        """Return a graph with the same Links and the locks of the
+        contents returned by `get_content`, like `overlay.get_content`.
+        """
+        lock_levels = array('B', (get_lock_level(get_content(i))
+                                  for i in range(len(self.lock_levels))))
+        return type(self)(self.offsets, self.neighbours, self.links,
+                          lock_levels)
+
+    def __len__(self) -> int:
+        return len(self.lock_levels)
+
+    def get_neighbours(self, index: int) -> array:
+        return self.neighbours[self.offsets[index]:self.offsets[index + 1]]
+
+    def search(self,
+               source: int,
+               max_lock_level: int | None = None,
+               targets: Collection[int] = (),
+               ) -> tuple[array, array]:
+        """Breadth first search from `source`, stopping at the first Node
+        in `targets` if any. Return the distance and the previous Node on
+        a shortest path of every Node.
+        """
+        if max_lock_level is None:
+            max_lock_level = MAX_LOCK_LEVEL
+        distances = array('h', [-1]) * len(self)
+        previous = array('H', [NO_INDEX]) * len(self)
+        offsets, neighbours = self.offsets, self.neighbours
+        lock_levels = self.lock_levels
+        distances[source] = 0
+        queue = deque((source,))
+        while queue:
+            node = queue.popleft()
+            if node in targets:
+                break
+            distance = distances[node] + 1
+            for neighbour in neighbours[offsets[node]:offsets[node + 1]]:
+                if (distances[neighbour] < 0
+                        and lock_levels[neighbour] <= max_lock_level):
+                    distances[neighbour] = distance
+                    previous[neighbour] = node
+                    queue.append(neighbour)
+        return distances, previous
+
+    def get_distances(self,
+                      source: int,
+                      max_lock_level: int | None = None,
+                      ) -> array:
+        return self.search(source, max_lock_level)[0]
+
+    def get_distance(self,
+                     source: int,
+                     target: int,
+                     max_lock_level: int | None = None,
+                     ) -> int:
+        if max_lock_level is None:
+            max_lock_level = MAX_LOCK_LEVEL
+        table = self.distance_tables.get(max_lock_level)
+        if table is not None:
+            return table[source][target]
+        return self.search(source, max_lock_level, (target,))[0][target]
+
+    def get_path(self,
+                 source: int,
+                 target: int,
+                 max_lock_level: int | None = None,
+                 ) -> list[int] | None:
+        """Nodes of a shortest path from `source` to `target`, both
+        included, None if there is no path.
+        """
+        return self.get_nearest_path(source, (target,), max_lock_level)
+
+    def get_nearest_path(self,
+                         source: int,
+                         targets: Collection[int],
+                         max_lock_level: int | None = None,
+                         ) -> list[int] | None:
+        """Shortest path to the nearest of `targets`, like `get_path`."""
+        distances, previous = self.search(source, max_lock_level, targets)
+        reached = [t for t in targets if distances[t] >= 0]
+        if not reached:
+            return None
+        node = min(reached, key=distances.__getitem__)
+        path = [node]
+        while node != source:
+            node = previous[node]
+            path.append(node)
+        path.reverse()
+        return path
+
+    def get_path_links(self, path: list[int]) -> list[int]:
+        """Indexes of the Links between the consecutive Nodes of `path`."""
+        path_links = []
+        for node, next_node in zip(path, path[1:]):
+            start, end = self.offsets[node], self.offsets[node + 1]
+            position = self.neighbours.index(next_node, start, end)
+            path_links.append(self.links[position])
+        return path_links
+
+    def get_reachable(self,
+                      source: int,
+                      max_lock_level: int | None = None,
+                      ) -> set[int]:
+        """Nodes that can be reached from `source` with Key Spheres up to
+        `max_lock_level`, `source` included.
+        """
+        distances = self.get_distances(source, max_lock_level)
+        return {i for i, d in enumerate(distances) if d >= 0}
+
+    def get_distance_table(self,
+                           max_lock_level: int | None = None,
+                           ) -> list[array]:
+        """Distances between all the Nodes, computed on first use. The
+        row of a Node holds its distance to every other Node.
+        """
+        if max_lock_level is None:
+            max_lock_level = MAX_LOCK_LEVEL
+        table = self.distance_tables.get(max_lock_level)
+        if table is None:
+            table = [self.get_distances(i, max_lock_level)
+                     for i in range(len(self))]
+            self.distance_tables[max_lock_level] = table
+        return table
+
+    def get_weighted_distances(self,
+                               source: int,
+                               costs: list[float],
+                               max_lock_level: int | None = None,
+                               ) -> list[float]:
+        """Dijkstra from `source`, moving onto Node `i` costs `costs[i]`.
+        Unreachable Nodes are at `inf`.
+        """
+        if max_lock_level is None:
+            max_lock_level = MAX_LOCK_LEVEL
+        distances = [inf] * len(self)
+        offsets, neighbours = self.offsets, self.neighbours
+        lock_levels = self.lock_levels
+        distances[source] = 0.0
+        heap = [(0.0, source)]
+        while heap:
+            distance, node = heappop(heap)
+            if distance > distances[node]:
+                continue
+            for neighbour in neighbours[offsets[node]:offsets[node + 1]]:
+                if lock_levels[neighbour] > max_lock_level:
+                    continue
+                new_distance = distance + costs[neighbour]
+                if new_distance < distances[neighbour]:
+                    distances[neighbour] = new_distance
+                    heappush(heap, (new_distance, neighbour))
+        return distances
+
+
+LOCK_LEVELS = {
+    AppearanceType.L_1_LOCK: 1,
+    AppearanceType.L_2_LOCK: 2,
+    AppearanceType.L_3_LOCK: 3,
+    AppearanceType.L_4_LOCK: 4,
+}
+MAX_LOCK_LEVEL = 4
+IMPASSABLE = 255
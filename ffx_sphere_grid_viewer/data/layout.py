@@ -1,12 +1,23 @@
+import struct
+import sys
+from array import array
 from dataclasses import dataclass
+from enum import StrEnum
+from functools import cache, cached_property
+from typing import Self
 
-from .cluster import CLUSTER_LENGTH, Cluster, parse_cluster
-from .content import (NODE_CONTENTS_EXPERT, NODE_CONTENTS_ORIGINAL,
-                      NODE_CONTENTS_STANDARD)
-from .link import LINK_LENGTH, Link, parse_link
-from .node import NODE_LENGTH, Node, parse_node
-from .node_types import NodeType
-from .utils import add_bytes, get_resource_path, open_cp1252
+from ..profiler import profiled
+from .cache import load_cached
+from .cluster import CLUSTER_LENGTH, Cluster, parse_clusters
+from .content import get_node_contents
+from .graph import LayoutGraph
+from .link import LINK_LENGTH, NO_INDEX, Link, parse_links
+from .link_geometry import LinkGeometry
+from .node import NODE_LENGTH, Node, parse_nodes
+from .node_types import NODE_TYPES_INPUT_FILES, NodeType, get_node_types
+from .query import NodeMasks
+from .spatial import SpatialIndex
+from .utils import get_resource_path, hex_csv_to_bytes, open_cp1252
 
 
 @dataclass
@@ -15,77 +26,271 @@ class Layout:
     nodes: list[Node]
     links: list[Link]
 
+    @cached_property
+    def arrays(self) -> 'LayoutArrays':
+        """Columnar copy of the Layout, built on first access.
 
-def parse_layout(cluster_datas: list[list[int]],
-                 node_datas: list[list[int]],
-                 link_datas: list[list[int]],
+        The Layout should not be modified after this is accessed.
+        """
+        return LayoutArrays.from_layout(self)
+
+    @cached_property
+    def link_geometry(self) -> LinkGeometry:
+        """Shapes of the Links, built on first access."""
+        return LinkGeometry.from_arrays(self.arrays)
+
+    @cached_property
+    def graph(self) -> LayoutGraph:
+        """Graph of the Nodes and Links, built on first access."""
+        return LayoutGraph.from_layout(self)
+
+    @cached_property
+    def node_masks(self) -> NodeMasks:
+        """Nodes of every content and Cluster, built on first access."""
+        return NodeMasks.from_arrays(self.arrays)
+
+    @cached_property
+    def spatial_index(self) -> SpatialIndex:
+        return SpatialIndex(self.arrays, self.link_geometry)
+
+
+@dataclass
+class LayoutArrays:
+    """Struct-of-arrays representation of a Layout.
+
+    Nodes, Links and Clusters are referred to by their index in the
+    Layout lists, `NO_INDEX` is used for missing values (empty contents,
+    Node Types that are not in `get_node_types()` and straight Links).
+    """
+    cluster_x: array
+    cluster_y: array
+    cluster_maybe_type: array
+    x: array
+    y: array
+    original_content_index: array
+    content_index: array
+    cluster_index: array
+    node_1: array
+    node_2: array
+    centre: array
+
+    @classmethod
+    def from_layout(cls, layout: Layout) -> Self:
+        node_type_indexes = get_node_type_indexes()
+        cluster_indexes = {id(c): i for i, c in enumerate(layout.clusters)}
+        node_indexes = {id(n): i for i, n in enumerate(layout.nodes)}
+        columns = {name: array(typecode)
+                   for name, (typecode, _) in LAYOUT_ARRAYS_COLUMNS.items()}
+        for cluster in layout.clusters:
+            columns['cluster_x'].append(cluster.x)
+            columns['cluster_y'].append(cluster.y)
+            columns['cluster_maybe_type'].append(cluster.maybe_type)
+        for node in layout.nodes:
+            columns['x'].append(node.x)
+            columns['y'].append(node.y)
+            columns['original_content_index'].append(
+                node_type_indexes.get(node.original_content, NO_INDEX))
+            columns['content_index'].append(
+                node_type_indexes.get(node.content, NO_INDEX))
+            columns['cluster_index'].append(cluster_indexes[id(node.cluster)])
+        for link in layout.links:
+            columns['node_1'].append(node_indexes[id(link.node_1)])
+            columns['node_2'].append(node_indexes[id(link.node_2)])
+            if link.centre_node is None:
+                columns['centre'].append(NO_INDEX)
+            else:
+                columns['centre'].append(node_indexes[id(link.centre_node)])
+        return cls(**columns)
+
+    @classmethod
+    def frombytes(cls, data: memoryview) -> Self:
+        counts = dict(zip(('clusters', 'nodes', 'links'),
+                          LAYOUT_ARRAYS_HEADER_STRUCT.unpack_from(data)))
+        start = LAYOUT_ARRAYS_HEADER_STRUCT.size
+        columns = {}
+        for name, (typecode, table) in LAYOUT_ARRAYS_COLUMNS.items():
+            column = array(typecode)
+            end = start + counts[table] * column.itemsize
+            column.frombytes(data[start:end])
+            if sys.byteorder == 'big':
+                column.byteswap()
+            columns[name] = column
+            start = end
+        return cls(**columns)
+
+    def tobytes(self) -> bytes:
+        data = bytearray(LAYOUT_ARRAYS_HEADER_STRUCT.pack(
+            len(self.cluster_x), len(self.x), len(self.node_1)))
+        for name in LAYOUT_ARRAYS_COLUMNS:
+            column = getattr(self, name)
+            if sys.byteorder == 'big':
+                column = array(column.typecode, column)
+                column.byteswap()
+            data += column.tobytes()
+        return bytes(data)
+
+    def to_layout(self, node_types: list[NodeType]) -> Layout:
+        def get_node_type(index: int) -> NodeType | None:
+            return None if index >= len(node_types) else node_types[index]
+
+        clusters = [Cluster(*fields) for fields in zip(
+            self.cluster_x, self.cluster_y, self.cluster_maybe_type)]
+        nodes = [Node(x, y, get_node_type(original_content_index),
+                      clusters[cluster_index], get_node_type(content_index))
+                 for x, y, original_content_index, content_index, cluster_index
+                 in zip(self.x, self.y, self.original_content_index,
+                        self.content_index, self.cluster_index)]
+        links = [Link(nodes[node_1], nodes[node_2],
+                      None if centre == NO_INDEX else nodes[centre])
+                 for node_1, node_2, centre
+                 in zip(self.node_1, self.node_2, self.centre)]
+        layout = Layout(clusters, nodes, links)
+        layout.arrays = self
+        return layout
+
+    def get_bounds(self) -> tuple[int, int, int, int]:
+        """Return the bounding box of the Node centres."""
+        if not self.x:
+            return 0, 0, 0, 0
+        return min(self.x), min(self.y), max(self.x), max(self.y)
+
+    def get_arc_links(self) -> list[int]:
+        return [i for i, c in enumerate(self.centre) if c != NO_INDEX]
+
+
+def parse_layout(cluster_data: bytes,
+                 node_data: bytes,
+                 link_data: bytes,
                  node_contents: list[NodeType],
                  ) -> Layout:
-    clusters = [parse_cluster(d) for d in cluster_datas]
-    nodes = [parse_node(d, clusters) for d in node_datas]
+    clusters = parse_clusters(cluster_data)
+    nodes = parse_nodes(node_data, clusters)
     for node, content in zip(nodes, node_contents):
         node.content = content
-    links = [parse_link(d, nodes) for d in link_datas]
+    links = parse_links(link_data, nodes)
     return Layout(clusters, nodes, links)
 
 
-def parse_layout_dat(file_path: str, node_contents: list[NodeType]) -> Layout:
+def read_layout_dat(file_path: str) -> tuple[bytes, bytes, bytes]:
+    """Return the cluster, node and link records of a layout file."""
     with open(get_resource_path(file_path), mode='rb') as file_object:
-        data = list(file_object.read())
+        data = memoryview(file_object.read())
 
-    cluster_count = add_bytes(*data[2:4])
-    node_count = add_bytes(*data[4:6])
-    link_count = add_bytes(*data[6:8])
+    cluster_count, node_count, link_count = LAYOUT_HEADER_STRUCT.unpack_from(
+        data)
 
-    start = 16
-    clusters = []
-    for _ in range(cluster_count):
-        clusters.append(data[start:start + CLUSTER_LENGTH])
-        start += CLUSTER_LENGTH
+    start = LAYOUT_HEADER_STRUCT.size
+    end = start + cluster_count * CLUSTER_LENGTH
+    clusters_data = data[start:end]
+    start, end = end, end + node_count * NODE_LENGTH
+    nodes_data = data[start:end]
+    start, end = end, end + link_count * LINK_LENGTH
+    links_data = data[start:end]
+    return clusters_data, nodes_data, links_data
 
-    nodes = []
-    for _ in range(node_count):
-        nodes.append(data[start:start + NODE_LENGTH])
-        start += NODE_LENGTH
 
-    links = []
-    for _ in range(link_count):
-        links.append(data[start:start + LINK_LENGTH])
-        start += LINK_LENGTH
-    return parse_layout(clusters, nodes, links, node_contents)
+def read_layout_csv(file_path: str) -> tuple[bytes, bytes, bytes]:
+    """Return the cluster, node and link records of the layout `.csv`
+    files, `file_path` is formatted with "clusters", "nodes" and "links".
+    """
+    datas = []
+    for name in ('clusters', 'nodes', 'links'):
+        absolute_file_path = get_resource_path(file_path.format(name))
+        with open_cp1252(absolute_file_path) as file_object:
+            datas.append(hex_csv_to_bytes(file_object.read()))
+    return tuple(datas)
 
 
+@profiled()
+def parse_layout_dat(file_path: str, node_contents: list[NodeType]) -> Layout:
+    return parse_layout(*read_layout_dat(file_path), node_contents)
+
+
+@profiled()
 def parse_layout_csv(file_path: str, node_contents: list[NodeType]) -> Layout:
-    absolute_file_path = get_resource_path(file_path.format('clusters'))
-    with open_cp1252(absolute_file_path) as file_object:
-        clusters_data = file_object.read()
-    absolute_file_path = get_resource_path(file_path.format('nodes'))
-    with open_cp1252(absolute_file_path) as file_object:
-        nodes_data = file_object.read()
-    absolute_file_path = get_resource_path(file_path.format('links'))
-    with open_cp1252(absolute_file_path) as file_object:
-        links_data = file_object.read()
-    datas = [[[int(b, 16) for b in line.split(',')]
-             for line in data.splitlines()]
-             for data in (clusters_data, nodes_data, links_data)]
-    return parse_layout(*datas, node_contents)
-
-
-try:
-    LAYOUT_ORIGINAL = parse_layout_dat(
-        'data_files/dat01.dat', NODE_CONTENTS_ORIGINAL)
-except FileNotFoundError:
-    LAYOUT_ORIGINAL = parse_layout_csv(
-        'data_files/{}_dat01.csv', NODE_CONTENTS_ORIGINAL)
-try:
-    LAYOUT_STANDARD = parse_layout_dat(
-        'data_files/dat02.dat', NODE_CONTENTS_STANDARD)
-except FileNotFoundError:
-    LAYOUT_STANDARD = parse_layout_csv(
-        'data_files/{}_dat02.csv', NODE_CONTENTS_STANDARD)
-try:
-    LAYOUT_EXPERT = parse_layout_dat(
-        'data_files/dat03.dat', NODE_CONTENTS_EXPERT)
-except FileNotFoundError:
-    LAYOUT_EXPERT = parse_layout_csv(
-        'data_files/{}_dat03.csv', NODE_CONTENTS_EXPERT)
+    return parse_layout(*read_layout_csv(file_path), node_contents)
+
+
+def get_node_type_indexes() -> dict[NodeType, int]:
+    node_type_indexes = {}
+    for i, node_type in enumerate(get_node_types()):
+        node_type_indexes.setdefault(node_type, i)
+    return node_type_indexes
+
+
+def pack_layout(layout: Layout) -> bytes:
+    return layout.arrays.tobytes()
+
+
+def unpack_layout(data: memoryview) -> Layout:
+    return LayoutArrays.frombytes(data).to_layout(get_node_types())
+
+
+LAYOUT_HEADER_STRUCT = struct.Struct('<2xHHH8x')
+LAYOUT_ARRAYS_HEADER_STRUCT = struct.Struct('<HHH')
+# array typecode and the table each column belongs to
+LAYOUT_ARRAYS_COLUMNS = {
+    'cluster_x': ('h', 'clusters'),
+    'cluster_y': ('h', 'clusters'),
+    'cluster_maybe_type': ('H', 'clusters'),
+    'x': ('h', 'nodes'),
+    'y': ('h', 'nodes'),
+    'original_content_index': ('H', 'nodes'),
+    'content_index': ('H', 'nodes'),
+    'cluster_index': ('H', 'nodes'),
+    'node_1': ('H', 'links'),
+    'node_2': ('H', 'links'),
+    'centre': ('H', 'links'),
+}
+
+
+class LayoutType(StrEnum):
+    ORIGINAL = 'Original'
+    STANDARD = 'Standard'
+    EXPERT = 'Expert'
+
+
+LAYOUT_FILES = {
+    LayoutType.ORIGINAL: ('dat01', 'dat09'),
+    LayoutType.STANDARD: ('dat02', 'dat10'),
+    LayoutType.EXPERT: ('dat03', 'dat11'),
+}
+
+
+def parse_game_layout(layout_type: LayoutType) -> Layout:
+    layout_file, node_contents_file = LAYOUT_FILES[layout_type]
+    node_contents = get_node_contents(node_contents_file)
+    try:
+        return parse_layout_dat(f'data_files/{layout_file}.dat', node_contents)
+    except FileNotFoundError:
+        return parse_layout_csv(
+            f'data_files/{{}}_{layout_file}.csv', node_contents)
+
+
+@cache
+def get_layout(layout_type: LayoutType) -> Layout:
+    layout_file, node_contents_file = LAYOUT_FILES[layout_type]
+    input_files = [
+        f'data_files/{layout_file}.dat',
+        f'data_files/clusters_{layout_file}.csv',
+        f'data_files/nodes_{layout_file}.csv',
+        f'data_files/links_{layout_file}.csv',
+        f'data_files/{node_contents_file}.dat',
+        f'data_files/{node_contents_file}.csv',
+        # the contents are stored as indexes into the Node Types
+        *NODE_TYPES_INPUT_FILES,
+    ]
+    return load_cached(f'layout_{layout_file}', input_files,
+                       lambda: parse_game_layout(layout_type),
+                       pack_layout, unpack_layout)
+
+
+def __getattr__(name: str):
+    match name:
+        case 'LAYOUT_ORIGINAL':
+            return get_layout(LayoutType.ORIGINAL)
+        case 'LAYOUT_STANDARD':
+            return get_layout(LayoutType.STANDARD)
+        case 'LAYOUT_EXPERT':
+            return get_layout(LayoutType.EXPERT)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
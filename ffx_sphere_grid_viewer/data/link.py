@@ -1,8 +1,8 @@
+import struct
 from dataclasses import dataclass
 from math import atan2, degrees
 
 from .node import Node
-from .utils import add_bytes
 
 
 @dataclass
@@ -31,15 +31,23 @@ class Link:
         return self.get_angle(self.node_2)
 
 
-def parse_link(data: list[int], nodes: list[Node]) -> Link:
-    node_1 = nodes[add_bytes(*data[:2])]
-    node_2 = nodes[add_bytes(*data[2:4])]
-    anchor_node_index = add_bytes(*data[4:6])
-    if anchor_node_index == 0xffff:
-        anchor_node = None
-    else:
-        anchor_node = nodes[anchor_node_index]
-    return Link(node_1, node_2, anchor_node)
+def parse_link(data: bytes, nodes: list[Node]) -> Link:
+    return parse_links(data, nodes)[0]
 
 
-LINK_LENGTH = 8
+def parse_links(data: bytes, nodes: list[Node]) -> list[Link]:
+    links = []
+    for node_1_index, node_2_index, anchor_node_index in (
+            LINK_STRUCT.iter_unpack(data)):
+        if anchor_node_index == NO_INDEX:
+            anchor_node = None
+        else:
+            anchor_node = nodes[anchor_node_index]
+        links.append(
+            Link(nodes[node_1_index], nodes[node_2_index], anchor_node))
+    return links
+
+
+NO_INDEX = 0xffff
+LINK_STRUCT = struct.Struct('<HHH2x')
+LINK_LENGTH = LINK_STRUCT.size
@@ -0,0 +1,91 @@
+from array import array
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Self
+
+from .link import NO_INDEX
+from .spatial import Bbox, get_arc, get_arc_bbox
+
+if TYPE_CHECKING:
+    from .layout import LayoutArrays
+
+
+@dataclass
+class LinkGeometry:
+    """Shapes of all the Links of a Layout, computed once.
+
+    Every Link has its end points and bounding box, arcs also have their
+    centre, radius, start angle and extent (degrees, counterclockwise
+    with the y axis pointing down). Straight Links have `arc` set to 0.
+    """
+    arc: array
+    x_1: array
+    y_1: array
+    x_2: array
+    y_2: array
+    centre_x: array
+    centre_y: array
+    radius: array
+    start: array
+    extent: array
+    min_x: array
+    min_y: array
+    max_x: array
+    max_y: array
+
+    @classmethod
+    def from_arrays(cls, arrays: 'LayoutArrays') -> Self:
+        columns = {name: array(typecode)
+                   for name, typecode in LINK_GEOMETRY_COLUMNS.items()}
+        xs, ys = arrays.x, arrays.y
+        for node_1, node_2, centre in zip(
+                arrays.node_1, arrays.node_2, arrays.centre):
+            x_1, y_1, x_2, y_2 = xs[node_1], ys[node_1], xs[node_2], ys[node_2]
+            if centre == NO_INDEX:
+                arc = 0
+                centre_x = centre_y = radius = start = extent = 0
+                bbox = (min(x_1, x_2), min(y_1, y_2),
+                        max(x_1, x_2), max(y_1, y_2))
+            else:
+                arc = 1
+                centre_x, centre_y = xs[centre], ys[centre]
+                radius, start, extent = get_arc(
+                    x_1, y_1, x_2, y_2, centre_x, centre_y)
+                bbox = get_arc_bbox(centre_x, centre_y, radius, start, extent)
+            for name, value in zip(
+                    LINK_GEOMETRY_COLUMNS,
+                    (arc, x_1, y_1, x_2, y_2, centre_x, centre_y, radius,
+                     start, extent, *bbox)):
+                columns[name].append(value)
+        return cls(**columns)
+
+    def get_shape(self, index: int) -> tuple[float, ...]:
+        """Return (x_1, y_1, x_2, y_2) for lines and
+        (centre_x, centre_y, radius, start, extent) for arcs.
+        """
+        if self.arc[index]:
+            return (self.centre_x[index], self.centre_y[index],
+                    self.radius[index], self.start[index], self.extent[index])
+        return (self.x_1[index], self.y_1[index],
+                self.x_2[index], self.y_2[index])
+
+    def get_bbox(self, index: int) -> Bbox:
+        return (self.min_x[index], self.min_y[index],
+                self.max_x[index], self.max_y[index])
+
+
+LINK_GEOMETRY_COLUMNS = {
+    'arc': 'B',
+    'x_1': 'd',
+    'y_1': 'd',
+    'x_2': 'd',
+    'y_2': 'd',
+    'centre_x': 'd',
+    'centre_y': 'd',
+    'radius': 'd',
+    'start': 'd',
+    'extent': 'd',
+    'min_x': 'd',
+    'min_y': 'd',
+    'max_x': 'd',
+    'max_y': 'd',
+}
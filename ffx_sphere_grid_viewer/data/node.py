@@ -1,8 +1,8 @@
+import struct
 from dataclasses import dataclass
 
 from .cluster import Cluster
-from .node_types import NODE_TYPES, NodeType
-from .utils import add_bytes, s16
+from .node_types import NodeType, get_node_types
 
 
 @dataclass
@@ -17,16 +17,22 @@ class Node:
         return f'Node {self.content} @ ({self.x},{self.y})'
 
 
-def parse_node(data: list[int], clusters: list[Cluster]) -> Node:
-    x = s16(add_bytes(*data[:2]))
-    y = s16(add_bytes(*data[2:4]))
-    original_content_index = add_bytes(*data[6:8])
-    if original_content_index >= len(NODE_TYPES):
-        original_content = None
-    else:
-        original_content = NODE_TYPES[original_content_index]
-    cluster = clusters[add_bytes(*data[8:10])]
-    return Node(x, y, original_content, cluster)
+def parse_node(data: bytes, clusters: list[Cluster]) -> Node:
+    return parse_nodes(data, clusters)[0]
 
 
-NODE_LENGTH = 12
+def parse_nodes(data: bytes, clusters: list[Cluster]) -> list[Node]:
+    node_types = get_node_types()
+    nodes = []
+    for x, y, original_content_index, cluster_index in (
+            NODE_STRUCT.iter_unpack(data)):
+        if original_content_index >= len(node_types):
+            original_content = None
+        else:
+            original_content = node_types[original_content_index]
+        nodes.append(Node(x, y, original_content, clusters[cluster_index]))
+    return nodes
+
+
+NODE_STRUCT = struct.Struct('<hh2xHH2x')
+NODE_LENGTH = NODE_STRUCT.size
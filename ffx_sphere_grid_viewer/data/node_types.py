@@ -1,10 +1,15 @@
+import struct
+from collections.abc import Iterable
 from dataclasses import dataclass
 from enum import IntEnum
+from functools import cache, lru_cache
 from typing import Self
 
-from .svg import APPEARANCES, Polygon
-from .text_characters import bytes_to_string
-from .utils import add_bytes, get_resource_path, open_cp1252
+from ..profiler import profiled
+from .cache import load_cached
+from .svg import Polygon, get_appearances, scale_polygon, translate_coords
+from .text_characters import TEXT_CHARACTERS_FILE, StringTable
+from .utils import get_resource_path, hex_csv_to_bytes, open_cp1252
 
 
 class AppearanceType(IntEnum):
@@ -50,21 +55,61 @@ class NodeType:
         return self
 
 
-def parse_node_type(data: list[int], string_data: list[int]) -> NodeType:
-    name_offset = add_bytes(*data[:2])
-    dash_offset = add_bytes(*data[4:6])
-    description_offset = add_bytes(*data[8:10])
-    other_text_offset = add_bytes(*data[12:14])
-    node_effect_bit_field = add_bytes(*data[16:18])
-    learned_move = add_bytes(*data[18:20])
-    increase_amount = add_bytes(*data[20:22])
-    appearance_index = add_bytes(*data[22:24])
-    name = bytes_to_string(string_data, name_offset)
-    dash = bytes_to_string(string_data, dash_offset)
-    description = bytes_to_string(string_data, description_offset)
-    other_text = bytes_to_string(string_data, other_text_offset)
+@lru_cache(maxsize=256)
+def get_scaled_appearance(appearance_type: AppearanceType,
+                          zoom: float,
+                          ) -> tuple[float, ...]:
+    return scale_polygon(get_appearances()[appearance_type], zoom)
+
+
+def get_appearance_coords(node_type: NodeType,
+                          x: float,
+                          y: float,
+                          zoom: float = 1.0,
+                          ) -> list[float]:
+    """Return the flattened coordinates of the appearance of `node_type`
+    scaled by `zoom` and with its top left corner at (`x`, `y`).
+    """
+    appearance_type = node_type.appearance_type
+    if node_type.appearance is get_appearances()[appearance_type]:
+        coords = get_scaled_appearance(appearance_type, round(zoom, 4))
+    else:
+        # custom Node Types might not use the default icons
+        coords = scale_polygon(node_type.appearance, zoom)
+    return translate_coords(coords, x, y)
+
+
+def parse_node_type(data: bytes, string_data: bytes) -> NodeType:
+    return parse_node_type_fields(
+        NODE_TYPE_STRUCT.unpack(data), StringTable(string_data))
+
+
+def parse_node_type_fields(fields: tuple[int, ...],
+                           strings: StringTable,
+                           ) -> NodeType:
+    (name_offset, dash_offset, description_offset, other_text_offset,
+     node_effect_bit_field, learned_move, increase_amount,
+     appearance_index) = fields
+    name = strings[name_offset]
+    dash = strings[dash_offset]
+    description = strings[description_offset]
+    other_text = strings[other_text_offset]
+    return create_node_type(
+        node_effect_bit_field, learned_move, increase_amount,
+        appearance_index, name, dash, description, other_text)
+
+
+def create_node_type(node_effect_bit_field: int,
+                     learned_move: int,
+                     increase_amount: int,
+                     appearance_index: int,
+                     name: str,
+                     dash: str,
+                     description: str,
+                     other_text: str,
+                     ) -> NodeType:
     appearance_type = AppearanceType(appearance_index)
-    appearance = APPEARANCES[appearance_type]
+    appearance = get_appearances()[appearance_type]
     match appearance_index:
         case 0 | 1 | 16 | 17 | 18:
             display_name = ''
@@ -83,44 +128,49 @@ def parse_node_type(data: list[int], string_data: list[int]) -> NodeType:
     return node_type
 
 
-def parse_panel(node_type_datas: list[list[int]],
-                string_data: list[int],
+def parse_panel(node_type_datas: Iterable[tuple[int, ...]],
+                string_data: bytes,
                 ) -> list[NodeType]:
-    node_types = []
-    for node_type_data in node_type_datas:
-        node_types.append(parse_node_type(node_type_data, string_data))
-    return node_types
+    strings = StringTable(string_data)
+    return [parse_node_type_fields(fields, strings)
+            for fields in node_type_datas]
 
 
+@profiled()
 def parse_panel_bin(file_path: str) -> list[NodeType]:
     with open(get_resource_path(file_path), mode='rb') as file_object:
-        data = list(file_object.read())
-
-    min_index = add_bytes(*data[8:10])
-    max_index = add_bytes(*data[10:12])
-    node_type_length = add_bytes(*data[12:14])
-    total_length = add_bytes(*data[14:16])
-    data_bytes = data[20:20+total_length]
-    string_data = data[20+total_length:]
-    node_type_datas = []
-    start = 0
-    for _ in range(max_index + 1 - min_index):
-        node_type_data = data_bytes[start:start + node_type_length]
-        node_type_datas.append(node_type_data)
-        start += node_type_length
+        data = memoryview(file_object.read())
+
+    min_index, max_index, node_type_length, total_length = (
+        PANEL_HEADER_STRUCT.unpack_from(data, 8))
+    start = PANEL_HEADER_LENGTH
+    end = start + (max_index + 1 - min_index) * node_type_length
+    string_data = bytes(data[start + total_length:])
+    if node_type_length == NODE_TYPE_STRUCT.size:
+        node_type_datas = NODE_TYPE_STRUCT.iter_unpack(data[start:end])
+    else:
+        node_type_datas = (NODE_TYPE_STRUCT.unpack_from(data, offset)
+                           for offset in range(start, end, node_type_length))
     return parse_panel(node_type_datas, string_data)
 
 
+@profiled()
 def parse_panel_csv(file_path: str) -> list[NodeType]:
     absolute_file_path = get_resource_path(file_path)
     with open_cp1252(absolute_file_path) as file_object:
         data = file_object.read()
-    node_type_datas = [[int(b, 16) for b in line.split(',')]
-                       for line in data.splitlines()]
-    string_data = node_type_datas.pop()
+    *node_type_lines, string_line = data.splitlines()
+    node_type_data = hex_csv_to_bytes('\n'.join(node_type_lines))
+    node_type_datas = NODE_TYPE_STRUCT.iter_unpack(node_type_data)
+    string_data = hex_csv_to_bytes(string_line)
     return parse_panel(node_type_datas, string_data)
 
 
+NODE_TYPE_STRUCT = struct.Struct('<H2xH2xH2xH2xHHHH')
+PANEL_HEADER_STRUCT = struct.Struct('<HHHH')
+PANEL_HEADER_LENGTH = 20
+NODE_TYPE_CACHE_STRUCT = struct.Struct('<HHHB')
+
 NODETYPE_COLORS = {
     AppearanceType.HP: '#008100',
     AppearanceType.MP: '#006630',
@@ -143,7 +193,54 @@ NODETYPE_COLORS = {
     AppearanceType.L_4_LOCK: '#4b4b4b',
 }
 
-try:
-    NODE_TYPES = parse_panel_bin('data_files/panel.bin')
-except FileNotFoundError:
-    NODE_TYPES = parse_panel_csv('data_files/panel.csv')
+
+def pack_node_types(node_types: list[NodeType]) -> bytes:
+    data = bytearray(struct.pack('<H', len(node_types)))
+    strings = []
+    for node_type in node_types:
+        data += NODE_TYPE_CACHE_STRUCT.pack(
+            node_type.node_effect_bit_field, node_type.learned_move,
+            node_type.increase_amount, node_type.appearance_type)
+        strings.extend((node_type.name, node_type.dash,
+                        node_type.description, node_type.other_text))
+    data += '\0'.join(strings).encode()
+    return bytes(data)
+
+
+def unpack_node_types(data: memoryview) -> list[NodeType]:
+    (count,) = struct.unpack_from('<H', data)
+    end = 2 + count * NODE_TYPE_CACHE_STRUCT.size
+    strings = str(data[end:], 'utf-8').split('\0')
+    if len(strings) != count * 4:
+        raise ValueError('string count does not match node type count')
+    return [create_node_type(*fields, *strings[i * 4:i * 4 + 4])
+            for i, fields in enumerate(
+                NODE_TYPE_CACHE_STRUCT.iter_unpack(data[2:end]))]
+
+
+def parse_node_types() -> list[NodeType]:
+    try:
+        return parse_panel_bin('data_files/panel.bin')
+    except FileNotFoundError:
+        return parse_panel_csv('data_files/panel.csv')
+
+
+@cache
+def get_node_types() -> list[NodeType]:
+    return load_cached('node_types', NODE_TYPES_INPUT_FILES, parse_node_types,
+                       pack_node_types, unpack_node_types)
+
+
+def __getattr__(name: str):
+    if name == 'NODE_TYPES':
+        return get_node_types()
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+# files the Node Types are parsed from, also part of the digest of every
+# cached value that depends on them
+NODE_TYPES_INPUT_FILES = [
+    'data_files/panel.bin',
+    'data_files/panel.csv',
+    TEXT_CHARACTERS_FILE,
+]
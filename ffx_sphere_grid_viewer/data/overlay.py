@@ -0,0 +1,69 @@
+import struct
+from dataclasses import dataclass, field
+from typing import Self
+
+from .layout import NO_INDEX, Layout, get_node_type_indexes
+from .node_types import NodeType, get_node_types
+
+
+@dataclass
+class LayoutOverlay:
+    """Node content edits stored on top of a shared, unmodified Layout.
+
+    Only the edited Nodes are stored, keyed by their index in
+    `layout.nodes`.
+    """
+    layout: Layout
+    contents: dict[int, NodeType | None] = field(default_factory=dict)
+
+    def __len__(self) -> int:
+        return len(self.contents)
+
+    def get_content(self, index: int) -> NodeType | None:
+        try:
+            return self.contents[index]
+        except KeyError:
+            return self.layout.nodes[index].content
+
+    def set_content(self, index: int, content: NodeType | None) -> None:
+        if content is self.layout.nodes[index].content:
+            self.contents.pop(index, None)
+        else:
+            self.contents[index] = content
+
+    def clear(self) -> None:
+        self.contents.clear()
+
+    def tobytes(self) -> bytes:
+        node_type_indexes = get_node_type_indexes()
+        data = bytearray()
+        for index, content in sorted(self.contents.items()):
+            if content is None:
+                content_index = NO_INDEX
+            else:
+                content_index = node_type_indexes[content]
+            data += OVERLAY_EDIT_STRUCT.pack(index, content_index)
+        return bytes(data)
+
+    @classmethod
+    def frombytes(cls, layout: Layout, data: bytes) -> Self:
+        node_types = get_node_types()
+        overlay = cls(layout)
+        for index, content_index in OVERLAY_EDIT_STRUCT.iter_unpack(data):
+            if content_index >= len(node_types):
+                overlay.set_content(index, None)
+            else:
+                overlay.set_content(index, node_types[content_index])
+        return overlay
+
+    def save(self, file_path: str) -> None:
+        with open(file_path, mode='wb') as file_object:
+            file_object.write(self.tobytes())
+
+    @classmethod
+    def load(cls, layout: Layout, file_path: str) -> Self:
+        with open(file_path, mode='rb') as file_object:
+            return cls.frombytes(layout, file_object.read())
+
+
+OVERLAY_EDIT_STRUCT = struct.Struct('<HH')
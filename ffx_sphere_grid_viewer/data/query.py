@@ -0,0 +1,178 @@
+from collections.abc import Callable, Collection, Iterator
+from typing import TYPE_CHECKING, Any, Self
+
+from .bitset import iter_bits, to_bitset
+from .node_types import NodeType, get_node_types
+
+if TYPE_CHECKING:
+    from .graph import LayoutGraph
+    from .layout import Layout, LayoutArrays
+    from .overlay import LayoutOverlay
+
+
+class NodeMasks:
+    """Bitsets over the Node indexes of a Layout, one for every content
+    (keyed by its index in `get_node_types()`, `NO_INDEX` for empty and
+    unknown contents) and one for every Cluster.
+    """
+    def __init__(self,
+                 content_masks: dict[int, int],
+                 cluster_masks: list[int],
+                 ) -> None:
+        self.content_masks = content_masks
+        self.cluster_masks = cluster_masks
+
+    @classmethod
+    def from_arrays(cls, arrays: 'LayoutArrays') -> Self:
+        content_masks: dict[int, int] = {}
+        cluster_masks = [0] * len(arrays.cluster_x)
+        for i, (content_index, cluster_index) in enumerate(
+                zip(arrays.content_index, arrays.cluster_index)):
+            bit = 1 << i
+            content_masks[content_index] = (
+                content_masks.get(content_index, 0) | bit)
+            cluster_masks[cluster_index] |= bit
+        return cls(content_masks, cluster_masks)
+
+
+class NodeQuery:
+    """Set of Nodes of a Layout narrowed down by filters.
+
+    The Nodes are kept in a bitset, every filter builds the bitset of
+    the Nodes it accepts and intersects it with the current one, so
+    filters on contents are evaluated once per Node Type instead of once
+    per Node. Filters return a new query and can be chained, queries
+    on the same Layout can be combined with `&`, `|` and `-`. The
+    contents of `overlay` are used if given, otherwise the ones of the
+    Layout.
+    """
+    def __init__(self,
+                 layout: 'Layout',
+                 overlay: 'LayoutOverlay | None' = None,
+                 mask: int | None = None,
+                 ) -> None:
+        self.layout = layout
+        self.overlay = overlay
+        if mask is None:
+            mask = (1 << len(layout.nodes)) - 1
+        self.mask = mask
+
+    def filter(self, mask: int) -> Self:
+        return type(self)(self.layout, self.overlay, self.mask & mask)
+
+    def __and__(self, other: Self) -> Self:
+        return self.filter(other.mask)
+
+    def __or__(self, other: Self) -> Self:
+        return type(self)(self.layout, self.overlay, self.mask | other.mask)
+
+    def __sub__(self, other: Self) -> Self:
+        return self.filter(~other.mask)
+
+    def __len__(self) -> int:
+        return self.mask.bit_count()
+
+    def __iter__(self) -> Iterator[int]:
+        return iter_bits(self.mask)
+
+    def __contains__(self, index: int) -> bool:
+        return bool(self.mask >> index & 1)
+
+    def get_indexes(self) -> list[int]:
+        return list(iter_bits(self.mask))
+
+    def get_content_mask(self,
+                         predicate: Callable[[NodeType | None], bool],
+                         ) -> int:
+        """Nodes whose content satisfies `predicate`, which is called once
+        for every Node Type and once for every edited or custom Node.
+        """
+        node_types = get_node_types()
+        masks = self.layout.node_masks.content_masks
+        mask = 0
+        for content_index, content_mask in masks.items():
+            if content_index < len(node_types):
+                if predicate(node_types[content_index]):
+                    mask |= content_mask
+                continue
+            # missing contents and custom Node Types, one Node at a time
+            nodes = self.layout.nodes
+            mask |= to_bitset(i for i in iter_bits(content_mask)
+                              if predicate(nodes[i].content))
+        if self.overlay is not None and self.overlay.contents:
+            edited = self.overlay.contents
+            mask &= ~to_bitset(edited)
+            mask |= to_bitset(i for i, content in edited.items()
+                              if predicate(content))
+        return mask
+
+    def where(self, predicate: Callable[[NodeType], bool]) -> Self:
+        """Nodes with a content that satisfies `predicate`."""
+        return self.filter(self.get_content_mask(
+            lambda c: c is not None and predicate(c)))
+
+    def where_fields(self, **fields: Any) -> Self:
+        """Nodes whose content has the given values for its fields, like
+        `appearance_type=AppearanceType.SPECIAL`. A field matches any of
+        the values of a set, list or tuple.
+        """
+        def predicate(content: NodeType) -> bool:
+            for name, value in fields.items():
+                field_value = getattr(content, name)
+                if isinstance(value, (set, frozenset, list, tuple)):
+                    if field_value not in value:
+                        return False
+                elif field_value != value:
+                    return False
+            return True
+
+        return self.where(predicate)
+
+    def where_contents(self, *contents: NodeType) -> Self:
+        return self.where(lambda c: c in contents)
+
+    def where_names(self, *names: str) -> Self:
+        """Nodes whose content has one of `names`, ignoring case."""
+        names = {name.lower() for name in names}
+        return self.where(lambda c: c.name.lower() in names)
+
+    def where_effect_bits(self, bits: int) -> Self:
+        """Nodes with all of `bits` set in their `node_effect_bit_field`."""
+        return self.where(lambda c: c.node_effect_bit_field & bits == bits)
+
+    def not_empty(self) -> Self:
+        """Nodes that have a content, so that are drawn."""
+        return self.filter(self.get_content_mask(lambda c: c is not None))
+
+    def in_indexes(self, indexes: Collection[int]) -> Self:
+        return self.filter(to_bitset(indexes))
+
+    def in_clusters(self, *indexes: int) -> Self:
+        cluster_masks = self.layout.node_masks.cluster_masks
+        mask = 0
+        for index in indexes:
+            mask |= cluster_masks[index]
+        return self.filter(mask)
+
+    def in_bbox(self, x_0: float, y_0: float, x_1: float, y_1: float) -> Self:
+        """Nodes inside the bounding box, in Layout coordinates."""
+        return self.filter(to_bitset(
+            self.layout.spatial_index.nodes_in_bbox(x_0, y_0, x_1, y_1)))
+
+    def within_steps(self,
+                     source: int,
+                     steps: int,
+                     max_lock_level: int | None = None,
+                     ) -> Self:
+        """Nodes that can be reached from `source` in at most `steps`
+        moves, see `LayoutGraph`.
+        """
+        distances = self.get_graph().get_distances(source, max_lock_level)
+        return self.filter(to_bitset(
+            i for i, d in enumerate(distances) if 0 <= d <= steps))
+
+    def get_graph(self) -> 'LayoutGraph':
+        graph = self.layout.graph
+        if self.overlay is not None and self.overlay.contents:
+            graph = graph.with_contents(self.overlay.get_content)
+        return graph
@@ -0,0 +1,264 @@
+from collections.abc import Callable, Collection, Iterator
+from itertools import product
+from math import atan2, cos, degrees, dist, floor, inf, radians, sin
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .layout import LayoutArrays
+    from .link_geometry import LinkGeometry
+
+type Bbox = tuple[float, float, float, float]
+
+
+def get_angle(x: float, y: float, centre_x: float, centre_y: float) -> float:
+    # the y axis points down
+    return degrees(atan2(centre_y - y, x - centre_x))
+
+
+def get_arc(x_1: float,
+            y_1: float,
+            x_2: float,
+            y_2: float,
+            centre_x: float,
+            centre_y: float,
+            ) -> tuple[float, float, float]:
+    """Return radius, start angle and extent of the shortest arc between
+    the two points, angles are in degrees and counterclockwise.
+    """
+    radius = dist((x_1, y_1), (centre_x, centre_y))
+    angle_1 = get_angle(x_1, y_1, centre_x, centre_y)
+    angle_2 = get_angle(x_2, y_2, centre_x, centre_y)
+    start = min(angle_1, angle_2)
+    extent = max(angle_1, angle_2) - start
+    if extent >= 180:
+        start = max(angle_1, angle_2)
+        extent = 360 - extent
+    return radius, start, extent
+
+
+def is_angle_in_arc(angle: float, start: float, extent: float) -> bool:
+    return (angle - start) % 360 <= extent
+
+
+def get_arc_bbox(centre_x: float,
+                 centre_y: float,
+                 radius: float,
+                 start: float,
+                 extent: float,
+                 ) -> Bbox:
+    angles = [start, start + extent]
+    angles.extend(a for a in (0, 90, 180, 270)
+                  if is_angle_in_arc(a, start, extent))
+    xs, ys = zip(*(get_point_on_circle(centre_x, centre_y, radius, a)
+                   for a in angles))
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def get_point_on_circle(centre_x: float,
+                        centre_y: float,
+                        radius: float,
+                        angle: float,
+                        ) -> tuple[float, float]:
+    angle = angle % 360
+    # exact values for the cardinal points
+    match angle:
+        case 0:
+            return centre_x + radius, centre_y
+        case 90:
+            return centre_x, centre_y - radius
+        case 180:
+            return centre_x - radius, centre_y
+        case 270:
+            return centre_x, centre_y + radius
+    return (centre_x + radius * cos(radians(angle)),
+            centre_y - radius * sin(radians(angle)))
+
+
+def get_distance_to_segment(x: float,
+                            y: float,
+                            x_1: float,
+                            y_1: float,
+                            x_2: float,
+                            y_2: float,
+                            ) -> float:
+    dx = x_2 - x_1
+    dy = y_2 - y_1
+    length_squared = dx * dx + dy * dy
+    if length_squared == 0:
+        return dist((x, y), (x_1, y_1))
+    t = ((x - x_1) * dx + (y - y_1) * dy) / length_squared
+    t = max(0.0, min(1.0, t))
+    return dist((x, y), (x_1 + t * dx, y_1 + t * dy))
+
+
+def get_distance_to_arc(x: float,
+                        y: float,
+                        centre_x: float,
+                        centre_y: float,
+                        radius: float,
+                        start: float,
+                        extent: float,
+                        ) -> float:
+    if is_angle_in_arc(get_angle(x, y, centre_x, centre_y), start, extent):
+        return abs(dist((x, y), (centre_x, centre_y)) - radius)
+    return min(
+        dist((x, y), get_point_on_circle(centre_x, centre_y, radius, a))
+        for a in (start, start + extent))
+
+
+class SpatialIndex:
+    """Uniform grid over the Node centres and the Link shapes of a Layout.
+
+    Coordinates are the ones of the Layout, not of the canvas.
+    """
+    def __init__(self,
+                 arrays: 'LayoutArrays',
+                 link_geometry: 'LinkGeometry',
+                 cell_size: float = 100,
+                 ) -> None:
+        self.arrays = arrays
+        self.link_geometry = link_geometry
+        self.cell_size = cell_size
+        self.node_cells: dict[tuple[int, int], list[int]] = {}
+        for index, (x, y) in enumerate(zip(arrays.x, arrays.y)):
+            self.node_cells.setdefault(self.get_cell(x, y), []).append(index)
+        self.link_shapes: list[tuple[float, ...]] = []
+        self.link_cells: dict[tuple[int, int], list[int]] = {}
+        for index in range(len(arrays.node_1)):
+            shape, bbox = self.get_link_shape(index)
+            self.link_shapes.append(shape)
+            for cell in self.get_cells(*bbox):
+                self.link_cells.setdefault(cell, []).append(index)
+        cells = [*self.node_cells, *self.link_cells] or [(0, 0)]
+        self.cell_bounds = (min(c[0] for c in cells), min(c[1] for c in cells),
+                            max(c[0] for c in cells), max(c[1] for c in cells))
+
+    def get_link_shape(self, index: int) -> tuple[tuple[float, ...], Bbox]:
+        """Return the shape of a Link and its bounding box.
+
+        The shape is (x_1, y_1, x_2, y_2) for lines and
+        (centre_x, centre_y, radius, start, extent) for arcs.
+        """
+        return (self.link_geometry.get_shape(index),
+                self.link_geometry.get_bbox(index))
+
+    def get_cell(self, x: float, y: float) -> tuple[int, int]:
+        return floor(x / self.cell_size), floor(y / self.cell_size)
+
+    def get_cells(self,
+                  x_0: float,
+                  y_0: float,
+                  x_1: float,
+                  y_1: float,
+                  ) -> Iterator[tuple[int, int]]:
+        cell_x_0, cell_y_0 = self.get_cell(x_0, y_0)
+        cell_x_1, cell_y_1 = self.get_cell(x_1, y_1)
+        return product(range(cell_x_0, cell_x_1 + 1),
+                       range(cell_y_0, cell_y_1 + 1))
+
+    def get_ring_cells(self,
+                       cell_x: int,
+                       cell_y: int,
+                       ring: int,
+                       ) -> Iterator[tuple[int, int]]:
+        if ring == 0:
+            yield cell_x, cell_y
+            return
+        for x in range(cell_x - ring, cell_x + ring + 1):
+            yield x, cell_y - ring
+            yield x, cell_y + ring
+        for y in range(cell_y - ring + 1, cell_y + ring):
+            yield cell_x - ring, y
+            yield cell_x + ring, y
+
+    def find_nearest(self,
+                     cells: dict[tuple[int, int], list[int]],
+                     get_distance: Callable[[int, float, float], float],
+                     x: float,
+                     y: float,
+                     accept: Callable[[int], bool] | None = None,
+                     ) -> tuple[int | None, float]:
+        cell_x, cell_y = self.get_cell(x, y)
+        min_x, min_y, max_x, max_y = self.cell_bounds
+        max_ring = max(abs(cell_x - min_x), abs(cell_x - max_x),
+                       abs(cell_y - min_y), abs(cell_y - max_y))
+        nearest = None
+        nearest_distance = inf
+        seen = set()
+        for ring in range(max_ring + 1):
+            for cell in self.get_ring_cells(cell_x, cell_y, ring):
+                for index in cells.get(cell, ()):
+                    if index in seen:
+                        continue
+                    seen.add(index)
+                    if accept is not None and not accept(index):
+                        continue
+                    distance = get_distance(index, x, y)
+                    if distance < nearest_distance:
+                        nearest = index
+                        nearest_distance = distance
+            # anything outside of the searched cells is further than this
+            if nearest_distance <= ring * self.cell_size:
+                break
+        return nearest, nearest_distance
+
+    def get_node_distance(self, index: int, x: float, y: float) -> float:
+        return dist((x, y), (self.arrays.x[index], self.arrays.y[index]))
+
+    def get_link_distance(self, index: int, x: float, y: float) -> float:
+        shape = self.link_shapes[index]
+        if len(shape) == 4:
+            return get_distance_to_segment(x, y, *shape)
+        return get_distance_to_arc(x, y, *shape)
+
+    def nearest_node(self,
+                     x: float,
+                     y: float,
+                     accept: Callable[[int], bool] | None = None,
+                     ) -> tuple[int | None, float]:
+        """Return the index of the nearest Node centre and its distance."""
+        return self.find_nearest(
+            self.node_cells, self.get_node_distance, x, y, accept)
+
+    def nearest_link(self,
+                     x: float,
+                     y: float,
+                     accept: Callable[[int], bool] | None = None,
+                     ) -> tuple[int | None, float]:
+        """Return the index of the nearest Link and its distance."""
+        return self.find_nearest(
+            self.link_cells, self.get_link_distance, x, y, accept)
+
+    def nearest_ring(self,
+                     x: float,
+                     y: float,
+                     ring_nodes: Collection[int],
+                     ) -> tuple[int | None, float]:
+        """Return the nearest of the Nodes in `ring_nodes`."""
+        if not ring_nodes:
+            return None, inf
+        return self.nearest_node(x, y, ring_nodes.__contains__)
+
+    def nodes_in_bbox(self,
+                      x_0: float,
+                      y_0: float,
+                      x_1: float,
+                      y_1: float,
+                      ) -> list[int]:
+        xs = self.arrays.x
+        ys = self.arrays.y
+        return [index
+                for cell in self.get_cells(x_0, y_0, x_1, y_1)
+                for index in self.node_cells.get(cell, ())
+                if x_0 <= xs[index] <= x_1 and y_0 <= ys[index] <= y_1]
+
+    def links_in_bbox(self,
+                      x_0: float,
+                      y_0: float,
+                      x_1: float,
+                      y_1: float,
+                      ) -> set[int]:
+        """Return the Links whose cells overlap the bounding box."""
+        return {index
+                for cell in self.get_cells(x_0, y_0, x_1, y_1)
+                for index in self.link_cells.get(cell, ())}
@@ -0,0 +1,187 @@
+from collections import Counter
+from collections.abc import Iterable
+
+from .bitset import iter_bits
+from .layout import Layout, LayoutType, get_layout
+from .node_types import AppearanceType, NodeType, get_node_types
+from .overlay import LayoutOverlay
+
+type StatTotal = Counter[AppearanceType]
+type ContentStats = dict[int, tuple[AppearanceType, int]]
+
+
+def get_stat_value(content: NodeType | None) -> int:
+    """Amount a Node adds to its stat, HP and MP weighted like their
+    `display_name`. 0 for Nodes that don't increase a stat.
+    """
+    if content is None or content.appearance_type not in STAT_WEIGHTS:
+        return 0
+    return content.increase_amount * STAT_WEIGHTS[content.appearance_type]
+
+
+def add_stats(totals: StatTotal,
+              content: NodeType | None,
+              sign: int = 1,
+              ) -> None:
+    """Add the stat of `content` to `totals`, remove it if `sign` is -1."""
+    value = get_stat_value(content)
+    if value:
+        stat = content.appearance_type
+        totals[stat] += sign * value
+        if not totals[stat]:
+            del totals[stat]
+
+
+def get_content_stats(layout: Layout) -> ContentStats:
+    """Stat and value of the contents used by `layout` that increase a
+    stat, keyed like `NodeMasks.content_masks`.
+    """
+    node_types = get_node_types()
+    content_stats = {}
+    for content_index in layout.node_masks.content_masks:
+        if content_index >= len(node_types):
+            continue
+        content = node_types[content_index]
+        value = get_stat_value(content)
+        if value:
+            content_stats[content_index] = content.appearance_type, value
+    return content_stats
+
+
+def get_mask_totals(layout: Layout,
+                    mask: int,
+                    content_stats: ContentStats | None = None,
+                    ) -> StatTotal:
+    """Stats given by the Nodes in `mask` with the contents of `layout`.
+
+    Every content is counted at once by intersecting its Node mask with
+    `mask`. Nodes with contents not in `get_node_types()` are counted one
+    by one.
+    """
+    if content_stats is None:
+        content_stats = get_content_stats(layout)
+    node_types_count = len(get_node_types())
+    totals: StatTotal = Counter()
+    for content_index, content_mask in (
+            layout.node_masks.content_masks.items()):
+        stat = content_stats.get(content_index)
+        if stat is not None:
+            count = (content_mask & mask).bit_count()
+            if count:
+                totals[stat[0]] += stat[1] * count
+        elif content_index >= node_types_count:
+            for index in iter_bits(content_mask & mask):
+                add_stats(totals, layout.nodes[index].content)
+    return totals
+
+
+def get_cluster_totals(layout: Layout) -> list[StatTotal]:
+    """Stats given by the Nodes of every Cluster of `layout`."""
+    content_stats = get_content_stats(layout)
+    return [get_mask_totals(layout, cluster_mask, content_stats)
+            for cluster_mask in layout.node_masks.cluster_masks]
+
+
+def get_all_cluster_totals(layout_types: Iterable[LayoutType] | None = None,
+                           ) -> dict[LayoutType, list[StatTotal]]:
+    """Recompute the Cluster totals of the game Layouts in one batch."""
+    if layout_types is None:
+        layout_types = LayoutType
+    return {layout_type: get_cluster_totals(get_layout(layout_type))
+            for layout_type in layout_types}
+
+
+def format_totals(totals: StatTotal) -> str:
+    return ', '.join(f'{STAT_NAMES[stat]} +{totals[stat]}'
+                     for stat in STAT_WEIGHTS if totals[stat])
+
+
+class StatTotals:
+    """Stats given by every Cluster, by the whole Layout and by groups of
+    Nodes (regions, character paths), with the contents of an overlay.
+
+    Edits and changes to the groups only update the totals of the Nodes
+    that changed, `get_mask_totals` is only used for new groups and for
+    groups that change too many Nodes at once.
+    """
+    def __init__(self, overlay: LayoutOverlay) -> None:
+        self.overlay = overlay
+        layout = overlay.layout
+        self.content_stats = get_content_stats(layout)
+        self.cluster_totals = get_cluster_totals(layout)
+        self.totals: StatTotal = sum(self.cluster_totals, Counter())
+        self.cluster_indexes = layout.arrays.cluster_index
+        self.groups: dict[str, int] = {}
+        self.group_totals: dict[str, StatTotal] = {}
+        for index, content in overlay.contents.items():
+            self.update_node(index, layout.nodes[index].content, content)
+
+    def update_node(self,
+                    index: int,
+                    old_content: NodeType | None,
+                    new_content: NodeType | None,
+                    ) -> None:
+        """Move the stats of the Node at `index` from `old_content` to
+        `new_content` in every total that counts it.
+        """
+        bit = 1 << index
+        cluster_index = self.cluster_indexes[index]
+        targets = [self.totals, self.cluster_totals[cluster_index]]
+        targets.extend(self.group_totals[name]
+                       for name, mask in self.groups.items() if mask & bit)
+        for totals in targets:
+            add_stats(totals, old_content, -1)
+            add_stats(totals, new_content)
+
+    def set_group(self, name: str, mask: int) -> StatTotal:
+        """Count the Nodes in `mask` as the group `name`, only adding and
+        removing the Nodes that changed if the group exists already.
+        """
+        old_mask = self.groups.get(name)
+        changed = mask if old_mask is None else mask ^ old_mask
+        if (old_mask is None
+                or changed.bit_count() > len(self.content_stats)):
+            layout = self.overlay.layout
+            totals = get_mask_totals(layout, mask, self.content_stats)
+            for index, content in self.overlay.contents.items():
+                if mask >> index & 1:
+                    add_stats(totals, layout.nodes[index].content, -1)
+                    add_stats(totals, content)
+        else:
+            totals = self.group_totals[name]
+            for index in iter_bits(changed):
+                add_stats(totals, self.overlay.get_content(index),
+                          1 if mask >> index & 1 else -1)
+        self.groups[name] = mask
+        self.group_totals[name] = totals
+        return totals
+
+    def remove_group(self, name: str) -> None:
+        self.groups.pop(name, None)
+        self.group_totals.pop(name, None)
+
+
+STAT_WEIGHTS = {
+    AppearanceType.HP: 50,
+    AppearanceType.MP: 5,
+    AppearanceType.STRENGTH: 1,
+    AppearanceType.DEFENSE: 1,
+    AppearanceType.MAGIC: 1,
+    AppearanceType.MAGIC_DEFENSE: 1,
+    AppearanceType.AGILITY: 1,
+    AppearanceType.LUCK: 1,
+    AppearanceType.EVASION: 1,
+    AppearanceType.ACCURACY: 1,
+}
+STAT_NAMES = {
+    AppearanceType.HP: 'HP',
+    AppearanceType.MP: 'MP',
+    AppearanceType.STRENGTH: 'Strength',
+    AppearanceType.DEFENSE: 'Defense',
+    AppearanceType.MAGIC: 'Magic',
+    AppearanceType.MAGIC_DEFENSE: 'Magic Defense',
+    AppearanceType.AGILITY: 'Agility',
+    AppearanceType.LUCK: 'Luck',
+    AppearanceType.EVASION: 'Evasion',
+    AppearanceType.ACCURACY: 'Accuracy',
+}
@@ -1,6 +1,9 @@
+import struct
 import xml.etree.ElementTree as ET
+from functools import cache
 from logging import getLogger
 
+from .cache import load_cached
 from .utils import get_resource_path, open_cp1252
 
 type Polygon = tuple[tuple[float, float]]
@@ -31,24 +34,75 @@ def load_polygon(file_path: str) -> Polygon:
     return points
 
 
-APPEARANCES = [
-    load_polygon('data_files/icons/l_3_lock.svg'),
-    [],  # no graphic for empty node
-    load_polygon('data_files/icons/strength.svg'),
-    load_polygon('data_files/icons/magic.svg'),
-    load_polygon('data_files/icons/defense.svg'),
-    load_polygon('data_files/icons/magic_defense.svg'),
-    load_polygon('data_files/icons/accuracy.svg'),
-    load_polygon('data_files/icons/evasion.svg'),
-    load_polygon('data_files/icons/luck.svg'),
-    load_polygon('data_files/icons/agility.svg'),
-    load_polygon('data_files/icons/hp.svg'),
-    load_polygon('data_files/icons/mp.svg'),
-    load_polygon('data_files/icons/white_magic.svg'),
-    load_polygon('data_files/icons/black_magic.svg'),
-    load_polygon('data_files/icons/skill.svg'),
-    load_polygon('data_files/icons/special.svg'),
-    load_polygon('data_files/icons/l_4_lock.svg'),
-    load_polygon('data_files/icons/l_2_lock.svg'),
-    load_polygon('data_files/icons/l_1_lock.svg'),
+ICON_FILES = [
+    'data_files/icons/l_3_lock.svg',
+    None,  # no graphic for empty node
+    'data_files/icons/strength.svg',
+    'data_files/icons/magic.svg',
+    'data_files/icons/defense.svg',
+    'data_files/icons/magic_defense.svg',
+    'data_files/icons/accuracy.svg',
+    'data_files/icons/evasion.svg',
+    'data_files/icons/luck.svg',
+    'data_files/icons/agility.svg',
+    'data_files/icons/hp.svg',
+    'data_files/icons/mp.svg',
+    'data_files/icons/white_magic.svg',
+    'data_files/icons/black_magic.svg',
+    'data_files/icons/skill.svg',
+    'data_files/icons/special.svg',
+    'data_files/icons/l_4_lock.svg',
+    'data_files/icons/l_2_lock.svg',
+    'data_files/icons/l_1_lock.svg',
 ]
+
+
+def scale_polygon(polygon: Polygon, zoom: float) -> tuple[float, ...]:
+    """Return the flattened coordinates of `polygon` multiplied by `zoom`."""
+    return tuple(c * zoom for point in polygon for c in point)
+
+
+def translate_coords(coords: tuple[float, ...],
+                     x: float,
+                     y: float,
+                     ) -> list[float]:
+    translated = list(coords)
+    translated[::2] = [c + x for c in coords[::2]]
+    translated[1::2] = [c + y for c in coords[1::2]]
+    return translated
+
+
+def pack_polygons(polygons: list[Polygon]) -> bytes:
+    lengths = [len(polygon) for polygon in polygons]
+    coords = [c for polygon in polygons for point in polygon for c in point]
+    return struct.pack(f'<H{len(lengths)}H{len(coords)}d',
+                       len(lengths), *lengths, *coords)
+
+
+def unpack_polygons(data: memoryview) -> list[Polygon]:
+    (count,) = struct.unpack_from('<H', data)
+    lengths = struct.unpack_from(f'<{count}H', data, 2)
+    coords = struct.unpack_from(f'<{sum(lengths) * 2}d', data, 2 + count * 2)
+    points = list(zip(coords[::2], coords[1::2]))
+    polygons = []
+    start = 0
+    for length in lengths:
+        polygons.append(tuple(points[start:start + length]))
+        start += length
+    return polygons
+
+
+def parse_appearances() -> list[Polygon]:
+    return [tuple() if f is None else load_polygon(f) for f in ICON_FILES]
+
+
+@cache
+def get_appearances() -> list[Polygon]:
+    return load_cached('icons', [f for f in ICON_FILES if f is not None],
+                       parse_appearances, pack_polygons, unpack_polygons)
+
+
+def __getattr__(name: str):
+    if name == 'APPEARANCES':
+        return get_appearances()
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
@@ -1,9 +1,10 @@
 import csv
-from itertools import islice
+from functools import cache
 
 from .utils import get_resource_path, open_cp1252
 
 
+@cache
 def get_text_characters(file_path: str) -> dict[int, str]:
     absolute_file_path = get_resource_path(file_path)
     with open_cp1252(absolute_file_path) as file_object:
@@ -16,13 +17,54 @@ def get_text_characters(file_path: str) -> dict[int, str]:
     return text_characters
 
 
-def bytes_to_string(data: list[int], offset: int) -> str:
-    string = ''
-    for byte in islice(data, offset, None):
-        if byte == 0:
-            break
-        string += TEXT_CHARACTERS.get(byte, f'[0x{byte:x}]')
-    return string
+class StringTable(dict[int, str]):
+    """Null terminated strings of a text block, keyed by their offset.
 
+    Every string is decoded once, offsets that point inside a string are
+    decoded on first lookup.
+    """
+    def __init__(self, data: bytes) -> None:
+        self.data = bytes(data)
+        super().__init__(decode_strings(self.data))
 
-TEXT_CHARACTERS = get_text_characters('data_files/text_characters.csv')
+    def __missing__(self, offset: int) -> str:
+        string = self[offset] = bytes_to_string(self.data, offset)
+        return string
+
+
+@cache
+def get_translation_table() -> dict[int, str]:
+    text_characters = get_text_characters(TEXT_CHARACTERS_FILE)
+    return {byte: text_characters.get(byte, f'[0x{byte:x}]')
+            for byte in range(256)}
+
+
+def decode_bytes(data: bytes) -> str:
+    # latin-1 maps every byte to the code point with the same value
+    return data.decode('latin-1').translate(get_translation_table())
+
+
+def decode_strings(data: bytes) -> dict[int, str]:
+    strings = {}
+    offset = 0
+    for string_bytes in data.split(b'\0'):
+        strings[offset] = decode_bytes(string_bytes)
+        offset += len(string_bytes) + 1
+    return strings
+
+
+def bytes_to_string(data: bytes, offset: int) -> str:
+    data = bytes(data)
+    end = data.find(0, offset)
+    if end == -1:
+        end = len(data)
+    return decode_bytes(data[offset:end])
+
+
+TEXT_CHARACTERS_FILE = 'data_files/text_characters.csv'
+
+
+def __getattr__(name: str):
+    if name == 'TEXT_CHARACTERS':
+        return get_text_characters(TEXT_CHARACTERS_FILE)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
@@ -3,15 +3,9 @@ import sys
 from functools import partial
 
 
-def s16(integer: int) -> int:
-    return ((integer & 0xffff) ^ 0x8000) - 0x8000
-
-
-def add_bytes(*values: int) -> int:
-    value = 0
-    for position, byte in enumerate(values):
-        value += byte * (256 ** position)
-    return value
+def hex_csv_to_bytes(data: str) -> bytes:
+    """Convert comma/newline separated hex byte values to bytes."""
+    return bytes.fromhex(data.replace(',', ' '))
 
 
 def get_resource_path(relative_path: str,
@@ -0,0 +1,63 @@
+import tkinter as tk
+from math import ceil
+from time import perf_counter
+from typing import Callable
+
+
+class EventCoalescer:
+    """Merges bursts of events into at most one update per frame.
+
+    Updates are scheduled by key, scheduling a key that is already pending
+    replaces its callback, so only the last one runs. The pending updates
+    run together once Tk is idle, but not sooner than `interval`
+    milliseconds after the previous ones.
+    """
+    def __init__(self,
+                 widget: tk.Misc,
+                 interval: int | None = None,
+                 ) -> None:
+        self.widget = widget
+        if interval is None:
+            interval = FRAME_INTERVAL
+        self.interval = interval
+        self.pending: dict[str, Callable[[], None]] = {}
+        self.after_id: str | None = None
+        self.last_flush = 0.0
+
+    def schedule(self, key: str, callback: Callable[[], None]) -> None:
+        self.pending[key] = callback
+        if self.after_id is not None:
+            return
+        elapsed = (perf_counter() - self.last_flush) * 1000
+        if elapsed >= self.interval:
+            self.after_id = self.widget.after_idle(self.flush)
+        else:
+            self.after_id = self.widget.after(
+                ceil(self.interval - elapsed), self.flush)
+
+    def is_pending(self, key: str) -> bool:
+        return key in self.pending
+
+    def cancel(self) -> None:
+        """Drop the pending updates without running them."""
+        if self.after_id is not None:
+            self.widget.after_cancel(self.after_id)
+            self.after_id = None
+        self.pending.clear()
+
+    def flush(self) -> None:
+        """Run the pending updates now, in the order they were first
+        scheduled.
+        """
+        pending = self.pending
+        self.pending = {}
+        if self.after_id is not None:
+            self.widget.after_cancel(self.after_id)
+            self.after_id = None
+        for callback in pending.values():
+            callback()
+        self.last_flush = perf_counter()
+
+
+# milliseconds, about 60 updates per second
+FRAME_INTERVAL = 16
@@ -0,0 +1,103 @@
+from .data.bitset import iter_bits, to_bitset
+
+# the bitset helpers are used with the highlights by the canvases
+__all__ = ['HighlightState', 'iter_bits', 'to_bitset']
+
+
+class HighlightState:
+    """Highlighted Nodes and Links of a Layout, one bitset over the Node
+    indexes and one over the Link indexes for each character.
+
+    Characters are identified by their color, the empty string is used
+    for Nodes highlighted by no one in particular. A Node is highlighted
+    if any character highlighted it, a Link belongs to at most one
+    character and is drawn with its color.
+
+    The methods that change the state return the bitset of what actually
+    changed, so that the canvas only updates those items.
+    """
+    def __init__(self) -> None:
+        self.nodes: dict[str, int] = {}
+        self.links: dict[str, int] = {}
+
+    def get_nodes(self, *characters: str) -> int:
+        """Union of the Nodes of `characters`, of everyone if none."""
+        return self.union(self.nodes, characters)
+
+    def get_links(self, *characters: str) -> int:
+        """Union of the Links of `characters`, of everyone if none."""
+        return self.union(self.links, characters)
+
+    def get_common_nodes(self, *characters: str) -> int:
+        """Nodes highlighted by all of `characters`."""
+        return self.intersection(self.nodes, characters)
+
+    @staticmethod
+    def union(bitsets: dict[str, int], characters: tuple[str, ...]) -> int:
+        if not characters:
+            characters = tuple(bitsets)
+        union = 0
+        for character in characters:
+            union |= bitsets.get(character, 0)
+        return union
+
+    @staticmethod
+    def intersection(bitsets: dict[str, int],
+                     characters: tuple[str, ...],
+                     ) -> int:
+        if not characters:
+            return 0
+        intersection = -1
+        for character in characters:
+            intersection &= bitsets.get(character, 0)
+        return intersection
+
+    def is_node_highlighted(self, index: int) -> bool:
+        return bool(self.get_nodes() >> index & 1)
+
+    def get_link_character(self, index: int) -> str | None:
+        for character, bitset in self.links.items():
+            if bitset >> index & 1:
+                return character
+        return None
+
+    def add_nodes(self, character: str, bitset: int) -> int:
+        """Highlight the Nodes in `bitset` for `character`, return the
+        ones that were turned off before.
+        """
+        changed = bitset & ~self.get_nodes()
+        self.nodes[character] = self.nodes.get(character, 0) | bitset
+        return changed
+
+    def remove_nodes(self, bitset: int) -> int:
+        """Turn off the Nodes in `bitset` for everyone, return the ones
+        that were highlighted before.
+        """
+        changed = bitset & self.get_nodes()
+        for character in self.nodes:
+            self.nodes[character] &= ~bitset
+        return changed
+
+    def set_links(self, character: str | None, bitset: int) -> int:
+        """Give the Links in `bitset` to `character`, or to no one if None,
+        return the ones whose character changed.
+        """
+        if character is None:
+            changed = bitset & self.get_links()
+        else:
+            changed = bitset & ~self.links.get(character, 0)
+        for other, links in self.links.items():
+            if other != character:
+                self.links[other] = links & ~bitset
+        if character is not None:
+            self.links[character] = self.links.get(character, 0) | bitset
+        return changed
+
+    def clear(self) -> tuple[int, int]:
+        """Turn off everything, return the Nodes and Links that were
+        highlighted.
+        """
+        changed = self.get_nodes(), self.get_links()
+        self.nodes.clear()
+        self.links.clear()
+        return changed
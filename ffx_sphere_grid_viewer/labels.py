@@ -0,0 +1,232 @@
+from collections.abc import Iterable
+from itertools import product
+from math import ceil, cos, dist, floor, radians, sin
+
+from .data.spatial import SpatialIndex, get_point_on_circle
+
+type Rectangle = tuple[float, float, float, float]
+# ('circle', x, y, radius), ('segment', x_1, y_1, x_2, y_2, half_width)
+# or ('rectangle', x_0, y_0, x_1, y_1)
+type Obstacle = tuple[str, *tuple[float, ...]]
+type Placement = tuple[float, float, bool]
+
+
+def rectangle_overlaps_circle(rectangle: Rectangle,
+                              x: float,
+                              y: float,
+                              radius: float,
+                              ) -> bool:
+    x_0, y_0, x_1, y_1 = rectangle
+    nearest_x = min(max(x, x_0), x_1)
+    nearest_y = min(max(y, y_0), y_1)
+    return dist((x, y), (nearest_x, nearest_y)) < radius
+
+
+def rectangle_overlaps_segment(rectangle: Rectangle,
+                               x_1: float,
+                               y_1: float,
+                               x_2: float,
+                               y_2: float,
+                               half_width: float,
+                               ) -> bool:
+    # Liang-Barsky clipping against the rectangle grown by the line width
+    x_min, y_min, x_max, y_max = rectangle
+    x_min -= half_width
+    y_min -= half_width
+    x_max += half_width
+    y_max += half_width
+    dx = x_2 - x_1
+    dy = y_2 - y_1
+    t_0, t_1 = 0.0, 1.0
+    for p, q in ((-dx, x_1 - x_min), (dx, x_max - x_1),
+                 (-dy, y_1 - y_min), (dy, y_max - y_1)):
+        if p == 0:
+            if q < 0:
+                return False
+            continue
+        t = q / p
+        if p < 0:
+            t_0 = max(t_0, t)
+        else:
+            t_1 = min(t_1, t)
+        if t_0 > t_1:
+            return False
+    return True
+
+
+def rectangles_overlap(a: Rectangle, b: Rectangle) -> bool:
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+def obstacle_overlaps(obstacle: Obstacle, rectangle: Rectangle) -> bool:
+    kind, *values = obstacle
+    match kind:
+        case 'circle':
+            return rectangle_overlaps_circle(rectangle, *values)
+        case 'segment':
+            return rectangle_overlaps_segment(rectangle, *values)
+        case _:
+            return rectangles_overlap(rectangle, values)
+
+
+def get_obstacle_bbox(obstacle: Obstacle) -> Rectangle:
+    kind, *values = obstacle
+    match kind:
+        case 'circle':
+            x, y, radius = values
+            return x - radius, y - radius, x + radius, y + radius
+        case 'segment':
+            x_1, y_1, x_2, y_2, half_width = values
+            return (min(x_1, x_2) - half_width, min(y_1, y_2) - half_width,
+                    max(x_1, x_2) + half_width, max(y_1, y_2) + half_width)
+        case _:
+            return tuple(values)
+
+
+class LabelSolver:
+    """Places Node labels so that they don't overlap Nodes, Links, leader
+    lines and other labels.
+
+    Works in Layout coordinates (zoom 1.0) without any Tk calls, the
+    placements can be applied to any canvas and reused across redraws.
+    """
+    def __init__(self,
+                 spatial_index: SpatialIndex,
+                 node_radii: dict[int, float],
+                 label_sizes: dict[int, tuple[float, float]],
+                 link_width: float,
+                 cell_size: float = 50,
+                 ) -> None:
+        self.arrays = spatial_index.arrays
+        self.label_sizes = dict(label_sizes)
+        self.cell_size = cell_size
+        self.cells: dict[tuple[int, int], list[Obstacle]] = {}
+        self.owners: dict[tuple[str, int], list[Obstacle]] = {}
+        self.placements: dict[int, Placement] = {}
+        for index, radius in node_radii.items():
+            self.set_node_radius(index, radius)
+        for index, shape in enumerate(spatial_index.link_shapes):
+            if len(shape) == 4:
+                points = [shape[:2], shape[2:]]
+            else:
+                centre_x, centre_y, radius, start, extent = shape
+                steps = max(1, ceil(extent / ARC_STEP))
+                points = [get_point_on_circle(
+                    centre_x, centre_y, radius, start + extent * i / steps)
+                    for i in range(steps + 1)]
+            for (x_1, y_1), (x_2, y_2) in zip(points, points[1:]):
+                self.add_obstacle(('link', index), (
+                    'segment', x_1, y_1, x_2, y_2, link_width / 2))
+
+    def get_cells(self, rectangle: Rectangle) -> Iterable[tuple[int, int]]:
+        x_0, y_0, x_1, y_1 = rectangle
+        size = self.cell_size
+        return product(range(floor(x_0 / size), floor(x_1 / size) + 1),
+                       range(floor(y_0 / size), floor(y_1 / size) + 1))
+
+    def add_obstacle(self, owner: tuple[str, int], obstacle: Obstacle) -> None:
+        self.owners.setdefault(owner, []).append(obstacle)
+        for cell in self.get_cells(get_obstacle_bbox(obstacle)):
+            self.cells.setdefault(cell, []).append(obstacle)
+
+    def remove_obstacles(self, owner: tuple[str, int]) -> None:
+        for obstacle in self.owners.pop(owner, ()):
+            for cell in self.get_cells(get_obstacle_bbox(obstacle)):
+                self.cells[cell].remove(obstacle)
+
+    def is_free(self, rectangle: Rectangle) -> bool:
+        for cell in self.get_cells(rectangle):
+            for obstacle in self.cells.get(cell, ()):
+                if obstacle_overlaps(obstacle, rectangle):
+                    return False
+        return True
+
+    def set_node_radius(self, index: int, radius: float | None) -> None:
+        self.remove_obstacles(('node', index))
+        if radius is not None:
+            self.add_obstacle(('node', index), (
+                'circle', self.arrays.x[index], self.arrays.y[index], radius))
+
+    def set_label_size(self,
+                       index: int,
+                       size: tuple[float, float] | None,
+                       ) -> None:
+        if size is None:
+            self.label_sizes.pop(index, None)
+        else:
+            self.label_sizes[index] = size
+
+    def get_label_rectangle(self, index: int, x: float, y: float) -> Rectangle:
+        width, height = self.label_sizes[index]
+        # the visual size of the text is smaller than its bounding box
+        half_width = width / 2 - LABEL_MARGIN
+        half_height = height / 2 - LABEL_MARGIN
+        return x - half_width, y - half_height, x + half_width, y + half_height
+
+    def remove_label(self, index: int) -> None:
+        self.placements.pop(index, None)
+        self.remove_obstacles(('label', index))
+        self.remove_obstacles(('leader', index))
+
+    def add_label(self, index: int, placement: Placement) -> None:
+        self.placements[index] = placement
+        dx, dy, leader = placement
+        x, y = self.arrays.x[index], self.arrays.y[index]
+        self.add_obstacle(('label', index), (
+            'rectangle', *self.get_label_rectangle(index, x + dx, y + dy)))
+        if leader:
+            self.add_obstacle(('leader', index), (
+                'segment', x, y, x + dx, y + dy, LEADER_WIDTH / 2))
+
+    def place(self,
+              index: int,
+              leader_distance: float | None = None,
+              ) -> Placement | None:
+        """Find a free position for the label of a Node and reserve it.
+
+        A leader line is added when the label ends up at least
+        `leader_distance` away from the Node.
+        """
+        self.remove_label(index)
+        if index not in self.label_sizes:
+            return None
+        x, y = self.arrays.x[index], self.arrays.y[index]
+        placement = (0.0, 0.0, False)
+        for distance, dx, dy in SEARCH_OFFSETS:
+            if self.is_free(self.get_label_rectangle(index, x + dx, y + dy)):
+                leader = (leader_distance is not None
+                          and distance >= leader_distance)
+                placement = (dx, dy, leader)
+                break
+        self.add_label(index, placement)
+        return placement
+
+    def solve(self,
+              indexes: Iterable[int],
+              leader_indexes: set[int],
+              leader_distance: float,
+              ) -> dict[int, Placement]:
+        """Place the labels in order, only `leader_indexes` get leader
+        lines. Returns all the current placements.
+        """
+        for index in indexes:
+            if index in leader_indexes:
+                self.place(index, leader_distance)
+            else:
+                self.place(index)
+        return self.placements
+
+    def apply(self, placements: dict[int, Placement]) -> None:
+        """Reserve previously computed placements without searching."""
+        for index, placement in placements.items():
+            self.remove_label(index)
+            self.add_label(index, placement)
+
+
+ARC_STEP = 5
+LABEL_MARGIN = 2
+LEADER_WIDTH = 1
+# same spiral as the original canvas based search
+SEARCH_OFFSETS = [(r, r * cos(radians(angle)), r * sin(radians(angle)))
+                  for r, angle in product(range(20, 1000, 2),
+                                          range(45, 360 + 45, 45))]
@@ -2,13 +2,19 @@ import logging
 import tkinter as tk
 from tkinter import messagebox
 
-from .data.layout import (LAYOUT_EXPERT, LAYOUT_ORIGINAL, LAYOUT_STANDARD,
-                          Layout)
+from .data.layout import Layout, LayoutType, get_layout
+from .data.stats import StatTotals, format_totals
 from .logger import UIHandler, log_exceptions, log_tkinter_error
+from .profiler import PROFILE_FILE, PROFILER
+from .scene import BACKGROUND_COLOR
 from .screenshot import save_screenshot
-from .tkspheregrid import (KEY_TO_APPEARANCE_TYPE, KEY_TO_CHAR_NAME,
-                           TkSphereGrid)
+from .tklayoutstack import SphereGridCanvas, TkLayoutStack
+from .tkprofiler import enable_tk_profiling
+from .tkspheregrid import (KEY_TO_APPEARANCE_TYPE, KEY_TO_CHAR_COLOR,
+                           KEY_TO_CHAR_NAME, TkSphereGrid)
 from .tkstatuslabel import TkStatusLabel
+from .tktiledspheregrid import TkTiledSphereGrid
+from .tkvirtualspheregrid import TkVirtualSphereGrid
 
 
 def show_help_window(title: str) -> None:
@@ -25,7 +31,11 @@ def show_help_window(title: str) -> None:
         'F6: load the Original Sphere Grid',
         'F7: load the Standard Sphere Grid',
         'F8: load the Expert Sphere Grid',
-        'F9: save a screenshot of the Sphere Grid (.png, visible part)',
+        'F9: save a screenshot of the Sphere Grid (.png, whole grid)',
+        'Every Sphere Grid keeps its changes when loading another one,',
+        'loading the one shown again resets it',
+        'The stats given by the Nodes highlighted by each Character',
+        'are shown at the bottom and follow the edits',
         'The following hotkeys will act based on Mouse position:',
         f'- {edit_node}: change Node Contents',
         f'- {characters}: highlight a Node or color a Link',
@@ -38,13 +48,32 @@ def show_help_window(title: str) -> None:
     messagebox.showinfo(title, '\n'.join(lines))
 
 
+def get_stats_text(stats: StatTotals) -> str:
+    """One line for each character path and region that gives some stat,
+    the whole Sphere Grid if there are none.
+    """
+    names = {KEY_TO_CHAR_COLOR[c]: n for c, n in KEY_TO_CHAR_NAME.items()}
+    names[''] = 'Highlighted'
+    lines = [f'{names.get(name, name)}: {format_totals(totals)}'
+             for name, totals in stats.group_totals.items() if totals]
+    if not lines:
+        lines.append(f'Sphere Grid: {format_totals(stats.totals)}')
+    return '\n'.join(lines)
+
+
 @log_exceptions()
 def main(*,
          title='FFX Sphere Grid viewer',
          size='1280x720',
          layout: Layout | None = None,
+         tiled: bool = False,
+         virtual: bool = False,
+         profile: bool = False,
          ) -> None:
     root = tk.Tk()
+    if profile:
+        # before creating any widget, so that their Tcl calls are counted
+        enable_tk_profiling(PROFILER, root)
     root.report_callback_exception = log_tkinter_error
     root.protocol('WM_DELETE_WINDOW', root.quit)
     root.title(title)
@@ -53,44 +82,73 @@ def main(*,
     root.columnconfigure(0, weight=1)
     root.rowconfigure(0, weight=1)
 
-    canvas = TkSphereGrid(
-        root, background=BACKGROUND_COLOR, borderwidth=0, highlightthickness=0)
-    canvas.grid(row=0, column=0, sticky='nsew')
-
-    xsb = tk.Scrollbar(root, orient='horizontal', command=canvas.xview)
+    if tiled:
+        canvas_class = TkTiledSphereGrid
+    elif virtual:
+        canvas_class = TkVirtualSphereGrid
+    else:
+        canvas_class = TkSphereGrid
+    xsb = tk.Scrollbar(
+        root, orient='horizontal', command=lambda *a: stack.canvas.xview(*a))
     xsb.grid(row=1, column=0, sticky='ew')
 
-    ysb = tk.Scrollbar(root, orient='vertical', command=canvas.yview)
+    ysb = tk.Scrollbar(
+        root, orient='vertical', command=lambda *a: stack.canvas.yview(*a))
     ysb.grid(row=0, column=1, sticky='ns')
 
-    canvas.configure(yscrollcommand=ysb.set, xscrollcommand=xsb.set)
-    canvas.bind('<ButtonPress-1>', lambda e: canvas.scan_mark(e.x, e.y))
-    canvas.bind('<B1-Motion>', lambda e: canvas.scan_dragto(e.x, e.y, gain=1))
-    canvas.bind('<MouseWheel>', canvas.on_scrollwheel)
+    stats_label = tk.Label(root, anchor='w', justify='left')
+    stats_label.grid(row=3, column=0, columnspan=2, sticky='ew')
+
+    def show_stats(stats: StatTotals) -> None:
+        stats_label.configure(text=get_stats_text(stats))
+
+    def show_layout(layout: Layout) -> None:
+        stack.draw_layout(layout)
+        show_stats(stack.canvas.stats)
+
+    def setup_canvas(canvas: SphereGridCanvas) -> None:
+        canvas.stats_listeners.append(show_stats)
+        canvas.configure(yscrollcommand=ysb.set, xscrollcommand=xsb.set)
+        canvas.bind('<ButtonPress-1>', canvas.on_drag_start)
+        canvas.bind('<B1-Motion>', canvas.on_drag)
+        canvas.bind('<MouseWheel>', canvas.on_scrollwheel)
+
+    # every Layout keeps its own canvas, switching back to it is instant
+    stack = TkLayoutStack(
+        root, canvas_class, setup_canvas, background=BACKGROUND_COLOR,
+        borderwidth=0, highlightthickness=0)
+    stack.grid(row=0, column=0, sticky='nsew')
+
     for c in KEY_TO_CHAR_NAME:
-        root.bind(f'<KeyPress-{c}>', canvas.highlight_nearest)
-        root.bind(f'<KeyPress-{c.upper()}>', canvas.add_character_circle)
-        root.bind(f'<Control-KeyPress-{c}>', canvas.add_character_flag)
+        root.bind(f'<KeyPress-{c}>',
+                  lambda e: stack.canvas.highlight_nearest(e))
+        root.bind(f'<KeyPress-{c.upper()}>',
+                  lambda e: stack.canvas.add_character_circle(e))
+        root.bind(f'<Control-KeyPress-{c}>',
+                  lambda e: stack.canvas.add_character_flag(e))
     for c in KEY_TO_APPEARANCE_TYPE:
-        root.bind(f'<KeyPress-{c}>', canvas.edit_node)
+        root.bind(f'<KeyPress-{c}>', lambda e: stack.canvas.edit_node(e))
 
     buttons = [
         ('<F1>', lambda _=None: show_help_window(f'{title} - Help'), 'Help'),
-        ('<F2>', canvas.highlight_all, 'Highlight'),
-        ('<F3>', canvas.turn_off_all, 'Off'),
-        ('<F4>', lambda: canvas.set_zoom(1.0), 'Reset Zoom'),
+        ('<F2>', lambda _=None: stack.canvas.highlight_all(), 'Highlight'),
+        ('<F3>', lambda _=None: stack.canvas.turn_off_all(), 'Off'),
+        ('<F4>', lambda _=None: stack.canvas.set_zoom(1.0), 'Reset Zoom'),
     ]
     if layout is None:
-        canvas.draw_layout(LAYOUT_ORIGINAL)
+        show_layout(get_layout(LayoutType.ORIGINAL))
     else:
         buttons.append(
-            ('<F5>', lambda _=None: canvas.draw_layout(layout), 'Custom'))
-        canvas.draw_layout(layout)
+            ('<F5>', lambda _=None: show_layout(layout), 'Custom'))
+        show_layout(layout)
     buttons.extend([
-        ('<F6>', lambda _=None: canvas.draw_layout(LAYOUT_ORIGINAL), 'Original'),
-        ('<F7>', lambda _=None: canvas.draw_layout(LAYOUT_STANDARD), 'Standard'),
-        ('<F8>', lambda _=None: canvas.draw_layout(LAYOUT_EXPERT), 'Expert'),
-        ('<F9>', lambda _=None: save_screenshot(canvas), 'Screenshot'),
+        ('<F6>', lambda _=None: show_layout(
+            get_layout(LayoutType.ORIGINAL)), 'Original'),
+        ('<F7>', lambda _=None: show_layout(
+            get_layout(LayoutType.STANDARD)), 'Standard'),
+        ('<F8>', lambda _=None: show_layout(
+            get_layout(LayoutType.EXPERT)), 'Expert'),
+        ('<F9>', lambda _=None: save_screenshot(stack.canvas), 'Screenshot'),
     ])
     frame = tk.Frame(root)
     frame.grid(row=2, column=0, columnspan=2, sticky='nsew')
@@ -109,8 +167,12 @@ def main(*,
     handler.setFormatter(formatter)
     handler.setLevel(logging.INFO)
     logging.getLogger(__name__.split('.')[0]).addHandler(handler)
+    PROFILER.listeners.append(
+        lambda name, seconds, tcl_calls: status_label.show_timing(
+            f'{name}: {seconds * 1000:.1f} ms, {tcl_calls} Tcl calls'))
 
     root.mainloop()
+    if profile:
+        PROFILER.dump(PROFILE_FILE)
+        logging.getLogger(__name__).info(f'Saved profile to {PROFILE_FILE}')
 
-
-BACKGROUND_COLOR = '#f2f2f2'
@@ -0,0 +1,123 @@
+import json
+from collections import Counter, deque
+from functools import wraps
+from time import perf_counter
+from typing import Any, Callable
+
+
+def get_bucket(milliseconds: float) -> str:
+    for upper_bound in BUCKETS:
+        if milliseconds < upper_bound:
+            return f'<{upper_bound}'
+    return f'>={BUCKETS[-1]}'
+
+
+def get_percentile(values: list[float], fraction: float) -> float:
+    """Nearest rank percentile of sorted `values`."""
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+class Profiler:
+    """Times the operations decorated with `profiled` while enabled.
+
+    The last `window` samples of every operation are kept to build its
+    latency histogram. Listeners are called after every operation that
+    is not nested in another one. Tcl calls are counted with
+    `tcl_call_counter` if set, see `tkprofiler`.
+    """
+    def __init__(self, window: int | None = None) -> None:
+        if window is None:
+            window = WINDOW
+        self.enabled = False
+        self.window = window
+        # duration in seconds and Tcl calls of the last samples
+        self.samples: dict[str, deque[tuple[float, int]]] = {}
+        self.counts: Counter[str] = Counter()
+        # returns the Tcl calls made so far
+        self.tcl_call_counter: Callable[[], int] | None = None
+        self.listeners: list[Callable[[str, float, int], None]] = []
+        self.depth = 0
+
+    def enable(self) -> None:
+        self.enabled = True
+
+    def get_tcl_calls(self) -> int:
+        if self.tcl_call_counter is None:
+            return 0
+        return self.tcl_call_counter()
+
+    def run(self,
+            name: str,
+            func: Callable,
+            args: tuple,
+            kwargs: dict[str, Any],
+            ) -> Any:
+        tcl_calls = self.get_tcl_calls()
+        self.depth += 1
+        start = perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            seconds = perf_counter() - start
+            self.depth -= 1
+            tcl_calls = self.get_tcl_calls() - tcl_calls
+            self.record(name, seconds, tcl_calls)
+            if self.depth == 0:
+                for listener in self.listeners:
+                    listener(name, seconds, tcl_calls)
+
+    def record(self, name: str, seconds: float, tcl_calls: int) -> None:
+        samples = self.samples.get(name)
+        if samples is None:
+            samples = self.samples[name] = deque(maxlen=self.window)
+        samples.append((seconds, tcl_calls))
+        self.counts[name] += 1
+
+    def get_profile(self) -> dict[str, dict[str, Any]]:
+        profile = {}
+        for name, samples in sorted(self.samples.items()):
+            durations = sorted(seconds * 1000 for seconds, _ in samples)
+            histogram = Counter(get_bucket(d) for d in durations)
+            profile[name] = {
+                'count': self.counts[name],
+                'window': len(durations),
+                'mean_ms': sum(durations) / len(durations),
+                'p50_ms': get_percentile(durations, 0.5),
+                'p90_ms': get_percentile(durations, 0.9),
+                'p99_ms': get_percentile(durations, 0.99),
+                'max_ms': durations[-1],
+                'mean_tcl_calls': sum(c for _, c in samples) / len(samples),
+                'histogram_ms': {bucket: histogram[bucket]
+                                 for bucket in BUCKET_LABELS
+                                 if bucket in histogram},
+            }
+        return profile
+
+    def dump(self, file_path: str) -> None:
+        with open(file_path, 'w') as file_object:
+            json.dump(self.get_profile(), file_object, indent=2)
+
+
+def profiled(name: str | None = None):
+    """Time the decorated function with `PROFILER`, under its qualified
+    name unless `name` is given. Only checks a flag while disabled.
+    """
+    def decorator(func):
+        label = func.__qualname__ if name is None else name
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not PROFILER.enabled:
+                return func(*args, **kwargs)
+            return PROFILER.run(label, func, args, kwargs)
+        return wrapper
+    return decorator
+
+
+# samples kept for each operation
+WINDOW = 1000
+# upper bounds of the histogram buckets, in milliseconds
+BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+BUCKET_LABELS = (*(f'<{b}' for b in BUCKETS), f'>={BUCKETS[-1]}')
+PROFILE_FILE = 'ffx_sphere_grid_viewer_profile.json'
+PROFILER = Profiler()
@@ -0,0 +1,296 @@
+import argparse
+import json
+import os
+import random
+import struct
+import sys
+import time
+from collections.abc import Iterable, Iterator, Sequence
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+
+from .data.graph import IMPASSABLE, LOCK_LEVELS
+from .data.layout import NO_INDEX, Layout, LayoutType, get_layout
+from .data.node_types import AppearanceType, get_node_types
+from .data.stats import STAT_WEIGHTS
+
+
+@dataclass(frozen=True)
+class Budget:
+    """Bounds for the total of some values over the contents of a region.
+
+    `values` maps every content byte to its value, like a table for
+    `bytes.translate`, and the total is multiplied by `weight`. With the
+    Key Sphere locks as values and a maximum of 0, a region can't have
+    any lock.
+    """
+    name: str
+    nodes: tuple[int, ...]
+    values: bytes
+    minimum: int = 0
+    maximum: int | None = None
+    weight: int = 1
+
+    def get_total(self, contents: bytes) -> int:
+        values = contents.translate(self.values)
+        return sum(map(values.__getitem__, self.nodes)) * self.weight
+
+    def check(self, contents: bytes) -> bool:
+        total = self.get_total(contents)
+        if total < self.minimum:
+            return False
+        return self.maximum is None or total <= self.maximum
+
+
+@dataclass
+class SeedBatch:
+    """Seeds checked together by a worker and the contents of the ones
+    that satisfied every Budget.
+    """
+    seeds: range
+    accepted: list[tuple[int, bytes]]
+
+
+def get_contents_table(layout: Layout) -> bytes:
+    """Contents of `layout` with one byte per Node, like dat09 without
+    its header. Missing contents are 0xff.
+    """
+    return bytes(MISSING_CONTENT if i == NO_INDEX else i
+                 for i in layout.arrays.content_index)
+
+
+def get_lock_values() -> bytes:
+    """1 for the contents that are Key Sphere locks, 0 otherwise."""
+    values = bytearray(256)
+    for i, node_type in enumerate(get_node_types()):
+        if node_type.appearance_type in LOCK_LEVELS:
+            values[i] = 1
+    return bytes(values)
+
+
+def get_stat_values(stat: AppearanceType) -> bytes:
+    """`increase_amount` of the contents that increase `stat`."""
+    values = bytearray(256)
+    for i, node_type in enumerate(get_node_types()):
+        if node_type.appearance_type is stat:
+            values[i] = node_type.increase_amount
+    return bytes(values)
+
+
+def get_region(layout: Layout, source: int, steps: int) -> tuple[int, ...]:
+    """Nodes at most `steps` moves from `source`, crossing any lock since
+    the locks are moved too.
+    """
+    distances = layout.graph.get_distances(source, IMPASSABLE - 1)
+    return tuple(i for i, d in enumerate(distances) if 0 <= d <= steps)
+
+
+def get_movable_nodes(contents: bytes,
+                      fixed: Iterable[AppearanceType] = (),
+                      ) -> tuple[int, ...]:
+    """Nodes whose content can be shuffled: every Node with a content,
+    except the ones with an appearance type in `fixed`.
+    """
+    node_types = get_node_types()
+    fixed = set(fixed)
+    return tuple(i for i, c in enumerate(contents)
+                 if c < len(node_types)
+                 and node_types[c].appearance_type not in fixed)
+
+
+def shuffle_contents(contents: bytes,
+                     movable: Sequence[int],
+                     seed: int,
+                     ) -> bytes:
+    """Shuffle the contents of the `movable` Nodes with a RNG seeded with
+    `seed`, the same seed always gives the same contents.
+    """
+    pool = [contents[i] for i in movable]
+    random.Random(seed).shuffle(pool)
+    shuffled = bytearray(contents)
+    for index, content in zip(movable, pool):
+        shuffled[index] = content
+    return bytes(shuffled)
+
+
+def check_seeds(contents: bytes,
+                movable: tuple[int, ...],
+                budgets: tuple[Budget, ...],
+                seeds: range,
+                ) -> SeedBatch:
+    accepted = []
+    for seed in seeds:
+        shuffled = shuffle_contents(contents, movable, seed)
+        if all(budget.check(shuffled) for budget in budgets):
+            accepted.append((seed, shuffled))
+    return SeedBatch(seeds, accepted)
+
+
+def randomize(contents: bytes,
+              movable: tuple[int, ...],
+              budgets: Sequence[Budget],
+              seeds: range,
+              max_workers: int | None = None,
+              chunk_size: int | None = None,
+              ) -> Iterator[SeedBatch]:
+    """Check `seeds` in a process pool, `chunk_size` at a time, yielding
+    every batch as soon as it is checked. Only a few batches per worker
+    are queued at a time.
+    """
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    if chunk_size is None:
+        chunk_size = CHUNK_SIZE
+    budgets = tuple(budgets)
+    max_pending = max_workers * 4
+    chunks = (seeds[i:i + chunk_size]
+              for i in range(0, len(seeds), chunk_size))
+    with ProcessPoolExecutor(max_workers) as executor:
+        pending = set()
+        while True:
+            for chunk in chunks:
+                pending.add(executor.submit(
+                    check_seeds, contents, movable, budgets, chunk))
+                if len(pending) >= max_pending:
+                    break
+            if not pending:
+                return
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+
+def iter_records(data: bytes, node_count: int) -> Iterator[tuple[int, bytes]]:
+    """Read back the (seed, contents) records written by `main`."""
+    record_length = SEED_STRUCT.size + node_count
+    for start in range(0, len(data), record_length):
+        (seed,) = SEED_STRUCT.unpack_from(data, start)
+        yield seed, data[start + SEED_STRUCT.size:start + record_length]
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='python -m ffx_sphere_grid_viewer.randomizer',
+        description='Shuffle the Node contents of a Sphere Grid for a range '
+                    'of seeds and write the ones that satisfy the '
+                    'constraints as binary records: the seed (uint32, '
+                    'little endian) followed by one byte per Node, like '
+                    'dat09 without its header.')
+    parser.add_argument(
+        '-l', '--layout', choices=[t.name.lower() for t in LayoutType],
+        default='original', help='Sphere Grid Layout (default: original)')
+    parser.add_argument(
+        '-s', '--seeds', type=int, default=1000,
+        help='number of seeds to check (default: 1000)')
+    parser.add_argument(
+        '--first-seed', type=int, default=0, help='first seed (default: 0)')
+    parser.add_argument(
+        '-o', '--output', default=None,
+        help='file for the accepted seeds (default: standard output)')
+    parser.add_argument(
+        '--start', type=int, action='append', default=[],
+        help='index of a start Node, can be repeated')
+    parser.add_argument(
+        '--lock-free-steps', type=int, default=1,
+        help='no lock within this many moves of a start Node (default: 1, '
+             'negative to allow them)')
+    parser.add_argument(
+        '--budget', nargs=3, action='append', default=[],
+        metavar=('STAT', 'MIN', 'MAX'),
+        help='bounds for a stat (for example strength or hp, weighted '
+             'like the Node labels) around every start Node, can be '
+             'repeated')
+    parser.add_argument(
+        '--region-steps', type=int, default=10,
+        help='moves from a start Node included in its budget region '
+             '(default: 10)')
+    parser.add_argument(
+        '--keep-locks', action='store_true',
+        help='leave the Key Sphere locks where they are')
+    parser.add_argument(
+        '-j', '--jobs', type=int, default=None,
+        help='number of worker processes (default: number of CPUs)')
+    args = parser.parse_args(argv)
+    if args.jobs is not None and args.jobs < 1:
+        parser.error('--jobs must be at least 1')
+    layout = get_layout(LayoutType[args.layout.upper()])
+    if args.budget and not args.start:
+        parser.error('--budget needs at least one --start Node')
+    # the seeds are written as uint32
+    if args.seeds < 0:
+        parser.error('--seeds can\'t be negative')
+    max_seed = 1 << SEED_STRUCT.size * 8
+    if not 0 <= args.first_seed <= max_seed - args.seeds:
+        parser.error(f'the seeds must be from 0 to {max_seed - 1}')
+    for start in args.start:
+        if not 0 <= start < len(layout.nodes):
+            parser.error(f'--start must be a Node index from 0 to '
+                         f'{len(layout.nodes) - 1}')
+    bounds = []
+    for stat_name, minimum, maximum in args.budget:
+        try:
+            stat = AppearanceType[stat_name.upper()]
+        except KeyError:
+            parser.error(f'unknown stat {stat_name}')
+        if stat not in STAT_WEIGHTS:
+            parser.error(f'{stat_name} is not a stat')
+        try:
+            minimum, maximum = int(minimum), int(maximum)
+        except ValueError:
+            parser.error(f'the bounds of --budget {stat_name} must be '
+                         f'integers')
+        if minimum > maximum:
+            parser.error(f'the minimum of --budget {stat_name} is greater '
+                         f'than its maximum')
+        bounds.append((stat, minimum, maximum))
+
+    budgets = []
+    lock_values = get_lock_values()
+    for start in args.start:
+        if args.lock_free_steps >= 0:
+            budgets.append(Budget(
+                f'locks near {start}',
+                get_region(layout, start, args.lock_free_steps),
+                lock_values, maximum=0))
+        region = get_region(layout, start, args.region_steps)
+        for stat, minimum, maximum in bounds:
+            budgets.append(Budget(
+                f'{stat.name.lower()} near {start}', region,
+                get_stat_values(stat), minimum, maximum,
+                STAT_WEIGHTS[stat]))
+    contents = get_contents_table(layout)
+    fixed = LOCK_LEVELS if args.keep_locks else ()
+    movable = get_movable_nodes(contents, fixed)
+    seeds = range(args.first_seed, args.first_seed + args.seeds)
+
+    if args.output is None:
+        output = sys.stdout.buffer
+    else:
+        output = open(args.output, mode='wb')
+    start_time = time.perf_counter()
+    checked = accepted = 0
+    try:
+        for batch in randomize(contents, movable, budgets, seeds, args.jobs):
+            checked += len(batch.seeds)
+            accepted += len(batch.accepted)
+            for seed, shuffled in batch.accepted:
+                output.write(SEED_STRUCT.pack(seed) + shuffled)
+            output.flush()
+    finally:
+        if output is not sys.stdout.buffer:
+            output.close()
+    seconds = time.perf_counter() - start_time
+    summary = {'checked': checked, 'accepted': accepted,
+               'seconds': round(seconds, 3),
+               'seeds_per_second': round(checked / seconds, 1)}
+    print(json.dumps({'summary': summary}), file=sys.stderr, flush=True)
+    return 0
+
+
+# seeds checked by a worker at a time
+CHUNK_SIZE = 250
+SEED_STRUCT = struct.Struct('<I')
+MISSING_CONTENT = 0xff
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,344 @@
+import argparse
+import struct
+import sys
+import time
+import zlib
+from collections.abc import Iterable, Iterator
+from functools import cache
+from logging import getLogger
+from math import ceil
+from typing import BinaryIO
+
+from PIL import Image, ImageDraw, ImageFont
+
+from .data.content import parse_node_contents
+from .data.layout import LayoutType, get_layout, parse_layout
+from .data.node_types import get_appearance_coords
+from .data.overlay import LayoutOverlay
+from .scene import (BACKGROUND_COLOR, CIRCLE_OUTLINE_WIDTH, FONT_SIZE,
+                    LINK_COLOR, LINK_WIDTH, OFF_COLOR, Scene,
+                    get_circle_radius, get_ring_radius, solve_labels)
+
+type Box = tuple[int, int, int, int]
+
+
+@cache
+def get_font(size: int) -> ImageFont.FreeTypeFont | ImageFont.ImageFont:
+    return ImageFont.load_default(size)
+
+
+@cache
+def get_label_size(text: str) -> tuple[float, float]:
+    """Size of a Node label at zoom 1.0."""
+    font = get_font(LABEL_FONT_SIZE)
+    left, _, right, _ = font.getbbox(text)
+    ascent, descent = font.getmetrics()
+    return right - left, ascent + descent
+
+
+@cache
+def get_flag_size(text: str) -> tuple[float, float]:
+    """Size of a Character Flag at zoom 1.0."""
+    left, top, right, bottom = get_font(LABEL_FONT_SIZE * 2).getbbox(
+        text, anchor='mm')
+    return right - left, bottom - top
+
+
+class SceneRenderer:
+    """Draws a Scene on Pillow images without a display.
+
+    The output is split in tiles that only draw the items overlapping
+    them, so any part of an arbitrarily large output can be rendered on
+    its own. `origin` is the Layout point drawn at the top left pixel,
+    by default `margin` above and to the left of the Scene.
+    """
+    def __init__(self,
+                 scene: Scene,
+                 zoom: float = 1.0,
+                 margin: float = 100,
+                 origin: tuple[float, float] | None = None,
+                 ) -> None:
+        self.scene = scene
+        self.zoom = zoom
+        layout = scene.layout
+        self.spatial_index = layout.spatial_index
+        self.contents = [scene.overlay.get_content(i)
+                         for i in range(len(layout.nodes))]
+        if scene.label_placements:
+            self.placements = scene.label_placements
+        else:
+            self.placements = solve_labels(
+                scene.overlay, get_label_size, scene.rings).placements
+        self.label_font = get_font(max(1, round(LABEL_FONT_SIZE * zoom)))
+        self.flag_font = get_font(max(1, round(LABEL_FONT_SIZE * 2 * zoom)))
+
+        x_0, y_0, x_1, y_1 = layout.arrays.get_bounds()
+        xs = [x_0, x_1, *(flag.x for flag in scene.flags)]
+        ys = [y_0, y_1, *(flag.y for flag in scene.flags)]
+        for index, (dx, dy, _) in self.placements.items():
+            xs.append(layout.nodes[index].x + dx)
+            ys.append(layout.nodes[index].y + dy)
+        if origin is None:
+            origin = min(xs) - margin, min(ys) - margin
+        self.origin = origin
+        self.size = (ceil((max(xs) + margin - self.origin[0]) * zoom),
+                     ceil((max(ys) + margin - self.origin[1]) * zoom))
+
+    def to_pixel(self,
+                 x: float,
+                 y: float,
+                 box: Box,
+                 ) -> tuple[float, float]:
+        return ((x - self.origin[0]) * self.zoom - box[0],
+                (y - self.origin[1]) * self.zoom - box[1])
+
+    def get_width(self, width: float) -> int:
+        return max(1, round(width * self.zoom))
+
+    def render_tile(self, box: Box) -> Image.Image:
+        """Render the pixels inside `box` (left, top, right, bottom)."""
+        scene = self.scene
+        layout = scene.layout
+        zoom = self.zoom
+        image = Image.new('RGB', (box[2] - box[0], box[3] - box[1]),
+                          BACKGROUND_COLOR)
+        draw = ImageDraw.Draw(image)
+        # Layout coordinates of the tile, grown to include whole Nodes
+        pad = (BIG_ITEM_PADDING * zoom + 1) / zoom
+        x_0 = box[0] / zoom + self.origin[0] - pad
+        y_0 = box[1] / zoom + self.origin[1] - pad
+        x_1 = box[2] / zoom + self.origin[0] + pad
+        y_1 = box[3] / zoom + self.origin[1] + pad
+
+        for index in sorted(self.spatial_index.links_in_bbox(
+                x_0, y_0, x_1, y_1)):
+            if index in scene.link_colors:
+                color = scene.link_colors[index]
+                width = self.get_width(LINK_WIDTH * 2)
+            else:
+                color = LINK_COLOR
+                width = self.get_width(LINK_WIDTH)
+            shape = self.spatial_index.link_shapes[index]
+            if len(shape) == 4:
+                draw.line((*self.to_pixel(*shape[:2], box),
+                           *self.to_pixel(*shape[2:], box)),
+                          fill=color, width=width)
+                continue
+            centre_x, centre_y, radius, start, extent = shape
+            x, y = self.to_pixel(centre_x, centre_y, box)
+            r = radius * zoom + width / 2
+            # Pillow angles are clockwise
+            draw.arc((x - r, y - r, x + r, y + r), -(start + extent), -start,
+                     fill=color, width=width)
+
+        for flag in scene.flags:
+            if flag.node_index is None:
+                continue
+            node = layout.nodes[flag.node_index]
+            draw.line((*self.to_pixel(node.x, node.y, box),
+                       *self.to_pixel(flag.x, flag.y, box)),
+                      fill=flag.color, width=self.get_width(LINK_WIDTH))
+
+        nodes = [i for i in self.spatial_index.nodes_in_bbox(
+                     x_0, y_0, x_1, y_1)
+                 if self.contents[i] is not None]
+        for index in nodes:
+            if index not in scene.rings:
+                continue
+            x, y = self.to_pixel(layout.nodes[index].x,
+                                 layout.nodes[index].y, box)
+            r = get_ring_radius(self.contents[index]) * zoom + 0.5
+            draw.ellipse((x - r, y - r, x + r, y + r),
+                         fill=scene.rings[index])
+
+        for index, (dx, dy, leader) in self.placements.items():
+            if leader and self.contents[index] is not None:
+                node = layout.nodes[index]
+                draw.line((*self.to_pixel(node.x, node.y, box),
+                           *self.to_pixel(node.x + dx, node.y + dy, box)),
+                          fill=self.get_color(index))
+
+        for index in nodes:
+            content = self.contents[index]
+            x, y = self.to_pixel(layout.nodes[index].x,
+                                 layout.nodes[index].y, box)
+            r = get_circle_radius(content) * zoom
+            outline_r = r + CIRCLE_OUTLINE_WIDTH / 2 * zoom
+            draw.ellipse(
+                (x - outline_r, y - outline_r, x + outline_r, y + outline_r),
+                fill=self.get_color(index), outline='black',
+                width=self.get_width(CIRCLE_OUTLINE_WIDTH))
+            if content.appearance:
+                draw.polygon(
+                    get_appearance_coords(content, x - r, y - r, zoom),
+                    fill='#ffffff')
+
+        for index, (dx, dy, _) in self.placements.items():
+            content = self.contents[index]
+            if content is None or not content.display_name:
+                continue
+            node = layout.nodes[index]
+            x, y = self.to_pixel(node.x + dx, node.y + dy, box)
+            width, height = get_label_size(content.display_name)
+            # skip the labels outside of the tile, text is slow to draw
+            half_width = width * zoom / 2 + 1
+            half_height = height * zoom / 2 + 1
+            if (x + half_width < 0 or x - half_width > image.width
+                    or y + half_height < 0 or y - half_height > image.height):
+                continue
+            # whole pixels, or texts split between tiles don't line up
+            draw.text((round(x), round(y)), content.display_name,
+                      fill=self.get_color(index), font=self.label_font,
+                      anchor='mm')
+
+        for flag in scene.flags:
+            x, y = self.to_pixel(flag.x, flag.y, box)
+            x, y = round(x), round(y)
+            bbox = draw.textbbox(
+                (x, y), flag.name, font=self.flag_font, anchor='mm')
+            draw.rectangle(bbox, fill=flag.color)
+            draw.text((x, y), flag.name, fill='black', font=self.flag_font,
+                      anchor='mm')
+        return image
+
+    def get_color(self, index: int) -> str:
+        if index in self.scene.highlighted_nodes:
+            return self.contents[index].color
+        return OFF_COLOR
+
+    def iter_bands(self,
+                   tile_size: int | None = None,
+                   ) -> Iterator[Image.Image]:
+        """Yield full width horizontal bands of the output, each one
+        assembled from tiles of at most `tile_size` pixels.
+        """
+        if tile_size is None:
+            tile_size = TILE_SIZE
+        width, height = self.size
+        for top in range(0, height, tile_size):
+            bottom = min(top + tile_size, height)
+            band = Image.new('RGB', (width, bottom - top))
+            for left in range(0, width, tile_size):
+                right = min(left + tile_size, width)
+                band.paste(self.render_tile((left, top, right, bottom)),
+                           (left, 0))
+            yield band
+
+    def render(self, tile_size: int | None = None) -> Image.Image:
+        image = Image.new('RGB', self.size)
+        top = 0
+        for band in self.iter_bands(tile_size):
+            image.paste(band, (0, top))
+            top += band.height
+        return image
+
+
+def write_png_chunk(file_object: BinaryIO, kind: bytes, data: bytes) -> None:
+    file_object.write(struct.pack('>I', len(data)))
+    file_object.write(kind)
+    file_object.write(data)
+    file_object.write(struct.pack('>I', zlib.crc32(kind + data)))
+
+
+def write_png(file_object: BinaryIO,
+              size: tuple[int, int],
+              bands: Iterable[Image.Image],
+              ) -> None:
+    """Encode RGB `bands` as a single PNG image, one band at a time."""
+    width, height = size
+    file_object.write(PNG_SIGNATURE)
+    write_png_chunk(file_object, b'IHDR', PNG_HEADER_STRUCT.pack(
+        width, height, 8, 2, 0, 0, 0))
+    compressor = zlib.compressobj()
+    stride = width * 3
+    for band in bands:
+        data = band.tobytes()
+        # every row starts with its filter type, 0 is no filter
+        rows = b''.join(b'\0' + data[i:i + stride]
+                        for i in range(0, len(data), stride))
+        compressed = compressor.compress(rows)
+        if compressed:
+            write_png_chunk(file_object, b'IDAT', compressed)
+    write_png_chunk(file_object, b'IDAT', compressor.flush())
+    write_png_chunk(file_object, b'IEND', b'')
+
+
+def export_scene(scene: Scene,
+                 file_path: str,
+                 zoom: float = 1.0,
+                 tile_size: int | None = None,
+                 format: str | None = None,
+                 ) -> tuple[int, int]:
+    """Render the whole Scene to `file_path` and return the image size.
+
+    PNG files are rendered and encoded one band of tiles at a time, other
+    formats need the whole image in memory.
+    """
+    renderer = SceneRenderer(scene, zoom)
+    if format is None:
+        format = file_path.rpartition('.')[2]
+    if format.lower() == 'png':
+        with open(file_path, mode='wb') as file_object:
+            write_png(file_object, renderer.size,
+                      renderer.iter_bands(tile_size))
+    else:
+        renderer.render(tile_size).save(file_path, format)
+    getLogger(__name__).info(
+        f'Rendered {renderer.size[0]}x{renderer.size[1]} image '
+        f'to {file_path}')
+    return renderer.size
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='python -m ffx_sphere_grid_viewer.render',
+        description='Render a whole Sphere Grid to an image file without '
+                    'a display.')
+    parser.add_argument('output', help='image file, the extension sets '
+                                       'the format')
+    parser.add_argument(
+        '-l', '--layout', choices=[t.name.lower() for t in LayoutType],
+        default=LayoutType.ORIGINAL.name.lower(), help='game Layout to render')
+    parser.add_argument(
+        '--files', nargs=2, metavar=('LAYOUT', 'NODE_CONTENTS'),
+        help='render a custom Layout instead, same files as the validator')
+    parser.add_argument(
+        '--overlay', help='file with Node edits saved by LayoutOverlay')
+    parser.add_argument('-z', '--zoom', type=float, default=1.0)
+    parser.add_argument('--tile-size', type=int, default=None)
+    parser.add_argument(
+        '--highlight-all', action='store_true', help='highlight all Nodes')
+    args = parser.parse_args(argv)
+
+    if args.files is not None:
+        from .validate import read_layout_files
+        *records, node_contents = read_layout_files(*args.files)
+        layout = parse_layout(*records, parse_node_contents(node_contents))
+    else:
+        layout = get_layout(LayoutType[args.layout.upper()])
+    if args.overlay is not None:
+        overlay = LayoutOverlay.load(layout, args.overlay)
+    else:
+        overlay = LayoutOverlay(layout)
+    scene = Scene(overlay)
+    if args.highlight_all:
+        scene.highlight_all()
+    start = time.perf_counter()
+    width, height = export_scene(
+        scene, args.output, args.zoom, args.tile_size)
+    print(f'{args.output}: {width}x{height} in '
+          f'{time.perf_counter() - start:.2f} seconds')
+    return 0
+
+
+TILE_SIZE = 1024
+# pixels per point of the Tk fonts
+LABEL_FONT_SIZE = round(FONT_SIZE * 4 / 3)
+# how far from its centre a Node can draw, at zoom 1.0
+BIG_ITEM_PADDING = 40
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+PNG_HEADER_STRUCT = struct.Struct('>IIBBBBB')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
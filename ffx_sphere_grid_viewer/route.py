@@ -0,0 +1,265 @@
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from collections.abc import Iterator, Sequence
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from itertools import permutations
+
+from .data.graph import LayoutGraph
+from .data.layout import Layout, LayoutType, get_layout
+
+type DistanceMatrix = list[list[int]]
+
+
+@dataclass
+class Route:
+    """A walk from a start Node that goes through all the targets.
+
+    `order` is the order the targets are activated in and `path` holds
+    every Node moved onto, start included. `cost` is the number of moves.
+    """
+    cost: int
+    order: list[int]
+    path: list[int]
+
+
+def get_distance_matrix(graph: LayoutGraph,
+                        points: Sequence[int],
+                        max_lock_level: int | None = None,
+                        ) -> DistanceMatrix:
+    """Distances between `points` with one search from each of them,
+    raising ValueError if some of them can't be reached from the first.
+    """
+    matrix = []
+    for point in points:
+        distances = graph.get_distances(point, max_lock_level)
+        matrix.append([distances[p] for p in points])
+    unreachable = [p for p, d in zip(points, matrix[0]) if d < 0]
+    if unreachable:
+        raise ValueError(f'Nodes {unreachable} can\'t be reached from Node '
+                         f'{points[0]} with the available Key Spheres')
+    return matrix
+
+
+def get_order_cost(matrix: DistanceMatrix, order: Sequence[int]) -> int:
+    return sum(matrix[a][b] for a, b in zip(order, order[1:]))
+
+
+def search_exact(matrix: DistanceMatrix, first: int) -> tuple[int, list[int]]:
+    """Best order of the points of `matrix` that starts from point 0 and
+    then goes to `first`, trying all of them.
+    """
+    rest = [p for p in range(1, len(matrix)) if p != first]
+    best_cost, best_order = None, None
+    start_cost = matrix[0][first]
+    for tail in permutations(rest):
+        cost = start_cost
+        previous = first
+        for point in tail:
+            cost += matrix[previous][point]
+            previous = point
+        if best_cost is None or cost < best_cost:
+            best_cost, best_order = cost, [0, first, *tail]
+    return best_cost, best_order
+
+
+def improve_order(matrix: DistanceMatrix, order: list[int]) -> int:
+    """Apply improving 2-opt moves to `order` in place until there are
+    none left, keeping the start point first. Return the cost.
+    """
+    length = len(order)
+    improved = True
+    while improved:
+        improved = False
+        for i in range(1, length - 1):
+            a, b = order[i - 1], order[i]
+            for j in range(i + 1, length):
+                c = order[j]
+                # the path is open, the last point has no successor
+                d = order[j + 1] if j + 1 < length else None
+                delta = matrix[a][c] - matrix[a][b]
+                if d is not None:
+                    delta += matrix[b][d] - matrix[c][d]
+                if delta < 0:
+                    order[i:j + 1] = order[i:j + 1][::-1]
+                    b = order[i]
+                    improved = True
+    return get_order_cost(matrix, order)
+
+
+def search_local(matrix: DistanceMatrix,
+                 seed: int,
+                 iterations: int | None = None,
+                 ) -> tuple[int, list[int]]:
+    """Randomized nearest neighbour order improved with 2-opt, then
+    perturbed and improved again `iterations` times.
+    """
+    if iterations is None:
+        iterations = ITERATIONS
+    rng = random.Random(seed)
+    unvisited = set(range(1, len(matrix)))
+    order = [0]
+    while unvisited:
+        distances = matrix[order[-1]]
+        # pick among the nearest few so that every seed starts elsewhere
+        candidates = sorted(unvisited, key=distances.__getitem__)
+        point = rng.choice(candidates[:NEAREST_CANDIDATES])
+        order.append(point)
+        unvisited.remove(point)
+    best_cost = improve_order(matrix, order)
+    best_order = order
+    if len(order) < 4:
+        return best_cost, best_order
+    for _ in range(iterations):
+        order = best_order[:]
+        i, j = sorted(rng.sample(range(1, len(order)), 2))
+        # move a random segment somewhere else
+        segment = order[i:j + 1]
+        del order[i:j + 1]
+        position = rng.randint(1, len(order))
+        order[position:position] = segment
+        cost = improve_order(matrix, order)
+        if cost < best_cost:
+            best_cost, best_order = cost, order
+    return best_cost, best_order
+
+
+def plan_route(layout: Layout,
+               start: int,
+               targets: Sequence[int],
+               max_lock_level: int | None = None,
+               max_workers: int | None = None,
+               tasks: int | None = None,
+               ) -> Iterator[Route]:
+    """Search the shortest walk from `start` through all of `targets` in
+    a process pool, yielding every Route that improves on the previous.
+    Raises ValueError if some of the Nodes are not in `layout` or can't
+    be reached.
+
+    The searches only see the distances between the targets, so they are
+    cheap to send to the workers. Up to `EXACT_TARGETS` targets every
+    order is tried, split by the first target, otherwise `tasks`
+    randomized local searches are run.
+    """
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    graph = layout.graph
+    points = [start, *dict.fromkeys(t for t in targets if t != start)]
+    missing = [p for p in points if not 0 <= p < len(layout.nodes)]
+    if missing:
+        raise ValueError(f'Nodes {missing} are not in the Layout, it has '
+                         f'{len(layout.nodes)} Nodes')
+    matrix = get_distance_matrix(graph, points, max_lock_level)
+    if len(points) == 1:
+        yield Route(0, [], [start])
+        return
+    if len(points) - 1 <= EXACT_TARGETS:
+        jobs = [(search_exact, matrix, first)
+                for first in range(1, len(points))]
+    else:
+        if tasks is None:
+            tasks = max_workers * TASKS_PER_WORKER
+        jobs = [(search_local, matrix, seed) for seed in range(tasks)]
+    best_cost = None
+    with ProcessPoolExecutor(max_workers) as executor:
+        pending = {executor.submit(*job) for job in jobs}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                cost, order = future.result()
+                if best_cost is not None and cost >= best_cost:
+                    continue
+                best_cost = cost
+                yield get_route(graph, [points[i] for i in order],
+                                max_lock_level)
+
+
+def get_route(graph: LayoutGraph,
+              order: list[int],
+              max_lock_level: int | None = None,
+              ) -> Route:
+    """Join the shortest paths between the consecutive Nodes of `order`,
+    the first one being the start.
+    """
+    path = [order[0]]
+    for source, target in zip(order, order[1:]):
+        path.extend(graph.get_path(source, target, max_lock_level)[1:])
+    return Route(len(path) - 1, order[1:], path)
+
+
+def find_nodes(layout: Layout, names: Sequence[str]) -> list[int]:
+    """Indexes of the Nodes whose content has one of `names`."""
+    names = {name.lower() for name in names}
+    return [i for i, node in enumerate(layout.nodes)
+            if node.content is not None
+            and node.content.name.lower() in names]
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='python -m ffx_sphere_grid_viewer.route',
+        description='Plan the shortest route through some Nodes and print '
+                    'every improving route as JSON.')
+    parser.add_argument('start', type=int, help='index of the start Node')
+    parser.add_argument(
+        'targets', nargs='+',
+        help='indexes of the target Nodes or names of their contents, '
+             'all the Nodes with that content are targets')
+    parser.add_argument(
+        '-l', '--layout', choices=[t.name.lower() for t in LayoutType],
+        default='original', help='Sphere Grid Layout (default: original)')
+    parser.add_argument(
+        '-k', '--key-spheres', type=int, default=None,
+        help='highest Key Sphere level available (default: all)')
+    parser.add_argument(
+        '-j', '--jobs', type=int, default=None,
+        help='number of worker processes (default: number of CPUs)')
+    args = parser.parse_args(argv)
+    if args.jobs is not None and args.jobs < 1:
+        parser.error('--jobs must be at least 1')
+    layout = get_layout(LayoutType[args.layout.upper()])
+    node_count = len(layout.nodes)
+    if not 0 <= args.start < node_count:
+        parser.error(f'start must be a Node index from 0 to {node_count - 1}')
+    targets = []
+    for target in args.targets:
+        try:
+            index = int(target)
+        except ValueError:
+            indexes = find_nodes(layout, [target])
+            if not indexes:
+                parser.error(f'no Node has the content {target}')
+            targets.extend(indexes)
+            continue
+        if not 0 <= index < node_count:
+            parser.error(f'target {index} is not a Node index, the Layout '
+                         f'has {node_count} Nodes')
+        targets.append(index)
+
+    start = time.perf_counter()
+    try:
+        for route in plan_route(layout, args.start, targets,
+                                args.key_spheres, args.jobs):
+            print(json.dumps({
+                'cost': route.cost, 'order': route.order, 'path': route.path,
+                'seconds': round(time.perf_counter() - start, 3),
+            }), flush=True)
+    except ValueError as error:
+        parser.exit(1, f'{error}\n')
+    return 0
+
+
+# targets up to which every order is tried
+EXACT_TARGETS = 8
+# local searches queued for each worker process
+TASKS_PER_WORKER = 4
+# perturbations tried by each local search
+ITERATIONS = 200
+NEAREST_CANDIDATES = 3
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,118 @@
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass, field
+from typing import Self
+
+from .data.layout import Layout
+from .data.node_types import AppearanceType, NodeType
+from .data.overlay import LayoutOverlay
+from .labels import LabelSolver, Placement
+
+
+@dataclass
+class CharacterFlag:
+    # centre of the flag, in Layout coordinates
+    x: float
+    y: float
+    name: str
+    color: str
+    node_index: int | None = None
+
+
+@dataclass
+class Scene:
+    """Everything drawn on top of a Layout, in Layout coordinates and
+    without any Tk state, so that it can be rendered offscreen.
+    """
+    overlay: LayoutOverlay
+    label_placements: dict[int, Placement] = field(default_factory=dict)
+    highlighted_nodes: set[int] = field(default_factory=set)
+    link_colors: dict[int, str] = field(default_factory=dict)
+    rings: dict[int, str] = field(default_factory=dict)
+    flags: list[CharacterFlag] = field(default_factory=list)
+
+    @property
+    def layout(self) -> Layout:
+        return self.overlay.layout
+
+    def copy(self) -> Self:
+        """Return a copy that can be read while this Scene changes."""
+        overlay = LayoutOverlay(self.layout, dict(self.overlay.contents))
+        return Scene(overlay, dict(self.label_placements),
+                     set(self.highlighted_nodes), dict(self.link_colors),
+                     dict(self.rings), list(self.flags))
+
+    def highlight_all(self) -> None:
+        layout = self.layout
+        self.highlighted_nodes = {i for i in range(len(layout.nodes))
+                                  if self.overlay.get_content(i) is not None}
+
+
+def get_circle_radius(content: NodeType) -> float:
+    """Radius of the circle of a Node, without its outline."""
+    if content.appearance_type is AppearanceType.EMPTY_NODE:
+        return CIRCLE_RADIUS * EMPTY_NODE_CIRCLE_SCALE
+    return CIRCLE_RADIUS
+
+
+def get_ring_radius(content: NodeType) -> float:
+    d = BIG_CIRCLE_RADIUS - CIRCLE_RADIUS
+    if content.appearance_type is AppearanceType.EMPTY_NODE:
+        d *= EMPTY_NODE_CIRCLE_SCALE
+    return get_circle_radius(content) + d
+
+
+def solve_labels(overlay: LayoutOverlay,
+                 get_label_size: Callable[[str], tuple[float, float]],
+                 rings: Iterable[int] = (),
+                 placements: dict[int, Placement] | None = None,
+                 ) -> LabelSolver:
+    """Create a LabelSolver for the Nodes of `overlay` and place all the
+    labels, or reserve `placements` if they were computed before.
+
+    Labels of Action Nodes are placed first and get leader lines.
+    """
+    node_radii = {}
+    label_sizes = {}
+    actions = []
+    others = []
+    for index in range(len(overlay.layout.nodes)):
+        content = overlay.get_content(index)
+        if content is None:
+            continue
+        node_radii[index] = get_circle_radius(content)
+        if content.display_name:
+            label_sizes[index] = get_label_size(content.display_name)
+            if content.appearance_type in ACTIONS:
+                actions.append(index)
+            else:
+                others.append(index)
+    for index in rings:
+        if index in node_radii:
+            node_radii[index] = get_ring_radius(overlay.get_content(index))
+    node_radii = {i: r + CIRCLE_OUTLINE_WIDTH / 2
+                  for i, r in node_radii.items()}
+    solver = LabelSolver(
+        overlay.layout.spatial_index, node_radii, label_sizes, LINK_WIDTH)
+    if placements is None:
+        solver.solve([*actions, *others], set(actions), LEADER_DISTANCE)
+    else:
+        solver.apply(placements)
+    return solver
+
+
+CIRCLE_RADIUS = 20
+CIRCLE_OUTLINE_WIDTH = 2
+BIG_CIRCLE_RADIUS = CIRCLE_RADIUS + 4
+EMPTY_NODE_CIRCLE_SCALE = 0.5
+LINK_WIDTH = 4
+LEADER_DISTANCE = CIRCLE_RADIUS * 2
+FONT_SIZE = 10
+OFF_COLOR = '#888888'
+LINK_COLOR = 'black'
+BACKGROUND_COLOR = '#f2f2f2'
+ACTIONS = {
+    AppearanceType.WHITE_MAGIC,
+    AppearanceType.BLACK_MAGIC,
+    AppearanceType.SKILL,
+    AppearanceType.SPECIAL,
+}
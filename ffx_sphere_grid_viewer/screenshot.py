@@ -1,10 +1,12 @@
 import os
 import sys
-import tkinter as tk
 from datetime import datetime
 from logging import getLogger
 
-from PIL.ImageGrab import grab
+from .profiler import profiled
+from .render import export_scene
+from .tkscenespheregrid import TkSceneSphereGrid
+from .tkspheregrid import TkSphereGrid
 
 
 def set_process_dpi_aware_for_windows() -> None:
@@ -13,21 +15,19 @@ def set_process_dpi_aware_for_windows() -> None:
     ctypes.windll.user32.SetProcessDPIAware()
 
 
-def save_screenshot(widget: tk.Widget,
+@profiled()
+def save_screenshot(canvas: TkSphereGrid | TkSceneSphereGrid,
                     filename: str | None = None,
                     format: str = 'png',
                     ) -> None:
-    x0 = widget.winfo_rootx()
-    y0 = widget.winfo_rooty()
-    x1 = x0 + widget.winfo_width()
-    y1 = y0 + widget.winfo_height()
-    image = grab((x0, y0, x1, y1), all_screens=True)
+    """Render the whole Sphere Grid offscreen at the current zoom."""
     if filename is None:
         filename = datetime.now().strftime(r'%Y-%m-%d_%H-%M-%S.png')
     file_path = f'{SCREENSHOTS_DIRECTORY}/{filename}'
     if not os.path.exists(SCREENSHOTS_DIRECTORY):
         os.mkdir(SCREENSHOTS_DIRECTORY)
-    image.save(file_path, format)
+    export_scene(canvas.get_scene(), file_path, canvas.current_zoom,
+                 format=format)
     getLogger(__name__).info(f'Saved screenshot to {file_path}')
 
 
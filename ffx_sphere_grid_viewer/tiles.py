@@ -0,0 +1,199 @@
+import threading
+from collections import OrderedDict
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass
+from logging import getLogger
+from math import floor
+from queue import Empty, SimpleQueue
+
+from PIL import Image
+
+from .render import SceneRenderer
+from .scene import Scene
+
+# zoom level, column, row
+type TileKey = tuple[float, int, int]
+type Bbox = tuple[float, float, float, float]
+
+
+def get_level(zoom: float) -> float:
+    """Return the pyramid level used to show `zoom`."""
+    return round(zoom, 2)
+
+
+@dataclass
+class Tile:
+    image: Image.Image
+    version: int
+    stale: bool = False
+
+    @property
+    def size(self) -> int:
+        return self.image.width * self.image.height * len(self.image.mode)
+
+
+class TilePyramid:
+    """Square tiles of a Scene rendered at any number of zoom levels.
+
+    Tiles are rendered on demand by a background thread and kept in an
+    LRU cache limited to `max_bytes`. The tile (zoom, 0, 0) has the Layout
+    origin in its top left corner.
+
+    All the methods except `run` must be called from the same thread, the
+    worker only reads snapshots of the Scene passed to `update`.
+    """
+    def __init__(self,
+                 scene: Scene,
+                 tile_size: int | None = None,
+                 max_bytes: int | None = None,
+                 ) -> None:
+        if tile_size is None:
+            tile_size = TILE_SIZE
+        if max_bytes is None:
+            max_bytes = MAX_CACHE_BYTES
+        self.tile_size = tile_size
+        self.max_bytes = max_bytes
+        self.cache: OrderedDict[TileKey, Tile] = OrderedDict()
+        self.cache_bytes = 0
+        self.version = 0
+        self.snapshot = scene.copy()
+        # version and Layout bboxes of every change, None means everything
+        self.invalidations: list[tuple[int, tuple[Bbox, ...] | None]] = []
+        self.pending: list[TileKey] = []
+        self.rendering: TileKey | None = None
+        self.closed = False
+        self.condition = threading.Condition()
+        self.results: SimpleQueue[tuple[TileKey, int, Image.Image]] = (
+            SimpleQueue())
+        self.logger = getLogger(__name__)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def get_tile_bbox(self, key: TileKey) -> Bbox:
+        """Layout coordinates covered by a tile."""
+        zoom, column, row = key
+        size = self.tile_size / zoom
+        return column * size, row * size, (column + 1) * size, (row + 1) * size
+
+    def get_keys(self, zoom: float, bbox: Bbox) -> list[TileKey]:
+        """Return the tiles of a level that overlap a Layout bbox."""
+        size = self.tile_size / zoom
+        x_0, y_0, x_1, y_1 = bbox
+        return [(zoom, column, row)
+                for row in range(floor(y_0 / size), floor(y_1 / size) + 1)
+                for column in range(floor(x_0 / size), floor(x_1 / size) + 1)]
+
+    def get(self, key: TileKey) -> Tile | None:
+        tile = self.cache.get(key)
+        if tile is not None:
+            self.cache.move_to_end(key)
+        return tile
+
+    def is_fresh(self, key: TileKey) -> bool:
+        tile = self.cache.get(key)
+        return tile is not None and not tile.stale
+
+    def is_idle(self) -> bool:
+        with self.condition:
+            return not self.pending and self.rendering is None
+
+    def request(self, keys: Iterable[TileKey]) -> None:
+        """Replace the tiles waiting to be rendered, in priority order."""
+        keys = [k for k in dict.fromkeys(keys) if not self.is_fresh(k)]
+        with self.condition:
+            self.pending = keys
+            self.condition.notify()
+
+    def update(self,
+               scene: Scene,
+               bboxes: Sequence[Bbox] | None = None,
+               ) -> None:
+        """Use the current state of `scene` for the tiles that overlap
+        any of `bboxes` (all of them if None). Stale tiles stay in the
+        cache and can be shown until they are rendered again.
+        """
+        if bboxes is not None:
+            bboxes = tuple(bboxes)
+        with self.condition:
+            self.version += 1
+            self.snapshot = scene.copy()
+            version = self.version
+        self.invalidations.append((version, bboxes))
+        for key, tile in self.cache.items():
+            if overlaps_any(bboxes, self.get_tile_bbox(key)):
+                tile.stale = True
+
+    def collect(self) -> list[TileKey]:
+        """Move the tiles rendered so far into the cache and return their
+        keys.
+        """
+        keys = []
+        while True:
+            try:
+                key, version, image = self.results.get_nowait()
+            except Empty:
+                break
+            tile_bbox = self.get_tile_bbox(key)
+            stale = any(v > version and overlaps_any(bboxes, tile_bbox)
+                        for v, bboxes in reversed(self.invalidations))
+            old_tile = self.cache.pop(key, None)
+            if old_tile is not None:
+                self.cache_bytes -= old_tile.size
+            tile = Tile(image, version, stale)
+            self.cache[key] = tile
+            self.cache_bytes += tile.size
+            keys.append(key)
+        while self.cache_bytes > self.max_bytes and len(self.cache) > 1:
+            _, tile = self.cache.popitem(last=False)
+            self.cache_bytes -= tile.size
+        return keys
+
+    def close(self) -> None:
+        with self.condition:
+            self.closed = True
+            self.pending.clear()
+            self.condition.notify()
+
+    def run(self) -> None:
+        renderers: dict[float, SceneRenderer] = {}
+        renderers_version = None
+        while True:
+            with self.condition:
+                while not self.pending and not self.closed:
+                    self.rendering = None
+                    self.condition.wait()
+                if self.closed:
+                    return
+                key = self.pending.pop(0)
+                self.rendering = key
+                snapshot = self.snapshot
+                version = self.version
+            if version != renderers_version:
+                renderers.clear()
+                renderers_version = version
+            zoom, column, row = key
+            try:
+                if zoom not in renderers:
+                    renderers[zoom] = SceneRenderer(
+                        snapshot, zoom, origin=(0.0, 0.0))
+                left = column * self.tile_size
+                top = row * self.tile_size
+                image = renderers[zoom].render_tile(
+                    (left, top, left + self.tile_size, top + self.tile_size))
+            except Exception:
+                self.logger.exception(f'Could not render tile {key}')
+                continue
+            self.results.put((key, version, image))
+
+
+def bboxes_overlap(a: Bbox, b: Bbox) -> bool:
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+def overlaps_any(bboxes: Sequence[Bbox] | None, bbox: Bbox) -> bool:
+    """Whether `bbox` overlaps one of `bboxes`, always if None."""
+    return bboxes is None or any(bboxes_overlap(b, bbox) for b in bboxes)
+
+
+TILE_SIZE = 256
+MAX_CACHE_BYTES = 64 * 1024 * 1024
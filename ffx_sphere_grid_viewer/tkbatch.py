@@ -0,0 +1,91 @@
+import re
+import tkinter as tk
+from collections.abc import Iterable
+from typing import Any
+
+
+def quote_tcl_word(value: Any) -> str:
+    """Return `value` as a single Tcl word, tuples and lists become Tcl
+    lists and the ones nested in them sublists.
+    """
+    if isinstance(value, (tuple, list)):
+        # the elements are quoted words, so their braces are balanced or
+        # escaped and the list can be kept as is between braces
+        return f'{{{' '.join(quote_tcl_word(v) for v in value)}}}'
+    value = str(value)
+    if not value:
+        return '{}'
+    if SAFE_WORD.fullmatch(value):
+        return value
+    return TCL_SPECIAL.sub(lambda m: ESCAPES.get(m[0], f'\\{m[0]}'), value)
+
+
+def format_options(options: dict[str, Any]) -> str:
+    return ' '.join(f'-{key} {quote_tcl_word(value)}'
+                    for key, value in options.items())
+
+
+def configure_items(canvas: tk.Canvas,
+                    updates: Iterable[tuple[int, dict[str, Any]]],
+                    ) -> None:
+    """Configure many canvas items with a single Tcl script."""
+    path = quote_tcl_word(str(canvas))
+    script = '\n'.join(f'{path} itemconfigure {item} {format_options(o)}'
+                       for item, o in updates)
+    if script:
+        canvas.tk.eval(script)
+
+
+class ItemBatch:
+    """Collects the creation of canvas items and runs it as a few Tcl
+    scripts, instead of one Python to Tcl call per item.
+
+    `create` returns the position of the item in the batch, its id is at
+    the same position in the list returned by `run`. With `batched` set
+    to False the items are created right away, one call each.
+    """
+    def __init__(self,
+                 canvas: tk.Canvas,
+                 batched: bool = True,
+                 chunk_size: int | None = None,
+                 ) -> None:
+        self.canvas = canvas
+        self.batched = batched
+        if chunk_size is None:
+            chunk_size = CHUNK_SIZE
+        self.chunk_size = chunk_size
+        self.path = quote_tcl_word(str(canvas))
+        self.commands: list[str] = []
+        self.items: list[int] = []
+
+    def create(self, item_type: str, *coords: float, **options: Any) -> int:
+        if not self.batched:
+            create = getattr(self.canvas, f'create_{item_type}')
+            self.items.append(create(*coords, **options))
+            return len(self.items) - 1
+        words = [self.path, 'create', item_type]
+        words.extend(quote_tcl_word(c) for c in coords)
+        words.append(format_options(options))
+        self.commands.append(f'[{' '.join(words)}]')
+        return len(self.commands) - 1
+
+    def run(self) -> list[int]:
+        """Create the collected items and return their ids."""
+        if not self.batched:
+            return self.items
+        tk_app = self.canvas.tk
+        items = []
+        for i in range(0, len(self.commands), self.chunk_size):
+            chunk = self.commands[i:i + self.chunk_size]
+            script = f'list {' '.join(chunk)}'
+            items.extend(int(item) for item in tk_app.splitlist(
+                tk_app.eval(script)))
+        self.commands.clear()
+        return items
+
+
+# commands per Tcl script
+CHUNK_SIZE = 1000
+SAFE_WORD = re.compile(r'[\w.,#:!+-]+')
+TCL_SPECIAL = re.compile(r'[\\$\[\]{}";\s]')
+ESCAPES = {'\n': '\\n', '\t': '\\t', '\r': '\\r'}
@@ -0,0 +1,86 @@
+import tkinter as tk
+from collections import OrderedDict
+from logging import getLogger
+from typing import Callable
+
+from .data.layout import Layout, LayoutType
+from .tkscenespheregrid import TkSceneSphereGrid
+from .tkspheregrid import TkSphereGrid
+
+type SphereGridCanvas = TkSphereGrid | TkSceneSphereGrid
+
+
+class TkLayoutStack(tk.Frame):
+    """Keeps a drawn canvas for every Layout shown so far and only shows
+    the current one.
+
+    Switching back to a Layout shows its canvas again as it was left,
+    with its edits, highlights and zoom. Every kept canvas holds its
+    Layout and its items (and the worker thread of a tiled canvas), so
+    only the `max_canvases` most recently shown are kept.
+    """
+    def __init__(self,
+                 parent: tk.Widget,
+                 canvas_class: type[SphereGridCanvas],
+                 setup_canvas: Callable[[SphereGridCanvas], None],
+                 *args,
+                 max_canvases: int | None = None,
+                 **canvas_options,
+                 ) -> None:
+        super().__init__(parent, *args)
+        self.rowconfigure(0, weight=1)
+        self.columnconfigure(0, weight=1)
+        self.canvas_class = canvas_class
+        self.setup_canvas = setup_canvas
+        self.canvas_options = canvas_options
+        if max_canvases is None:
+            max_canvases = MAX_CANVASES
+        self.max_canvases = max_canvases
+        # canvases of the Layouts drawn so far, keyed by id and least
+        # recently shown first, the Layouts are kept alive so the ids
+        # can't be reused
+        self.canvases: OrderedDict[
+            int, tuple[Layout, SphereGridCanvas]] = OrderedDict()
+        self.canvas: SphereGridCanvas | None = None
+        self.logger = getLogger(__name__)
+
+    def draw_layout(self, layout: Layout) -> None:
+        """Show the canvas of `layout`, drawing it the first time. The
+        current Layout is drawn again from scratch.
+        """
+        cached = self.canvases.get(id(layout))
+        if cached is not None:
+            canvas = cached[1]
+            self.canvases.move_to_end(id(layout))
+            if canvas is self.canvas:
+                canvas.draw_layout(layout)
+                return
+        else:
+            canvas = self.canvas_class(self, **self.canvas_options)
+            self.setup_canvas(canvas)
+            self.canvases[id(layout)] = layout, canvas
+            self.discard_old_canvases()
+        if self.canvas is not None:
+            self.canvas.grid_remove()
+        canvas.grid(row=0, column=0, sticky='nsew')
+        self.canvas = canvas
+        if cached is None:
+            canvas.draw_layout(layout)
+        else:
+            # also updates the scrollbars, which follow the shown canvas
+            canvas.resize_scrollregion()
+            self.logger.info('Changed Layout')
+
+    def discard_old_canvases(self) -> None:
+        while len(self.canvases) > self.max_canvases:
+            _, (_, canvas) = self.canvases.popitem(last=False)
+            # also drops the pending events and stops the tile worker
+            canvas.reset()
+            canvas.destroy()
+            if canvas is self.canvas:
+                self.canvas = None
+
+
+# canvases kept for switching back, one per game Layout and one for the
+# custom Layout passed to `main`, so none of them loses its changes
+MAX_CANVASES = len(LayoutType) + 1
@@ -0,0 +1,35 @@
+import tkinter as tk
+from typing import Any
+
+from .profiler import Profiler
+
+
+class CountingTkApp:
+    """Forwards everything to a Tcl interpreter, counting the calls and
+    the scripts evaluated.
+    """
+    def __init__(self, tk_app: Any) -> None:
+        self.tk_app = tk_app
+        self.calls = 0
+
+    def call(self, *args: Any) -> Any:
+        self.calls += 1
+        return self.tk_app.call(*args)
+
+    def eval(self, script: str) -> Any:
+        self.calls += 1
+        return self.tk_app.eval(script)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.tk_app, name)
+
+
+def enable_tk_profiling(profiler: Profiler, root: tk.Tk) -> None:
+    """Enable `profiler` and count the Tcl calls of the widgets created
+    after this from `root`.
+    """
+    profiler.enable()
+    if profiler.tcl_call_counter is None:
+        tk_app = CountingTkApp(root.tk)
+        root.tk = tk_app
+        profiler.tcl_call_counter = lambda: tk_app.calls
@@ -0,0 +1,436 @@
+import tkinter as tk
+from abc import abstractmethod
+from collections.abc import Collection
+from logging import getLogger
+from typing import Callable
+
+from .data.layout import Layout
+from .data.overlay import LayoutOverlay
+from .data.query import NodeQuery
+from .data.stats import StatTotals
+from .highlights import iter_bits, to_bitset
+from .labels import LabelSolver, Placement
+from .profiler import profiled
+from .render import BIG_ITEM_PADDING
+from .route import Route
+from .scene import (ACTIONS, CIRCLE_OUTLINE_WIDTH, CIRCLE_RADIUS,
+                    LEADER_DISTANCE, CharacterFlag, Scene, get_circle_radius,
+                    get_ring_radius, solve_labels)
+from .tiles import Bbox
+from .tkspheregrid import (KEY_TO_APPEARANCE_TYPE, KEY_TO_CHAR_COLOR,
+                           KEY_TO_CHAR_NAME, CoalescedInput, get_next_content)
+
+
+class TkSceneSphereGrid(CoalescedInput, tk.Canvas):
+    """Base for the canvases that keep the state of the Sphere Grid in a
+    Scene instead of in their canvas items.
+
+    Subclasses decide what is drawn: they implement the label and flag
+    measurements, `show_scene`, `update_view`, `redraw` and the
+    `refresh_*` methods, which are called after the Scene changes.
+
+    The view is followed through the scroll commands of the canvas, which
+    Tk calls whenever it scrolls, is dragged or is resized. The commands
+    given to `configure` are called from there.
+    """
+    def __init__(self, parent: tk.Widget, *args, **kwargs) -> None:
+        self.scroll_commands = {option: kwargs.pop(option, None)
+                                for option in SCROLL_OPTIONS}
+        super().__init__(parent, *args, **kwargs)
+        super().configure(xscrollcommand=self.on_xscroll,
+                          yscrollcommand=self.on_yscroll)
+        self.layout: Layout | None = None
+        self.overlay: LayoutOverlay | None = None
+        self.scene: Scene | None = None
+        self.label_solver: LabelSolver | None = None
+        # stats of the Clusters, regions and highlighted Nodes, the
+        # listeners are called when they change
+        self.stats: StatTotals | None = None
+        self.stats_listeners: list[Callable[[StatTotals], None]] = []
+        # Label placements of the Layouts drawn so far, keyed by id
+        self.label_placements: dict[
+            int, tuple[Layout, dict[int, Placement]]] = {}
+        self.current_zoom = 1.0
+        # canvas coordinates of the Layout origin
+        self.origin = (0.0, 0.0)
+        self.view: tuple[float, ...] | None = None
+        # Layout coordinates of the Node centres, for the scrollregion
+        self.layout_bounds = (0, 0, 0, 0)
+        self.logger = getLogger(__name__)
+
+    def configure(self, cnf=None, **kw):
+        if isinstance(cnf, dict):
+            kw = {**cnf, **kw}
+            cnf = None
+        wrapped = False
+        for option in SCROLL_OPTIONS:
+            if option in kw:
+                self.scroll_commands[option] = kw.pop(option)
+                wrapped = True
+        if wrapped and cnf is None and not kw:
+            return None
+        return super().configure(cnf, **kw)
+
+    config = configure
+
+    def on_xscroll(self, *args: str) -> None:
+        command = self.scroll_commands['xscrollcommand']
+        if command is not None:
+            command(*args)
+        self.events.schedule('view', self.follow_view)
+
+    def on_yscroll(self, *args: str) -> None:
+        command = self.scroll_commands['yscrollcommand']
+        if command is not None:
+            command(*args)
+        self.events.schedule('view', self.follow_view)
+
+    @abstractmethod
+    def get_label_size(self, text: str) -> tuple[float, float]:
+        """Size of a Node label at zoom 1.0."""
+
+    @abstractmethod
+    def get_flag_size(self, text: str) -> tuple[float, float]:
+        """Size of a Character Flag at zoom 1.0."""
+
+    @abstractmethod
+    def show_scene(self) -> None:
+        """Called once the Scene of a new Layout is ready."""
+
+    @abstractmethod
+    def update_view(self) -> None:
+        """Called when the visible part of the canvas changes."""
+
+    @abstractmethod
+    def redraw(self) -> None:
+        """Called after the zoom or the origin changes."""
+
+    @abstractmethod
+    def refresh_all(self) -> None:
+        """Called after the highlight of all the Nodes changes."""
+
+    @abstractmethod
+    def refresh_node(self, index: int, old_bbox: Bbox | None = None) -> None:
+        """Called after a Node changes, `old_bbox` is the area it covered
+        before if it could have shrunk or moved.
+        """
+
+    @abstractmethod
+    def refresh_changes(self,
+                        nodes: Collection[int],
+                        links: Collection[int] = (),
+                        ) -> None:
+        """Called after the highlight of some Nodes or the color of some
+        Links changes.
+        """
+
+    @abstractmethod
+    def refresh_link(self, index: int) -> None:
+        """Called after the color of a Link changes."""
+
+    @abstractmethod
+    def refresh_flag(self, flag: CharacterFlag) -> None:
+        """Called after a Character Flag is added or removed."""
+
+    def canvas_to_layout(self, x: float, y: float) -> tuple[float, float]:
+        origin_x, origin_y = self.origin
+        return ((x - origin_x) / self.current_zoom,
+                (y - origin_y) / self.current_zoom)
+
+    def layout_to_canvas(self, x: float, y: float) -> tuple[float, float]:
+        origin_x, origin_y = self.origin
+        return (x * self.current_zoom + origin_x,
+                y * self.current_zoom + origin_y)
+
+    def reset(self) -> None:
+        self.reset_input()
+        self.delete('all')
+        self.current_zoom = 1.0
+        self.origin = (0.0, 0.0)
+        self.view = None
+
+    @profiled()
+    def draw_layout(self, layout: Layout) -> None:
+        self.reset()
+        self.layout = layout
+        self.layout_bounds = layout.arrays.get_bounds()
+        self.overlay = LayoutOverlay(layout)
+        self.stats = StatTotals(self.overlay)
+        layout_placements = self.label_placements.get(id(layout))
+        if layout_placements is not None and layout_placements[0] is layout:
+            self.label_solver = solve_labels(
+                self.overlay, self.get_label_size,
+                placements=layout_placements[1])
+        else:
+            self.label_solver = solve_labels(self.overlay, self.get_label_size)
+            self.label_placements[id(layout)] = (
+                layout, dict(self.label_solver.placements))
+        self.scene = Scene(self.overlay, self.label_solver.placements)
+        self.show_scene()
+        self.resize_scrollregion()
+        self.update_view()
+        self.update_stats()
+        self.logger.info('Changed Layout')
+
+    def get_scene(self) -> Scene:
+        """Return a copy of the current state of the Sphere Grid."""
+        return self.scene.copy()
+
+    def resize_scrollregion(self) -> None:
+        x_0, y_0, x_1, y_1 = self.layout_bounds
+        min_x, min_y = self.layout_to_canvas(x_0, y_0)
+        max_x, max_y = self.layout_to_canvas(x_1, y_1)
+        self.configure(scrollregion=(min_x - 100, min_y - 100,
+                                     max_x + 100, max_y + 100))
+
+    def get_visible_bbox(self, margin: float = 0) -> Bbox:
+        """Layout coordinates of the visible part of the canvas, grown by
+        `margin` canvas pixels on every side.
+        """
+        x_0, y_0 = self.canvas_to_layout(self.canvasx(0) - margin,
+                                         self.canvasy(0) - margin)
+        x_1, y_1 = self.canvas_to_layout(
+            self.canvasx(self.winfo_width()) + margin,
+            self.canvasy(self.winfo_height()) + margin)
+        return x_0, y_0, x_1, y_1
+
+    def follow_view(self) -> None:
+        """Update the view if the visible part of the canvas changed."""
+        if self.layout is None:
+            return
+        view = (self.canvasx(0), self.canvasy(0), self.winfo_width(),
+                self.winfo_height(), self.current_zoom)
+        if view != self.view:
+            self.view = view
+            self.update_view()
+
+    def describe_node(self, index: int) -> str:
+        node = self.layout.nodes[index]
+        content = self.overlay.get_content(index)
+        return f'Node {content} @ ({node.x},{node.y})'
+
+    def get_node_bbox(self, index: int) -> Bbox:
+        """Layout area drawn by a Node, including its label."""
+        node = self.layout.nodes[index]
+        x_0 = node.x - BIG_ITEM_PADDING
+        y_0 = node.y - BIG_ITEM_PADDING
+        x_1 = node.x + BIG_ITEM_PADDING
+        y_1 = node.y + BIG_ITEM_PADDING
+        content = self.overlay.get_content(index)
+        placement = self.label_solver.placements.get(index)
+        if content is not None and placement is not None:
+            dx, dy, _ = placement
+            width, height = self.get_label_size(content.display_name)
+            x_0 = min(x_0, node.x + dx - width / 2)
+            y_0 = min(y_0, node.y + dy - height / 2)
+            x_1 = max(x_1, node.x + dx + width / 2)
+            y_1 = max(y_1, node.y + dy + height / 2)
+        return x_0, y_0, x_1, y_1
+
+    def get_flag_bbox(self, flag: CharacterFlag) -> Bbox:
+        width, height = self.get_flag_size(flag.name)
+        x_0, y_0 = flag.x - width / 2, flag.y - height / 2
+        x_1, y_1 = flag.x + width / 2, flag.y + height / 2
+        if flag.node_index is not None:
+            node = self.layout.nodes[flag.node_index]
+            x_0, y_0 = min(x_0, node.x), min(y_0, node.y)
+            x_1, y_1 = max(x_1, node.x), max(y_1, node.y)
+        return (x_0 - BIG_ITEM_PADDING, y_0 - BIG_ITEM_PADDING,
+                x_1 + BIG_ITEM_PADDING, y_1 + BIG_ITEM_PADDING)
+
+    @profiled()
+    def set_zoom(self,
+                 zoom_level: float,
+                 event: tk.Event | None = None,
+                 ) -> None:
+        scale_factor = zoom_level / self.current_zoom
+        if event is not None:
+            x, y = self.canvasx(event.x), self.canvasy(event.y)
+        else:
+            x, y = 0, 0
+        origin_x, origin_y = self.origin
+        self.origin = (x + (origin_x - x) * scale_factor,
+                       y + (origin_y - y) * scale_factor)
+        self.current_zoom *= scale_factor
+        self.resize_scrollregion()
+        self.redraw()
+        self.logger.info(f'Set zoom to {self.current_zoom:.0%}')
+
+    def query(self) -> NodeQuery:
+        """Query over the Nodes shown, its `mask` can be highlighted."""
+        return NodeQuery(self.layout, self.overlay)
+
+    def highlight_nodes(self, bitset: int, character: str = '') -> None:
+        """Highlight the Nodes in `bitset`, the Scene doesn't keep who
+        highlighted them.
+        """
+        changed = set(iter_bits(bitset)) - self.scene.highlighted_nodes
+        self.scene.highlighted_nodes.update(changed)
+        self.refresh_changes(changed)
+        self.update_stats()
+
+    def update_stats(self) -> None:
+        """Count the highlighted Nodes as the path of no one in
+        particular, like `HighlightState`.
+        """
+        self.stats.set_group('', to_bitset(self.scene.highlighted_nodes))
+        for listener in self.stats_listeners:
+            listener(self.stats)
+
+    def select_region(self, name: str, bitset: int) -> None:
+        """Count the stats of the Nodes in `bitset` as the region `name`,
+        like the mask of a `query`.
+        """
+        self.stats.set_group(name, bitset)
+        self.update_stats()
+
+    def highlight_route(self, route: Route, character: str) -> None:
+        """Draw `route` as the path of `character`, like `TkSphereGrid`."""
+        nodes = {route.path[0], *route.order} - self.scene.highlighted_nodes
+        self.scene.highlighted_nodes.update(nodes)
+        links = []
+        for index in self.layout.graph.get_path_links(route.path):
+            if self.scene.link_colors.get(index) != character:
+                self.scene.link_colors[index] = character
+                links.append(index)
+        self.refresh_changes(nodes, links)
+        self.update_stats()
+        self.logger.info(f'Highlighted a Route of {route.cost} moves')
+
+    def highlight_all(self, _: tk.Event | None = None) -> None:
+        self.scene.highlight_all()
+        self.refresh_all()
+        self.update_stats()
+        self.logger.info('Highlighted all Nodes')
+
+    def turn_off_all(self, _: tk.Event | None = None) -> None:
+        self.scene.highlighted_nodes.clear()
+        self.refresh_all()
+        self.update_stats()
+        self.logger.info('Turned off all Nodes')
+
+    def get_nearest_index(self, x: float, y: float) -> int | None:
+        index, _ = self.find_nearest_node(x, y)
+        return index
+
+    def find_nearest_node(self,
+                          x: float,
+                          y: float,
+                          ) -> tuple[int | None, float]:
+        """Return the index of the drawn Node nearest to the canvas
+        coordinates and its distance in Layout units.
+        """
+        return self.layout.spatial_index.nearest_node(
+            *self.canvas_to_layout(x, y),
+            lambda i: self.overlay.get_content(i) is not None)
+
+    @profiled()
+    def highlight_nearest(self, event: tk.Event) -> None:
+        x, y = self.canvasx(event.x), self.canvasy(event.y)
+        color = KEY_TO_CHAR_COLOR[event.keysym]
+        index, node_distance = self.find_nearest_node(x, y)
+        link_index, link_distance = self.layout.spatial_index.nearest_link(
+            *self.canvas_to_layout(x, y))
+        # distance from the outline of the circle, like find_closest
+        if (index is not None
+                and node_distance - CIRCLE_RADIUS <= link_distance):
+            if index in self.scene.highlighted_nodes:
+                self.scene.highlighted_nodes.remove(index)
+                self.logger.info(f'Turned off {self.describe_node(index)}')
+            else:
+                self.scene.highlighted_nodes.add(index)
+                self.logger.info(f'Highlighted {self.describe_node(index)}')
+            self.refresh_node(index)
+            self.update_stats()
+            return
+        if link_index is None:
+            self.logger.info(f'No item found near ({x},{y})')
+            return
+        if self.scene.link_colors.get(link_index) == color:
+            del self.scene.link_colors[link_index]
+            self.logger.info(f'Turned off Link near ({x},{y})')
+        else:
+            self.scene.link_colors[link_index] = color
+            self.logger.info(f'Highlighted Link near ({x},{y})')
+        self.refresh_link(link_index)
+
+    def add_character_flag(self, event: tk.Event) -> None:
+        x, y = self.canvasx(event.x), self.canvasy(event.y)
+        layout_x, layout_y = self.canvas_to_layout(x, y)
+        for flag in reversed(self.scene.flags):
+            width, height = self.get_flag_size(flag.name)
+            if (abs(layout_x - flag.x) <= width / 2
+                    and abs(layout_y - flag.y) <= height / 2):
+                self.scene.flags.remove(flag)
+                self.refresh_flag(flag)
+                self.logger.info(f'Deleted Character Flag @ ({x},{y})')
+                return
+        color = KEY_TO_CHAR_COLOR[event.keysym]
+        name = KEY_TO_CHAR_NAME[event.keysym]
+        index, _ = self.layout.spatial_index.nearest_ring(
+            layout_x, layout_y, self.scene.rings)
+        flag = CharacterFlag(layout_x, layout_y, name, color, index)
+        self.scene.flags.append(flag)
+        self.refresh_flag(flag)
+        msg = f'Created Character Flag @ ({x}, {y})'
+        if index is not None:
+            msg += f' connected to {self.describe_node(index)}'
+        self.logger.info(msg)
+
+    def add_character_circle(self, event: tk.Event) -> None:
+        x, y = self.canvasx(event.x), self.canvasy(event.y)
+        index, _ = self.find_nearest_node(x, y)
+        if index is None:
+            self.logger.info(f'No Node found near ({x},{y})')
+            return
+        node = self.describe_node(index)
+        content = self.overlay.get_content(index)
+        if index in self.scene.rings:
+            del self.scene.rings[index]
+            radius = get_circle_radius(content)
+            self.logger.info(f'Removed Character Ring from {node}')
+        else:
+            self.scene.rings[index] = KEY_TO_CHAR_COLOR[event.keysym.lower()]
+            radius = get_ring_radius(content)
+            name = KEY_TO_CHAR_NAME[event.keysym.lower()]
+            self.logger.info(f'Added Character Ring ({name}) to {node}')
+        self.label_solver.set_node_radius(
+            index, radius + CIRCLE_OUTLINE_WIDTH / 2)
+        self.refresh_node(index)
+
+    @profiled()
+    def apply_edit(self) -> None:
+        index, keysym, presses = self.pending_edit
+        self.pending_edit = None
+        content = self.overlay.get_content(index)
+        new_content = content
+        for _ in range(presses):
+            new_content = get_next_content(
+                new_content, KEY_TO_APPEARANCE_TYPE[keysym])
+        if content is new_content:
+            return
+        old_bbox = self.get_node_bbox(index)
+        self.overlay.set_content(index, new_content)
+        self.stats.update_node(index, content, new_content)
+        if index in self.scene.rings:
+            radius = get_ring_radius(new_content)
+        else:
+            radius = get_circle_radius(new_content)
+        self.label_solver.set_node_radius(
+            index, radius + CIRCLE_OUTLINE_WIDTH / 2)
+        if new_content.display_name:
+            self.label_solver.set_label_size(
+                index, self.get_label_size(new_content.display_name))
+            if new_content.appearance_type in ACTIONS:
+                self.label_solver.place(index, LEADER_DISTANCE)
+            else:
+                self.label_solver.place(index)
+        else:
+            self.label_solver.set_label_size(index, None)
+            self.label_solver.remove_label(index)
+        self.refresh_node(index, old_bbox)
+        self.update_stats()
+        self.logger.info(f'Edited {self.describe_node(index)}')
+
+
+SCROLL_OPTIONS = ('xscrollcommand', 'yscrollcommand')
@@ -1,15 +1,32 @@
-import copy
 import tkinter as tk
+from abc import ABCMeta, abstractmethod
+from collections import Counter
 from dataclasses import dataclass
 from enum import StrEnum
-from itertools import chain, islice, product
+from itertools import chain, islice
 from logging import getLogger
-from math import cos, dist, radians, sin
+from math import hypot
 from tkinter import font
+from typing import Callable
 
+from .data.cluster import Cluster
 from .data.layout import Layout
 from .data.node import Node
-from .data.node_types import NODE_TYPES, AppearanceType
+from .data.node_types import (AppearanceType, NodeType,
+                              get_appearance_coords, get_node_types)
+from .data.overlay import LayoutOverlay
+from .data.query import NodeQuery
+from .data.stats import StatTotals
+from .events import EventCoalescer
+from .highlights import HighlightState, iter_bits, to_bitset
+from .labels import LabelSolver, Placement
+from .profiler import profiled
+from .route import Route
+from .scene import (ACTIONS, CIRCLE_OUTLINE_WIDTH, CIRCLE_RADIUS, FONT_SIZE,
+                    LEADER_DISTANCE, LINK_COLOR, LINK_WIDTH, OFF_COLOR,
+                    CharacterFlag, Scene, get_circle_radius, get_ring_radius,
+                    solve_labels)
+from .tkbatch import ItemBatch, configure_items
 
 
 class Tag(StrEnum):
@@ -17,15 +34,20 @@ class Tag(StrEnum):
     HIGHLIGHTED_LINK = 'highlighted_link'
     NODE_CIRCLE = 'node_circle'
     NODE_TEXT = 'node_text'
+    NODE_ICON = 'node_icon'
     NODE_BIG_CIRCLE = 'node_big_circle'
     NODE_LINE = 'node_line'
     FLAG_TEXT = 'flag_text'
+    FLAG_RECTANGLE = 'flag_rectangle'
     FLAG_LINE = 'flag_line'
+    CLUSTER = 'cluster'
 
 
 @dataclass
 class TkNode:
     node: Node
+    index: int
+    content: NodeType
     circle: int
     polygon: int | None
     text: int
@@ -33,7 +55,7 @@ class TkNode:
     line: int | None = None
 
     def __str__(self) -> None:
-        return f'Tk{self.node}'
+        return f'Node {self.content} @ ({self.node.x},{self.node.y})'
 
 
 @dataclass
@@ -41,220 +63,512 @@ class TkCharacterFlag:
     rectangle: int
     text: int
     line: int | None = None
+    node_index: int | None = None
 
 
-class TkSphereGrid(tk.Canvas):
+def get_next_content(content: NodeType,
+                     appearance_type: AppearanceType,
+                     ) -> NodeType:
+    """Return the Node Type that follows `content` when its Node is edited
+    with the key of `appearance_type`.
+    """
+    if appearance_type is AppearanceType.L_1_LOCK:
+        match content.appearance_type:
+            case AppearanceType.L_1_LOCK:
+                appearance_type = AppearanceType.L_2_LOCK
+            case AppearanceType.L_2_LOCK:
+                appearance_type = AppearanceType.L_3_LOCK
+            case AppearanceType.L_3_LOCK:
+                appearance_type = AppearanceType.L_4_LOCK
+            case _:
+                appearance_type = AppearanceType.L_1_LOCK
+    all_node_types = get_node_types()
+    if content.appearance_type is appearance_type:
+        index = all_node_types.index(content) + 1
+        node_types = chain(islice(all_node_types, index, None), all_node_types)
+    else:
+        node_types = all_node_types
+    for node_type in node_types:
+        if node_type.appearance_type is appearance_type:
+            return node_type
+    return content
+
+
+class CoalescedInput(metaclass=ABCMeta):
+    """Input handlers shared by the Sphere Grid canvases, bursts of events
+    are applied once per frame: the steps of a fast scrollwheel spin add up
+    to a single zoom, a drag only scrolls to its last position and the
+    presses of a key held on a Node are applied together.
+
+    Goes before `tk.Canvas` in the bases.
+    """
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.events = EventCoalescer(self)
+        self.zoom_target: float | None = None
+        self.zoom_event: tk.Event | None = None
+        # index and key of the Node being edited and the times it was
+        # pressed since the last frame
+        self.pending_edit: tuple[int, str, int] | None = None
+
+    @abstractmethod
+    def get_nearest_index(self, x: float, y: float) -> int | None:
+        """Index of the drawn Node nearest to the canvas coordinates."""
+
+    @abstractmethod
+    def set_zoom(self,
+                 zoom_level: float,
+                 event: tk.Event | None = None,
+                 ) -> None:
+        """Zoom keeping the point under the pointer of `event` still."""
+
+    @abstractmethod
+    def apply_edit(self) -> None:
+        """Apply the presses in `pending_edit`."""
+
+    def reset_input(self) -> None:
+        """Drop the events that were not applied yet."""
+        self.events.cancel()
+        self.zoom_target = None
+        self.pending_edit = None
+
+    def on_scrollwheel(self, event: tk.Event) -> None:
+        # the steps of a fast spin add up to a single zoom
+        if self.zoom_target is None:
+            zoom_level = self.current_zoom
+        else:
+            zoom_level = self.zoom_target
+        if event.delta > 0:
+            zoom_level += ZOOM_STEP
+        else:
+            zoom_level = max(zoom_level - ZOOM_STEP, ZOOM_MIN, 0.1)
+        self.zoom_target = zoom_level
+        self.zoom_event = event
+        self.events.schedule('zoom', self.apply_zoom)
+
+    def apply_zoom(self) -> None:
+        zoom_level = self.zoom_target
+        self.zoom_target = None
+        self.set_zoom(zoom_level, self.zoom_event)
+
+    def on_drag_start(self, event: tk.Event) -> None:
+        self.events.flush()
+        self.scan_mark(event.x, event.y)
+
+    def on_drag(self, event: tk.Event) -> None:
+        self.events.schedule(
+            'drag', lambda: self.scan_dragto(event.x, event.y, gain=1))
+
+    @profiled()
+    def edit_node(self, event: tk.Event) -> None:
+        x, y = self.canvasx(event.x), self.canvasy(event.y)
+        index = self.get_nearest_index(x, y)
+        if index is None:
+            self.logger.info(f'No Node found near ({x},{y})')
+            return
+        if event.keysym not in KEY_TO_APPEARANCE_TYPE:
+            self.logger.info(f'No Node Type found for key {event.keysym}')
+            return
+        # key autorepeat, the presses are applied together
+        if (self.pending_edit is not None
+                and self.pending_edit[:2] != (index, event.keysym)):
+            self.events.flush()
+        if self.pending_edit is None:
+            self.pending_edit = (index, event.keysym, 1)
+        else:
+            self.pending_edit = (index, event.keysym,
+                                 self.pending_edit[2] + 1)
+        self.events.schedule('edit', self.apply_edit)
+
+
+class TkSphereGrid(CoalescedInput, tk.Canvas):
     def __init__(self, parent: tk.Widget, *args, **kwargs) -> None:
         super().__init__(parent, *args, **kwargs)
-        self.nodes: dict[int, TkNode] = {}
+        self.tk_nodes: dict[int, TkNode] = {}
+        self.links: list[int] = []
         self.character_flags: dict[int, TkCharacterFlag] = {}
+        self.layout: Layout | None = None
+        self.overlay: LayoutOverlay | None = None
+        self.label_solver: LabelSolver | None = None
+        self.highlights = HighlightState()
+        # bitset of the Nodes with canvas items
+        self.drawn_nodes = 0
+        # stats of the Clusters, regions and character paths, the
+        # listeners are called when they change
+        self.stats: StatTotals | None = None
+        self.stats_listeners: list[Callable[[StatTotals], None]] = []
+        # Label placements of the Layouts drawn so far, keyed by id
+        self.label_placements: dict[
+            int, tuple[Layout, dict[int, Placement]]] = {}
         self.current_zoom = 1.0
-        self.off_color = '#888888'
+        # canvas coordinates of the Layout origin
+        self.origin = (0.0, 0.0)
+        self.off_color = OFF_COLOR
         default_font = font.nametofont('TkDefaultFont')
         self.font_family = default_font.cget('family')
-        self.font_size = 10
+        self.font_size = FONT_SIZE
+        self.label_font = font.Font(
+            family=self.font_family, size=self.font_size, weight='bold')
+        self.label_sizes: dict[str, tuple[float, float]] = {}
+        # below these zoom levels the details of the Nodes are hidden and
+        # then the Nodes are replaced by one glyph per Cluster
+        self.detail_zoom = DETAIL_ZOOM
+        self.cluster_zoom = CLUSTER_ZOOM
+        # hidden items are not scaled, their coordinates are set again
+        # when they are shown
+        self.hidden_tags: tuple[Tag, ...] = ()
+        # glyph and drawn Nodes of each Cluster, keyed by id
+        self.cluster_glyphs: dict[int, tuple[int, list[TkNode]]] = {}
+        # Layout coordinates of the Node centres, for the scrollregion
+        self.layout_bounds = (0, 0, 0, 0)
+        # create the items of a Layout with a few Tcl scripts instead of
+        # one call per item
+        self.batch_items = True
         self.logger = getLogger(__name__)
 
     def resize_scrollregion(self) -> None:
-        bbox = self.bbox('all')
-        if bbox is None:
-            return
-        min_x, min_y, max_x, max_y = bbox
-        min_x -= 100
-        min_y -= 100
-        max_x += 100
-        max_y += 100
-        self.configure(scrollregion=(min_x, min_y, max_x, max_y))
+        x_0, y_0, x_1, y_1 = self.layout_bounds
+        min_x, min_y = self.layout_to_canvas(x_0, y_0)
+        max_x, max_y = self.layout_to_canvas(x_1, y_1)
+        self.configure(scrollregion=(min_x - 100, min_y - 100,
+                                     max_x + 100, max_y + 100))
 
     def reset(self) -> None:
+        self.reset_input()
         self.delete('all')
         self.current_zoom = 1.0
-        self.nodes.clear()
+        self.origin = (0.0, 0.0)
+        self.tk_nodes.clear()
+        self.links.clear()
         self.character_flags.clear()
+        self.highlights = HighlightState()
+        self.drawn_nodes = 0
+        self.hidden_tags = ()
+        self.cluster_glyphs.clear()
+
+    def canvas_to_layout(self, x: float, y: float) -> tuple[float, float]:
+        origin_x, origin_y = self.origin
+        return ((x - origin_x) / self.current_zoom,
+                (y - origin_y) / self.current_zoom)
+
+    def layout_to_canvas(self, x: float, y: float) -> tuple[float, float]:
+        origin_x, origin_y = self.origin
+        return (x * self.current_zoom + origin_x,
+                y * self.current_zoom + origin_y)
 
-    def get_bbox_centre(self, item: int) -> tuple[float, float]:
-        x0, y0, x1, y1 = self.bbox(item)
-        return (x0 + x1) / 2, (y0 + y1) / 2
+    def get_nearest_index(self, x: float, y: float) -> int | None:
+        node, _ = self.find_nearest_node(x, y)
+        return None if node is None else node.index
 
+    def find_nearest_node(self,
+                          x: float,
+                          y: float,
+                          ) -> tuple[TkNode | None, float]:
+        """Return the drawn Node nearest to the canvas coordinates and its
+        distance in Layout units.
+        """
+        index, distance = self.layout.spatial_index.nearest_node(
+            *self.canvas_to_layout(x, y), self.tk_nodes.__contains__)
+        if index is None:
+            return None, distance
+        return self.tk_nodes[index], distance
+
+    @profiled()
     def draw_layout(self, layout: Layout) -> None:
-        layout = copy.deepcopy(layout)
         self.reset()
-        for link in layout.links:
-            if link.centre_node is None:
-                self.create_line(link.node_1.x, link.node_1.y,
-                                 link.node_2.x, link.node_2.y,
-                                 width=LINK_WIDTH, tags=Tag.LINK)
+        self.layout = layout
+        self.layout_bounds = layout.arrays.get_bounds()
+        self.overlay = LayoutOverlay(layout)
+        self.stats = StatTotals(self.overlay)
+        batch = ItemBatch(self, self.batch_items)
+        links = []
+        geometry = layout.link_geometry
+        for index in range(len(layout.links)):
+            if not geometry.arc[index]:
+                links.append(batch.create(
+                    'line', geometry.x_1[index], geometry.y_1[index],
+                    geometry.x_2[index], geometry.y_2[index],
+                    width=LINK_WIDTH, tags=Tag.LINK))
                 continue
-            r = dist((link.node_1.x, link.node_1.y),
-                     (link.centre_node.x, link.centre_node.y))
-            angle_1 = round(link.angle_1)
-            angle_2 = round(link.angle_2)
-            start = min(angle_1, angle_2)
-            extent = max(angle_1, angle_2) - start
-            if extent >= 180:
-                start = max(angle_1, angle_2)
-                extent = 360 - extent
-            self.create_arc(
-                link.centre_node.x - r, link.centre_node.y - r,
-                link.centre_node.x + r, link.centre_node.y + r,
-                style='arc', start=start, extent=extent, width=LINK_WIDTH,
-                tags=Tag.LINK)
-
-        tk_nodes = []
-        tk_nodes_actions = []
-        for node in layout.nodes:
-            if node.content is None:
+            x, y = geometry.centre_x[index], geometry.centre_y[index]
+            r = geometry.radius[index]
+            links.append(batch.create(
+                'arc', x - r, y - r, x + r, y + r, style='arc',
+                start=geometry.start[index], extent=geometry.extent[index],
+                width=LINK_WIDTH, tags=Tag.LINK))
+
+        layout_placements = self.label_placements.get(id(layout))
+        if layout_placements is not None and layout_placements[0] is layout:
+            self.label_solver = solve_labels(
+                self.overlay, self.get_label_size,
+                placements=layout_placements[1])
+        else:
+            self.label_solver = solve_labels(self.overlay, self.get_label_size)
+            self.label_placements[id(layout)] = (
+                layout, dict(self.label_solver.placements))
+        placements = self.label_solver.placements
+
+        nodes = []
+        for index, node in enumerate(layout.nodes):
+            content = self.overlay.get_content(index)
+            if content is None:
                 continue
-            if node.content.appearance_type is AppearanceType.EMPTY_NODE:
-                r = CIRCLE_RADIUS * EMPTY_NODE_CIRCLE_SCALE
-            else:
-                r = CIRCLE_RADIUS
-            circle_tag = self.create_oval(
-                node.x - r, node.y - r, node.x + r, node.y + r,
+            r = get_circle_radius(content)
+            circle = batch.create(
+                'oval', node.x - r, node.y - r, node.x + r, node.y + r,
                 width=CIRCLE_OUTLINE_WIDTH, fill=self.off_color,
                 tags=Tag.NODE_CIRCLE)
-            if node.content.appearance:
-                coords = [(x + node.x - r, y + node.y - r)
-                          for x, y in node.content.appearance]
-                polygon_tag = self.create_polygon(*coords, fill='#ffffff')
+            if content.appearance:
+                coords = get_appearance_coords(content, node.x - r, node.y - r)
+                polygon = batch.create(
+                    'polygon', *coords, fill='#ffffff', tags=Tag.NODE_ICON)
             else:
-                polygon_tag = None
-            text_tag = self.create_text(
-                node.x, node.y, text=node.content.display_name,
+                polygon = None
+            dx, dy, _ = placements.get(index, (0, 0, False))
+            text = batch.create(
+                'text', node.x + dx, node.y + dy, text=content.display_name,
                 fill=self.off_color, tags=Tag.NODE_TEXT,
                 font=(self.font_family, self.font_size, 'bold'))
-            tk_node = TkNode(node, circle_tag, polygon_tag, text_tag)
-            if node.content.appearance_type in ACTIONS:
-                tk_nodes_actions.append(tk_node)
-            else:
-                tk_nodes.append(tk_node)
-            self.nodes[circle_tag] = tk_node
-            self.nodes[polygon_tag] = tk_node
-            self.nodes[text_tag] = tk_node
+            nodes.append((node, index, content, circle, polygon, text))
 
-        # raise all the texts above the last polygon drawn
-        self.tag_raise(Tag.NODE_TEXT, polygon_tag)
+        items = batch.run()
+        self.links.extend(items[link] for link in links)
+        for node, index, content, circle, polygon, text in nodes:
+            polygon_tag = None if polygon is None else items[polygon]
+            tk_node = TkNode(node, index, content, items[circle],
+                             polygon_tag, items[text])
+            self.tk_nodes[index] = tk_node
 
-        for node in tk_nodes_actions:
-            self.reposition_text(node)
-        for node in tk_nodes:
-            self.reposition_text(node)
+        self.drawn_nodes = to_bitset(self.tk_nodes)
+        # raise all the texts above the Node icons
+        self.tag_raise(Tag.NODE_TEXT, Tag.NODE_ICON)
 
+        for index, (_, _, leader) in placements.items():
+            if leader:
+                self.create_leader_line(self.tk_nodes[index])
+
+        self.update_level_of_detail()
         self.resize_scrollregion()
+        self.update_stats()
         self.logger.info('Changed Layout')
 
-    def reposition_text(self, node: TkNode) -> None:
-        if node.line is not None:
-            self.delete(node.line)
-            self.nodes.pop(node.line)
-            node.line = None
-        if node.node.content.display_name == '':
-            return
-        items_to_ignore = {node.text}
-        centre_x, centre_y = self.get_bbox_centre(node.circle)
-        text_centre_x, text_centre_y = self.get_bbox_centre(node.text)
-        self.move(node.text, centre_x - text_centre_x, centre_y - text_centre_y)
-        x0, y0, x1, y1 = self.bbox(node.text)
-        # bounding box size is not the actual visual size of the text
-        # removing a couple of units from each side as a workaround
-        e = 2 * self.current_zoom
-        for r, angle in product(range(20, 1000, 2), range(45, 360 + 45, 45)):
-            x = r * self.current_zoom * cos(radians(angle))
-            y = r * self.current_zoom * sin(radians(angle))
-            items_overlapping = self.find_overlapping(x0 + x + e, y0 + y + e,
-                                                      x1 + x - e, y1 + y - e)
-            if set(items_overlapping) <= items_to_ignore:
-                self.move(node.text, x, y)
-                break
-        if node.node.content.appearance_type not in ACTIONS:
-            return
-        if r < CIRCLE_RADIUS * 2 * self.current_zoom:
-            return
-        text_centre = self.get_bbox_centre(node.text)
-        color = self.itemcget(node.text, 'fill')
+    def get_scene(self) -> Scene:
+        """Return the current state of the canvas in Layout coordinates."""
+        scene = Scene(self.overlay, dict(self.label_solver.placements))
+        scene.highlighted_nodes.update(iter_bits(self.highlights.get_nodes()))
+        for index, node in self.tk_nodes.items():
+            if node.big_circle is not None:
+                scene.rings[index] = self.itemcget(node.big_circle, 'fill')
+        for color, links in self.highlights.links.items():
+            for index in iter_bits(links):
+                scene.link_colors[index] = color
+        flags = {id(f): f for f in self.character_flags.values()}
+        for flag in flags.values():
+            scene.flags.append(CharacterFlag(
+                *self.canvas_to_layout(*self.coords(flag.text)),
+                self.itemcget(flag.text, 'text'),
+                self.itemcget(flag.rectangle, 'fill'), flag.node_index))
+        return scene
+
+    def get_node_radius(self, node: TkNode) -> float:
+        """Radius of everything drawn for a Node, at zoom 1.0."""
+        if node.big_circle is not None:
+            r = get_ring_radius(node.content)
+        else:
+            r = get_circle_radius(node.content)
+        return r + CIRCLE_OUTLINE_WIDTH / 2
+
+    def get_label_size(self, text: str) -> tuple[float, float]:
+        """Size of a Node label at zoom 1.0."""
+        if text not in self.label_sizes:
+            self.label_sizes[text] = (self.label_font.measure(text),
+                                      self.label_font.metrics('linespace'))
+        return self.label_sizes[text]
+
+    def create_leader_line(self, node: TkNode) -> None:
+        dx, dy, _ = self.label_solver.placements[node.index]
+        x, y = node.node.x, node.node.y
         line_tag = self.create_line(
-            centre_x, centre_y, *text_centre, fill=color,
-            tags=Tag.NODE_LINE)
+            *self.layout_to_canvas(x, y),
+            *self.layout_to_canvas(x + dx, y + dy),
+            fill=self.get_node_color(node), tags=Tag.NODE_LINE,
+            state=self.get_state(Tag.NODE_LINE))
         if node.big_circle is not None:
             self.tag_lower(line_tag, node.big_circle)
         else:
             self.tag_lower(line_tag, node.circle)
         node.line = line_tag
-        self.nodes[line_tag] = node
 
-    def edit_node(self, event: tk.Event) -> None:
-        x, y = self.canvasx(event.x), self.canvasy(event.y)
-        item_tag = self.find_closest(x, y)[0]  # returns a tuple with 1 item
-        if item_tag not in self.nodes:
-            self.logger.info(f'No Node found near ({x},{y})')
-            return
-        node = self.nodes[item_tag]
-        if event.keysym not in KEY_TO_APPEARANCE_TYPE:
-            self.logger.info(f'No Node Type found for key {event.keysym}')
+    @profiled()
+    def reposition_text(self, node: TkNode) -> None:
+        if node.line is not None:
+            self.delete(node.line)
+            node.line = None
+        self.label_solver.set_node_radius(
+            node.index, self.get_node_radius(node))
+        if node.content.display_name == '':
+            self.label_solver.set_label_size(node.index, None)
+            self.label_solver.remove_label(node.index)
             return
-        appearance_type = KEY_TO_APPEARANCE_TYPE[event.keysym]
-        if appearance_type is AppearanceType.L_1_LOCK:
-            match node.node.content.appearance_type:
-                case AppearanceType.L_1_LOCK:
-                    appearance_type = AppearanceType.L_2_LOCK
-                case AppearanceType.L_2_LOCK:
-                    appearance_type = AppearanceType.L_3_LOCK
-                case AppearanceType.L_3_LOCK:
-                    appearance_type = AppearanceType.L_4_LOCK
-                case _:
-                    appearance_type = AppearanceType.L_1_LOCK
-        if node.node.content.appearance_type is appearance_type:
-            index = NODE_TYPES.index(node.node.content) + 1
-            node_types = chain(islice(NODE_TYPES, index, None), NODE_TYPES)
+        self.label_solver.set_label_size(
+            node.index, self.get_label_size(node.content.display_name))
+        if node.content.appearance_type in ACTIONS:
+            leader_distance = LEADER_DISTANCE
         else:
-            node_types = NODE_TYPES
-        for node_type in node_types:
-            if node_type.appearance_type is appearance_type:
-                new_content = node_type
-                break
-        if node.node.content is node_type:
+            leader_distance = None
+        dx, dy, leader = self.label_solver.place(node.index, leader_distance)
+        self.coords(node.text, *self.layout_to_canvas(
+            node.node.x + dx, node.node.y + dy))
+        if leader:
+            self.create_leader_line(node)
+
+    @profiled()
+    def apply_edit(self) -> None:
+        index, keysym, presses = self.pending_edit
+        self.pending_edit = None
+        node = self.tk_nodes[index]
+        old_content = new_content = node.content
+        for _ in range(presses):
+            new_content = get_next_content(
+                new_content, KEY_TO_APPEARANCE_TYPE[keysym])
+        if node.content is new_content:
             return
-        if (node.node.content.appearance_type == AppearanceType.EMPTY_NODE
-                or new_content.appearance_type == AppearanceType.EMPTY_NODE):
-            if node.node.content.appearance_type == AppearanceType.EMPTY_NODE:
-                scale = 1 / EMPTY_NODE_CIRCLE_SCALE
-            else:
-                scale = EMPTY_NODE_CIRCLE_SCALE
-            centre = self.get_bbox_centre(node.circle)
-            self.scale(node.circle, *centre, scale, scale)
-            if node.big_circle is not None:
-                self.scale(node.big_circle, *centre, scale, scale)
+        node.content = new_content
+        self.place_circles(node)
         self.itemconfigure(node.text, text=new_content.display_name)
-        if self.itemcget(node.circle, 'fill') != self.off_color:
+        if self.highlights.is_node_highlighted(node.index):
             self.itemconfigure(node.circle, fill=new_content.color)
             self.itemconfigure(node.text, fill=new_content.color)
             if node.line is not None:
                 self.itemconfigure(node.line, fill=new_content.color)
         if node.polygon is not None:
             self.delete(node.polygon)
-            self.nodes.pop(node.polygon)
         if new_content.appearance:
-            x0, y0, *_ = self.coords(node.circle)
-            coords = [(x * self.current_zoom + x0,
-                       y * self.current_zoom + y0)
-                      for x, y in new_content.appearance]
-            polygon = self.create_polygon(*coords, fill='#ffffff')
+            polygon = self.create_polygon(
+                *self.get_icon_coords(node), fill='#ffffff',
+                tags=Tag.NODE_ICON, state=self.get_state(Tag.NODE_ICON))
             self.tag_lower(polygon, node.text)
             node.polygon = polygon
-            self.nodes[polygon] = node
         else:
             node.polygon = None
-        node.node.content = new_content
+        self.overlay.set_content(node.index, new_content)
+        self.stats.update_node(node.index, old_content, new_content)
+        self.update_stats()
         self.reposition_text(node)
-        self.logger.info(f'Edited {node.node}')
+        self.update_cluster_glyph(node.node.cluster)
+        self.logger.info(f'Edited {node}')
 
-    def on_scrollwheel(self, event: tk.Event) -> None:
-        if event.delta > 0:
-            zoom_level = self.current_zoom + ZOOM_STEP
+    def get_icon_coords(self, node: TkNode) -> list[float]:
+        r = get_circle_radius(node.content)
+        x, y = self.layout_to_canvas(node.node.x - r, node.node.y - r)
+        return get_appearance_coords(node.content, x, y, self.current_zoom)
+
+    def place_circles(self, node: TkNode) -> None:
+        """Set the coordinates of the circle and ring of a Node from its
+        content and the current zoom.
+        """
+        x, y = self.layout_to_canvas(node.node.x, node.node.y)
+        r = get_circle_radius(node.content) * self.current_zoom
+        self.coords(node.circle, x - r, y - r, x + r, y + r)
+        if node.big_circle is not None:
+            r = get_ring_radius(node.content) * self.current_zoom
+            self.coords(node.big_circle, x - r, y - r, x + r, y + r)
+
+    def get_state(self, tag: Tag) -> str:
+        """State for new items with `tag` at the current level of detail."""
+        return 'hidden' if tag in self.hidden_tags else 'normal'
+
+    def get_hidden_tags(self) -> tuple[Tag, ...]:
+        # rounded, the zoom is changed in steps that don't add up exactly
+        zoom = round(self.current_zoom, 2)
+        if zoom < self.cluster_zoom:
+            return (*DETAIL_TAGS, *CLUSTER_TAGS)
+        if zoom < self.detail_zoom:
+            return DETAIL_TAGS
+        return ()
+
+    def update_level_of_detail(self) -> None:
+        """Hide or show the items that are not needed at the current zoom."""
+        hidden_tags = self.get_hidden_tags()
+        if hidden_tags == self.hidden_tags:
+            return
+        shown_tags = [t for t in self.hidden_tags if t not in hidden_tags]
+        for tag in hidden_tags:
+            if tag not in self.hidden_tags:
+                self.itemconfigure(tag, state='hidden')
+        self.hidden_tags = hidden_tags
+        if shown_tags:
+            self.place_node_items(shown_tags)
+            for tag in shown_tags:
+                self.itemconfigure(tag, state='normal')
+        if Tag.NODE_CIRCLE in hidden_tags:
+            self.draw_cluster_glyphs()
+        elif self.cluster_glyphs:
+            self.delete(Tag.CLUSTER)
+            self.cluster_glyphs.clear()
+
+    def place_node_items(self, tags: list[Tag]) -> None:
+        """Set the coordinates of the Node items with `tags` from the
+        Layout, they were not scaled while hidden.
+        """
+        for node in self.tk_nodes.values():
+            if Tag.NODE_CIRCLE in tags:
+                self.place_circles(node)
+            if Tag.NODE_ICON in tags and node.polygon is not None:
+                self.coords(node.polygon, *self.get_icon_coords(node))
+            placement = self.label_solver.placements.get(node.index)
+            if placement is None:
+                continue
+            dx, dy, _ = placement
+            x, y = node.node.x, node.node.y
+            if Tag.NODE_TEXT in tags:
+                self.coords(node.text, *self.layout_to_canvas(x + dx, y + dy))
+            if Tag.NODE_LINE in tags and node.line is not None:
+                self.coords(node.line, *self.layout_to_canvas(x, y),
+                            *self.layout_to_canvas(x + dx, y + dy))
+        if Tag.NODE_TEXT in tags:
+            self.itemconfigure(Tag.NODE_TEXT, font=(
+                self.font_family, int(self.font_size * self.current_zoom)))
+
+    def draw_cluster_glyphs(self) -> None:
+        """Draw one circle around the drawn Nodes of each Cluster."""
+        members: dict[int, list[TkNode]] = {}
+        for node in self.tk_nodes.values():
+            members.setdefault(id(node.node.cluster), []).append(node)
+        for key, cluster_nodes in members.items():
+            x = sum(n.node.x for n in cluster_nodes) / len(cluster_nodes)
+            y = sum(n.node.y for n in cluster_nodes) / len(cluster_nodes)
+            r = max(hypot(n.node.x - x, n.node.y - y)
+                    for n in cluster_nodes) + CIRCLE_RADIUS
+            x_0, y_0 = self.layout_to_canvas(x - r, y - r)
+            x_1, y_1 = self.layout_to_canvas(x + r, y + r)
+            glyph = self.create_oval(
+                x_0, y_0, x_1, y_1, width=CIRCLE_OUTLINE_WIDTH,
+                tags=Tag.CLUSTER)
+            self.cluster_glyphs[key] = glyph, cluster_nodes
+            self.update_cluster_glyph(cluster_nodes[0].node.cluster)
+        if self.cluster_glyphs:
+            self.tag_lower(Tag.CLUSTER, Tag.NODE_CIRCLE)
+
+    def update_cluster_glyph(self, cluster: Cluster) -> None:
+        """Color a Cluster glyph like most of its highlighted Nodes."""
+        if id(cluster) not in self.cluster_glyphs:
+            return
+        glyph, cluster_nodes = self.cluster_glyphs[id(cluster)]
+        highlighted = self.highlights.get_nodes()
+        colors = Counter(n.content.color for n in cluster_nodes
+                         if highlighted >> n.index & 1)
+        if colors:
+            color = colors.most_common(1)[0][0]
         else:
-            zoom_level = max(self.current_zoom - ZOOM_STEP, ZOOM_MIN, 0.1)
-        self.set_zoom(zoom_level, event)
+            color = self.off_color
+        self.itemconfigure(glyph, fill=color)
+
+    def update_cluster_glyphs(self) -> None:
+        for _, cluster_nodes in self.cluster_glyphs.values():
+            self.update_cluster_glyph(cluster_nodes[0].node.cluster)
 
+    @profiled()
     def set_zoom(self,
                  zoom_level: float,
                  event: tk.Event | None = None,
@@ -262,10 +576,17 @@ class TkSphereGrid(tk.Canvas):
         scale_factor = zoom_level / self.current_zoom
         if event is not None:
             x, y = self.canvasx(event.x), self.canvasy(event.y)
-            self.scale('all', x, y, scale_factor, scale_factor)
         else:
-            self.scale('all', 0, 0, scale_factor, scale_factor)
-        self.resize_scrollregion()
+            x, y = 0, 0
+        if self.hidden_tags:
+            # tag search expression, everything that is not hidden
+            visible = f'!({'||'.join(self.hidden_tags)})'
+        else:
+            visible = 'all'
+        self.scale(visible, x, y, scale_factor, scale_factor)
+        origin_x, origin_y = self.origin
+        self.origin = (x + (origin_x - x) * scale_factor,
+                       y + (origin_y - y) * scale_factor)
         self.current_zoom *= scale_factor
         self.itemconfigure(
             Tag.LINK, width=LINK_WIDTH * self.current_zoom
@@ -273,78 +594,148 @@ class TkSphereGrid(tk.Canvas):
         self.itemconfigure(
             Tag.HIGHLIGHTED_LINK, width=LINK_WIDTH * 2 * self.current_zoom
         )
-        self.itemconfigure(
-            Tag.NODE_TEXT,
-            font=(self.font_family, int(self.font_size * self.current_zoom)))
+        if Tag.NODE_TEXT not in self.hidden_tags:
+            self.itemconfigure(
+                Tag.NODE_TEXT,
+                font=(self.font_family,
+                      int(self.font_size * self.current_zoom)))
         self.itemconfigure(
             Tag.FLAG_TEXT,
             font=(self.font_family, int(self.font_size * 2 * self.current_zoom)))
         self.itemconfigure(
             Tag.FLAG_LINE, width=LINK_WIDTH * self.current_zoom
         )
+        self.update_level_of_detail()
+        self.resize_scrollregion()
         self.logger.info(f'Set zoom to {self.current_zoom:.0%}')
 
-    def highlight_all(self, _: tk.Event | None = None) -> None:
-        for node in self.nodes.values():
-            self.itemconfigure(node.circle, fill=node.node.content.color)
-            self.itemconfigure(node.text, fill=node.node.content.color)
+    def get_node_color(self, node: TkNode) -> str:
+        if self.highlights.is_node_highlighted(node.index):
+            return node.content.color
+        return self.off_color
+
+    def color_nodes(self, bitset: int) -> None:
+        """Color the Nodes in `bitset` from the highlight state, with a
+        single Tcl script.
+        """
+        highlighted = self.highlights.get_nodes()
+        nodes = [self.tk_nodes[i]
+                 for i in iter_bits(bitset & self.drawn_nodes)]
+        updates = []
+        for node in nodes:
+            if highlighted >> node.index & 1:
+                options = {'fill': node.content.color}
+            else:
+                options = {'fill': self.off_color}
+            updates.append((node.circle, options))
+            updates.append((node.text, options))
             if node.line is not None:
-                self.itemconfigure(node.line, fill=node.node.content.color)
+                updates.append((node.line, options))
+        configure_items(self, updates)
+        clusters = {id(n.node.cluster): n.node.cluster for n in nodes}
+        for cluster in clusters.values():
+            self.update_cluster_glyph(cluster)
+
+    def color_links(self, bitset: int) -> None:
+        """Color the Links in `bitset` from the highlight state, with a
+        single Tcl script.
+        """
+        arc = self.layout.link_geometry.arc
+        link_width = LINK_WIDTH * self.current_zoom
+        updates = []
+        for index in iter_bits(bitset):
+            color = self.highlights.get_link_character(index)
+            if color is None:
+                options = {'width': link_width, 'tags': Tag.LINK}
+                color = LINK_COLOR
+            else:
+                options = {'width': link_width * 2,
+                           'tags': Tag.HIGHLIGHTED_LINK}
+            options['outline' if arc[index] else 'fill'] = color
+            updates.append((self.links[index], options))
+        configure_items(self, updates)
+
+    def query(self) -> NodeQuery:
+        """Query over the Nodes shown, its `mask` can be highlighted."""
+        return NodeQuery(self.layout, self.overlay)
+
+    def highlight_nodes(self, bitset: int, character: str = '') -> None:
+        self.color_nodes(self.highlights.add_nodes(character, bitset))
+        self.update_stats()
+
+    def turn_off_nodes(self, bitset: int) -> None:
+        self.color_nodes(self.highlights.remove_nodes(bitset))
+        self.update_stats()
+
+    def update_stats(self) -> None:
+        """Count the Nodes highlighted by every character as its path."""
+        for character, bitset in self.highlights.nodes.items():
+            self.stats.set_group(character, bitset)
+        for listener in self.stats_listeners:
+            listener(self.stats)
+
+    def select_region(self, name: str, bitset: int) -> None:
+        """Count the stats of the Nodes in `bitset` as the region `name`,
+        like the mask of a `query`.
+        """
+        self.stats.set_group(name, bitset)
+        self.update_stats()
+
+    def set_links_character(self, bitset: int, character: str | None) -> None:
+        """Highlight the Links in `bitset` with the color of `character`,
+        turn them off if None.
+        """
+        self.color_links(self.highlights.set_links(character, bitset))
+
+    def highlight_route(self, route: Route, character: str) -> None:
+        """Draw `route` as the path of `character`: its start and targets
+        are highlighted and the Links it moves along take its color.
+        """
+        path_links = self.layout.graph.get_path_links(route.path)
+        self.highlight_nodes(
+            to_bitset([route.path[0], *route.order]), character)
+        self.set_links_character(to_bitset(path_links), character)
+        self.logger.info(f'Highlighted a Route of {route.cost} moves')
+
+    def highlight_all(self, _: tk.Event | None = None) -> None:
+        self.highlight_nodes(self.drawn_nodes)
         self.logger.info('Highlighted all Nodes')
 
     def turn_off_all(self, _: tk.Event | None = None) -> None:
+        self.highlights.remove_nodes(self.drawn_nodes)
+        # everything changes, cheaper by tag than by item
         self.itemconfigure(Tag.NODE_CIRCLE, fill=self.off_color)
         self.itemconfigure(Tag.NODE_TEXT, fill=self.off_color)
         self.itemconfigure(Tag.NODE_LINE, fill=self.off_color)
+        self.update_cluster_glyphs()
+        self.update_stats()
         self.logger.info('Turned off all Nodes')
 
+    @profiled()
     def highlight_nearest(self, event: tk.Event):
         x, y = self.canvasx(event.x), self.canvasy(event.y)
-        item_tag = self.find_closest(x, y)[0]  # returns a tuple with 1 item
         color = KEY_TO_CHAR_COLOR[event.keysym]
-        if item_tag in self.nodes:
-            node = self.nodes[item_tag]
-            if self.itemcget(node.circle, 'fill') == self.off_color:
-                self.itemconfigure(node.circle, fill=node.node.content.color)
-                self.itemconfigure(node.text, fill=node.node.content.color)
-                if node.line is not None:
-                    self.itemconfigure(node.line, fill=node.node.content.color)
-                self.logger.info(f'Highlighted {node.node}')
+        node, node_distance = self.find_nearest_node(x, y)
+        link_index, link_distance = self.layout.spatial_index.nearest_link(
+            *self.canvas_to_layout(x, y))
+        # distance from the outline of the circle, like find_closest
+        if node is not None and node_distance - CIRCLE_RADIUS <= link_distance:
+            if self.highlights.is_node_highlighted(node.index):
+                self.turn_off_nodes(1 << node.index)
+                self.logger.info(f'Turned off {node}')
             else:
-                self.itemconfigure(node.circle, fill=self.off_color)
-                self.itemconfigure(node.text, fill=self.off_color)
-                if node.line is not None:
-                    self.itemconfigure(node.line, fill=self.off_color)
-                self.logger.info(f'Turned off {node.node}')
+                self.highlight_nodes(1 << node.index, color)
+                self.logger.info(f'Highlighted {node}')
             return
-        elif self.type(item_tag) == 'arc':  # noqa: E721
-            link_width = LINK_WIDTH * self.current_zoom
-            if self.itemcget(item_tag, 'outline') == color:
-                self.itemconfigure(
-                    item_tag, outline='black', width=link_width, tags=Tag.LINK
-                    )
-                self.logger.info(f'Turned off Link near ({x},{y})')
-            else:
-                self.itemconfigure(
-                    item_tag, outline=color, width=link_width * 2,
-                    tags=Tag.HIGHLIGHTED_LINK
-                    )
-                self.logger.info(f'Highlighted Link near ({x},{y})')
-        elif self.type(item_tag) == 'line':  # noqa: E721
-            link_width = LINK_WIDTH * self.current_zoom
-            if self.itemcget(item_tag, 'fill') == color:
-                self.itemconfigure(
-                    item_tag, fill='black', width=link_width, tags=Tag.LINK
-                    )
-                self.logger.info(f'Turned off Link near ({x},{y})')
-            else:
-                self.itemconfigure(
-                    item_tag, fill=color, width=link_width * 2,
-                    tags=Tag.HIGHLIGHTED_LINK
-                    )
-                self.logger.info(f'Highlighted Link near ({x},{y})')
-        else:
+        if link_index is None:
             self.logger.info(f'No item found near ({x},{y})')
+            return
+        if self.highlights.get_link_character(link_index) == color:
+            self.set_links_character(1 << link_index, None)
+            self.logger.info(f'Turned off Link near ({x},{y})')
+        else:
+            self.set_links_character(1 << link_index, color)
+            self.logger.info(f'Highlighted Link near ({x},{y})')
 
     def add_character_flag(self, event: tk.Event) -> None:
         x, y = self.canvasx(event.x), self.canvasy(event.y)
@@ -367,18 +758,18 @@ class TkSphereGrid(tk.Canvas):
             font=(self.font_family, int(self.font_size * 2 * self.current_zoom)))
         coords = self.bbox(text_tag)
         rectangle_tag = self.create_rectangle(
-            *coords, fill=color, outline=color)
+            *coords, fill=color, outline=color, tags=Tag.FLAG_RECTANGLE)
         self.tag_lower(rectangle_tag, text_tag)
-        big_circles = self.find_withtag(Tag.NODE_BIG_CIRCLE)
-        if big_circles:
-            distances = {dist(self.get_bbox_centre(bc), (x, y)): bc
-                         for bc in big_circles}
-            item_tag = distances[min(distances)]
-            node = self.nodes[item_tag]
-            centre = self.get_bbox_centre(node.circle)
-            rectangle_centre = self.get_bbox_centre(rectangle_tag)
+        ring_nodes = {i for i, n in self.tk_nodes.items()
+                      if n.big_circle is not None}
+        index, _ = self.layout.spatial_index.nearest_ring(
+            *self.canvas_to_layout(x, y), ring_nodes)
+        if index is not None:
+            node = self.tk_nodes[index]
+            centre = self.layout_to_canvas(node.node.x, node.node.y)
+            # the text and the rectangle are centered on (x, y)
             line_tag = self.create_line(
-                *centre, *rectangle_centre, tags=Tag.FLAG_LINE,
+                *centre, x, y, tags=Tag.FLAG_LINE,
                 width=LINK_WIDTH * self.current_zoom, fill=color
                 )
             if node.big_circle is not None:
@@ -387,7 +778,8 @@ class TkSphereGrid(tk.Canvas):
                 self.tag_lower(line_tag, node.circle)
         else:
             line_tag = None
-        tk_character_flag = TkCharacterFlag(rectangle_tag, text_tag, line_tag)
+        tk_character_flag = TkCharacterFlag(
+            rectangle_tag, text_tag, line_tag, index)
         self.character_flags[rectangle_tag] = tk_character_flag
         self.character_flags[text_tag] = tk_character_flag
         msg = f'Created Character Flag @ ({x}, {y})'
@@ -398,39 +790,37 @@ class TkSphereGrid(tk.Canvas):
 
     def add_character_circle(self, event: tk.Event) -> None:
         x, y = self.canvasx(event.x), self.canvasy(event.y)
-        item_tag = self.find_closest(x, y)[0]  # returns a tuple with 1 item
-        if item_tag not in self.nodes:
+        node, _ = self.find_nearest_node(x, y)
+        if node is None:
             self.logger.info(f'No Node found near ({x},{y})')
             return
-        node = self.nodes[item_tag]
         if node.big_circle is not None:
             self.delete(node.big_circle)
-            self.nodes.pop(node.big_circle)
             node.big_circle = None
-            self.logger.info(f'Removed Character Ring from {node.node}')
+            self.label_solver.set_node_radius(
+                node.index, self.get_node_radius(node))
+            self.logger.info(f'Removed Character Ring from {node}')
             return
         color = KEY_TO_CHAR_COLOR[event.keysym.lower()]
         name = KEY_TO_CHAR_NAME[event.keysym.lower()]
-        d = (BIG_CIRCLE_RADIUS - CIRCLE_RADIUS) * self.current_zoom
-        if node.node.content.appearance_type is AppearanceType.EMPTY_NODE:
-            d *= EMPTY_NODE_CIRCLE_SCALE
-        x0, y0, x1, y1 = self.coords(node.circle)
         big_circle = self.create_oval(
-            x0 - d, y0 - d, x1 + d, y1 + d, fill=color, outline=color,
-            tags=Tag.NODE_BIG_CIRCLE)
+            0, 0, 0, 0, fill=color, outline=color, tags=Tag.NODE_BIG_CIRCLE,
+            state=self.get_state(Tag.NODE_BIG_CIRCLE))
         self.tag_lower(big_circle, node.circle)
-        self.nodes[big_circle] = node
         node.big_circle = big_circle
-        self.logger.info(f'Added Character Ring ({name}) to {node.node}')
+        self.place_circles(node)
+        self.label_solver.set_node_radius(
+            node.index, self.get_node_radius(node))
+        self.logger.info(f'Added Character Ring ({name}) to {node}')
 
 
-CIRCLE_RADIUS = 20
-CIRCLE_OUTLINE_WIDTH = 2
-BIG_CIRCLE_RADIUS = CIRCLE_RADIUS + 4
-EMPTY_NODE_CIRCLE_SCALE = 0.5
-LINK_WIDTH = 4
 ZOOM_STEP = 0.1
 ZOOM_MIN = 0.1
+DETAIL_ZOOM = 0.4
+CLUSTER_ZOOM = 0.2
+# hidden below DETAIL_ZOOM and below CLUSTER_ZOOM
+DETAIL_TAGS = (Tag.NODE_TEXT, Tag.NODE_ICON, Tag.NODE_LINE)
+CLUSTER_TAGS = (Tag.NODE_CIRCLE, Tag.NODE_BIG_CIRCLE)
 
 KEY_TO_CHAR_COLOR = {
     'a': '#45b6ff',
@@ -471,9 +861,3 @@ KEY_TO_APPEARANCE_TYPE = {
     # 'y': AppearanceType.L_3_LOCK,
     # 'y': AppearanceType.L_4_LOCK,
 }
-ACTIONS = {
-    AppearanceType.WHITE_MAGIC,
-    AppearanceType.BLACK_MAGIC,
-    AppearanceType.SKILL,
-    AppearanceType.SPECIAL,
-}
@@ -4,8 +4,21 @@ import tkinter as tk
 class TkStatusLabel(tk.Label):
     def __init__(self, parent: tk.Widget, *args, **kwargs) -> None:
         super().__init__(parent, *args, **kwargs)
+        self.msg = ''
+        self.timing = ''
         self.update('OK')
 
     def update(self, msg: str) -> None:
-        text = f'Status: {msg}'
+        self.msg = msg
+        self.show()
+
+    def show_timing(self, timing: str) -> None:
+        """Show the timing of the last operation next to the message."""
+        self.timing = timing
+        self.show()
+
+    def show(self) -> None:
+        text = f'Status: {self.msg}'
+        if self.timing:
+            text += f' ({self.timing})'
         self.configure(text=text)
@@ -0,0 +1,208 @@
+import tkinter as tk
+from collections.abc import Collection, Sequence
+
+from PIL import Image, ImageTk
+
+from .data.node_types import get_appearance_coords, get_node_types
+from .render import BIG_ITEM_PADDING, get_flag_size, get_label_size
+from .scene import (CIRCLE_OUTLINE_WIDTH, OFF_COLOR, CharacterFlag,
+                    get_circle_radius, get_ring_radius)
+from .tiles import Bbox, TileKey, TilePyramid, get_level
+from .tkscenespheregrid import TkSceneSphereGrid
+from .tkspheregrid import KEY_TO_CHAR_NAME, ZOOM_MIN, ZOOM_STEP
+
+
+class TkTiledSphereGrid(TkSceneSphereGrid):
+    """Shows a Layout as image tiles rendered in the background by a
+    TilePyramid, so the canvas only holds the visible tiles.
+
+    After a change the tiles are rendered again and, until they are ready,
+    the changed Nodes are drawn on top of them as regular canvas items.
+    """
+    def __init__(self, parent: tk.Widget, *args, **kwargs) -> None:
+        self.pyramid: TilePyramid | None = None
+        # canvas item and image of the tiles on screen, the PhotoImages
+        # must be referenced for as long as they are shown
+        self.tile_items: dict[
+            TileKey, tuple[int, ImageTk.PhotoImage, Image.Image]] = {}
+        # canvas items of the Nodes changed after their tiles were rendered
+        self.live_items: dict[int, list[int]] = {}
+        # id of the scheduled check for rendered tiles, only while the
+        # pyramid has work or Nodes are drawn over old tiles
+        self.tiles_after_id: str | None = None
+        super().__init__(parent, *args, **kwargs)
+
+    def get_label_size(self, text: str) -> tuple[float, float]:
+        return get_label_size(text)
+
+    def get_flag_size(self, text: str) -> tuple[float, float]:
+        return get_flag_size(text)
+
+    def reset(self) -> None:
+        super().reset()
+        if self.tiles_after_id is not None:
+            self.after_cancel(self.tiles_after_id)
+            self.tiles_after_id = None
+        self.tile_items.clear()
+        self.live_items.clear()
+        if self.pyramid is not None:
+            self.pyramid.close()
+
+    def show_scene(self) -> None:
+        # measure every text up front, so that the fonts are never used
+        # by the Tk thread while the worker draws with them
+        for node_type in get_node_types():
+            get_label_size(node_type.display_name)
+        for name in KEY_TO_CHAR_NAME.values():
+            get_flag_size(name)
+        self.pyramid = TilePyramid(self.scene)
+
+    def watch_tiles(self) -> None:
+        if self.tiles_after_id is None:
+            self.tiles_after_id = self.after(
+                TILES_INTERVAL, self.collect_tiles)
+
+    def collect_tiles(self) -> None:
+        """Show the tiles rendered since the last call, Tk calls are only
+        safe from this thread. Stops once the pyramid is idle.
+        """
+        self.tiles_after_id = None
+        if self.pyramid is None:
+            return
+        # checked before collecting, so that the last tiles are shown
+        # before the Nodes drawn over them are removed
+        idle = self.pyramid.is_idle()
+        if self.pyramid.collect():
+            self.update_view()
+        if idle:
+            self.remove_live_items()
+        else:
+            self.watch_tiles()
+
+    def update_view(self) -> None:
+        level = get_level(self.current_zoom)
+        visible_bbox = self.get_visible_bbox()
+        visible = self.pyramid.get_keys(level, visible_bbox)
+        for key in [k for k in self.tile_items if k not in visible]:
+            self.delete(self.tile_items.pop(key)[0])
+        tile_size = self.pyramid.tile_size
+        for key in visible:
+            tile = self.pyramid.get(key)
+            if tile is None:
+                continue
+            shown = self.tile_items.get(key)
+            if shown is not None:
+                if shown[2] is tile.image:
+                    continue
+                self.delete(shown[0])
+            _, column, row = key
+            photo = ImageTk.PhotoImage(tile.image)
+            origin_x, origin_y = self.origin
+            item = self.create_image(
+                origin_x + column * tile_size, origin_y + row * tile_size,
+                image=photo, anchor='nw')
+            self.tag_lower(item)
+            self.tile_items[key] = item, photo, tile.image
+        # the tiles around the view and the ones of the next zoom levels
+        # are rendered ahead, in case they are needed next
+        around = self.get_visible_bbox(tile_size)
+        keys = [*visible, *self.pyramid.get_keys(level, around)]
+        for zoom in (level + ZOOM_STEP, level - ZOOM_STEP):
+            if zoom >= ZOOM_MIN:
+                keys.extend(self.pyramid.get_keys(
+                    get_level(zoom), visible_bbox))
+        self.pyramid.request(keys)
+        self.watch_tiles()
+
+    def redraw(self) -> None:
+        for item, *_ in self.tile_items.values():
+            self.delete(item)
+        self.tile_items.clear()
+        for index in list(self.live_items):
+            self.draw_live_node(index)
+        self.update_view()
+
+    def refresh(self, bboxes: Sequence[Bbox] | None = None) -> None:
+        """Render again the tiles that overlap `bboxes`, all if None."""
+        self.pyramid.update(self.scene, bboxes)
+        self.update_view()
+
+    def refresh_all(self) -> None:
+        for index in list(self.live_items):
+            self.draw_live_node(index)
+        self.refresh()
+
+    def refresh_node(self, index: int, old_bbox: Bbox | None = None) -> None:
+        bbox = self.get_node_bbox(index)
+        if old_bbox is not None:
+            bbox = (min(bbox[0], old_bbox[0]), min(bbox[1], old_bbox[1]),
+                    max(bbox[2], old_bbox[2]), max(bbox[3], old_bbox[3]))
+        self.draw_live_node(index)
+        self.refresh([bbox])
+
+    def refresh_changes(self,
+                        nodes: Collection[int],
+                        links: Collection[int] = (),
+                        ) -> None:
+        if len(nodes) + len(links) > MAX_REFRESH_BBOXES:
+            self.refresh_all()
+            return
+        bboxes = [self.get_node_bbox(index) for index in nodes]
+        bboxes.extend(self.get_link_bbox(index) for index in links)
+        for index in nodes:
+            if index in self.live_items:
+                self.draw_live_node(index)
+        self.refresh(bboxes)
+
+    def refresh_link(self, index: int) -> None:
+        self.refresh([self.get_link_bbox(index)])
+
+    def refresh_flag(self, flag: CharacterFlag) -> None:
+        self.refresh([self.get_flag_bbox(flag)])
+
+    def get_link_bbox(self, index: int) -> Bbox:
+        _, (x_0, y_0, x_1, y_1) = self.layout.spatial_index.get_link_shape(
+            index)
+        return (x_0 - BIG_ITEM_PADDING, y_0 - BIG_ITEM_PADDING,
+                x_1 + BIG_ITEM_PADDING, y_1 + BIG_ITEM_PADDING)
+
+    def draw_live_node(self, index: int) -> None:
+        for item in self.live_items.pop(index, ()):
+            self.delete(item)
+        content = self.overlay.get_content(index)
+        if content is None:
+            return
+        node = self.layout.nodes[index]
+        x, y = self.layout_to_canvas(node.x, node.y)
+        zoom = self.current_zoom
+        items = []
+        if index in self.scene.rings:
+            r = get_ring_radius(content) * zoom
+            color = self.scene.rings[index]
+            items.append(self.create_oval(
+                x - r, y - r, x + r, y + r, fill=color, outline=color))
+        if index in self.scene.highlighted_nodes:
+            color = content.color
+        else:
+            color = OFF_COLOR
+        r = get_circle_radius(content) * zoom
+        items.append(self.create_oval(
+            x - r, y - r, x + r, y + r, fill=color,
+            width=CIRCLE_OUTLINE_WIDTH * zoom))
+        if content.appearance:
+            coords = get_appearance_coords(content, x - r, y - r, zoom)
+            items.append(self.create_polygon(*coords, fill='#ffffff'))
+        self.live_items[index] = items
+
+    def remove_live_items(self) -> None:
+        for items in self.live_items.values():
+            for item in items:
+                self.delete(item)
+        self.live_items.clear()
+
+
+# milliseconds between checks for rendered tiles
+TILES_INTERVAL = 15
+# changed Nodes and Links above which all the tiles are rendered again,
+# checking every cached tile against their areas would take longer
+MAX_REFRESH_BBOXES = 64
@@ -0,0 +1,313 @@
+import tkinter as tk
+from collections.abc import Collection
+from dataclasses import dataclass
+from tkinter import font
+
+from .data.node_types import get_appearance_coords
+from .scene import (CIRCLE_OUTLINE_WIDTH, FONT_SIZE, LINK_COLOR, LINK_WIDTH,
+                    OFF_COLOR, CharacterFlag, get_circle_radius,
+                    get_ring_radius)
+from .tiles import Bbox
+from .tkscenespheregrid import TkSceneSphereGrid
+from .tkspheregrid import Tag
+
+
+@dataclass
+class NodeItems:
+    circle: int
+    text: int
+    polygon: int | None = None
+    big_circle: int | None = None
+    line: int | None = None
+
+
+class TkVirtualSphereGrid(TkSceneSphereGrid):
+    """Creates canvas items only for the Nodes and Links near the visible
+    part of the canvas.
+
+    Items that leave the view are hidden and kept in a pool, to be reused
+    for the ones that enter it.
+    """
+    def __init__(self, parent: tk.Widget, *args, **kwargs) -> None:
+        super().__init__(parent, *args, **kwargs)
+        # hidden items, by item type and tag
+        self.pool: dict[tuple[str, Tag], list[int]] = {}
+        self.node_items: dict[int, NodeItems] = {}
+        self.link_items: dict[int, int] = {}
+        self.flag_items: list[int] = []
+        self.new_items = False
+        family = font.nametofont('TkDefaultFont').cget('family')
+        # the items use these fonts, so they follow their size
+        self.label_font = font.Font(
+            family=family, size=FONT_SIZE, weight='bold')
+        self.flag_font = font.Font(family=family, size=FONT_SIZE * 2)
+        # fonts used only to measure at zoom 1.0
+        self.label_measure_font = self.label_font.copy()
+        self.flag_measure_font = self.flag_font.copy()
+        self.text_sizes: dict[tuple[str, str], tuple[float, float]] = {}
+
+    def get_text_size(self,
+                      text: str,
+                      text_font: font.Font,
+                      ) -> tuple[float, float]:
+        key = text, str(text_font)
+        if key not in self.text_sizes:
+            self.text_sizes[key] = (text_font.measure(text),
+                                    text_font.metrics('linespace'))
+        return self.text_sizes[key]
+
+    def get_label_size(self, text: str) -> tuple[float, float]:
+        return self.get_text_size(text, self.label_measure_font)
+
+    def get_flag_size(self, text: str) -> tuple[float, float]:
+        return self.get_text_size(text, self.flag_measure_font)
+
+    def reset(self) -> None:
+        super().reset()
+        self.pool.clear()
+        self.node_items.clear()
+        self.link_items.clear()
+        self.flag_items.clear()
+        self.update_fonts()
+
+    def show_scene(self) -> None:
+        pass
+
+    def acquire(self, item_type: str, tag: Tag) -> int:
+        """Return a hidden item from the pool, or a new one."""
+        items = self.pool.get((item_type, tag))
+        if items:
+            item = items.pop()
+            self.itemconfigure(item, state='normal')
+            return item
+        self.new_items = True
+        match item_type:
+            case 'arc':
+                return self.create_arc(0, 0, 0, 0, style='arc', tags=tag)
+            case 'line':
+                return self.create_line(0, 0, 0, 0, tags=tag)
+            case 'oval':
+                return self.create_oval(0, 0, 0, 0, tags=tag)
+            case 'polygon':
+                return self.create_polygon(0, 0, 0, 0, 0, 0, tags=tag)
+            case 'rectangle':
+                return self.create_rectangle(0, 0, 0, 0, tags=tag)
+            case 'text':
+                return self.create_text(0, 0, tags=tag)
+        raise ValueError(f'Unknown item type {item_type}')
+
+    def release(self, item: int | None, item_type: str, tag: Tag) -> None:
+        if item is None:
+            return
+        self.itemconfigure(item, state='hidden')
+        self.pool.setdefault((item_type, tag), []).append(item)
+
+    def update_fonts(self) -> None:
+        self.label_font.configure(
+            size=max(1, int(FONT_SIZE * self.current_zoom)))
+        self.flag_font.configure(
+            size=max(1, int(FONT_SIZE * 2 * self.current_zoom)))
+
+    def update_view(self) -> None:
+        width = max(self.winfo_width(), self.winfo_height())
+        bbox = self.get_visible_bbox(width * VIEW_MARGIN)
+        spatial_index = self.layout.spatial_index
+        nodes = {i for i in spatial_index.nodes_in_bbox(*bbox)
+                 if self.overlay.get_content(i) is not None}
+        links = spatial_index.links_in_bbox(*bbox)
+        for index in self.node_items.keys() - nodes:
+            self.release_node(index)
+        for index in self.link_items.keys() - links:
+            self.release_link(index)
+        for index in nodes - self.node_items.keys():
+            self.place_node(index)
+        for index in links - self.link_items.keys():
+            self.place_link(index)
+        if not self.flag_items and self.scene.flags:
+            self.place_flags()
+        self.raise_layers()
+
+    def raise_layers(self) -> None:
+        """Restack the items if new ones were created since the last
+        call, reused items keep the position of their layer.
+        """
+        if not self.new_items:
+            return
+        for tag in LAYERS:
+            self.tag_raise(tag)
+        self.new_items = False
+
+    def redraw(self) -> None:
+        self.update_fonts()
+        for index in self.node_items:
+            self.place_node(index)
+        for index in self.link_items:
+            self.place_link(index)
+        self.place_flags()
+        self.update_view()
+
+    def refresh_all(self) -> None:
+        for index in self.node_items:
+            self.place_node(index)
+
+    def refresh_node(self, index: int, old_bbox: Bbox | None = None) -> None:
+        if index in self.node_items:
+            self.place_node(index)
+        self.raise_layers()
+
+    def refresh_changes(self,
+                        nodes: Collection[int],
+                        links: Collection[int] = (),
+                        ) -> None:
+        for index in nodes:
+            if index in self.node_items:
+                self.place_node(index)
+        for index in links:
+            if index in self.link_items:
+                self.place_link(index)
+        self.raise_layers()
+
+    def refresh_link(self, index: int) -> None:
+        if index in self.link_items:
+            self.place_link(index)
+
+    def refresh_flag(self, flag: CharacterFlag) -> None:
+        self.place_flags()
+        self.raise_layers()
+
+    def place_node(self, index: int) -> None:
+        """Create or update the items of a Node from the Scene."""
+        content = self.overlay.get_content(index)
+        node = self.layout.nodes[index]
+        zoom = self.current_zoom
+        items = self.node_items.get(index)
+        if items is None:
+            items = NodeItems(self.acquire('oval', Tag.NODE_CIRCLE),
+                              self.acquire('text', Tag.NODE_TEXT))
+            self.node_items[index] = items
+        if index in self.scene.highlighted_nodes:
+            color = content.color
+        else:
+            color = OFF_COLOR
+        x, y = self.layout_to_canvas(node.x, node.y)
+        r = get_circle_radius(content) * zoom
+        self.coords(items.circle, x - r, y - r, x + r, y + r)
+        self.itemconfigure(
+            items.circle, fill=color, width=CIRCLE_OUTLINE_WIDTH)
+
+        if content.appearance:
+            if items.polygon is None:
+                items.polygon = self.acquire('polygon', Tag.NODE_ICON)
+            self.coords(items.polygon, *get_appearance_coords(
+                content, x - r, y - r, zoom))
+            self.itemconfigure(items.polygon, fill='#ffffff')
+        else:
+            self.release(items.polygon, 'polygon', Tag.NODE_ICON)
+            items.polygon = None
+
+        if index in self.scene.rings:
+            if items.big_circle is None:
+                items.big_circle = self.acquire('oval', Tag.NODE_BIG_CIRCLE)
+            ring_color = self.scene.rings[index]
+            r = get_ring_radius(content) * zoom
+            self.coords(items.big_circle, x - r, y - r, x + r, y + r)
+            self.itemconfigure(
+                items.big_circle, fill=ring_color, outline=ring_color)
+        else:
+            self.release(items.big_circle, 'oval', Tag.NODE_BIG_CIRCLE)
+            items.big_circle = None
+
+        dx, dy, leader = self.label_solver.placements.get(
+            index, (0, 0, False))
+        label_x, label_y = self.layout_to_canvas(node.x + dx, node.y + dy)
+        self.coords(items.text, label_x, label_y)
+        self.itemconfigure(items.text, text=content.display_name,
+                           fill=color, font=self.label_font)
+        if leader:
+            if items.line is None:
+                items.line = self.acquire('line', Tag.NODE_LINE)
+            self.coords(items.line, x, y, label_x, label_y)
+            self.itemconfigure(items.line, fill=color, width=1)
+        else:
+            self.release(items.line, 'line', Tag.NODE_LINE)
+            items.line = None
+
+    def release_node(self, index: int) -> None:
+        items = self.node_items.pop(index)
+        self.release(items.circle, 'oval', Tag.NODE_CIRCLE)
+        self.release(items.text, 'text', Tag.NODE_TEXT)
+        self.release(items.polygon, 'polygon', Tag.NODE_ICON)
+        self.release(items.big_circle, 'oval', Tag.NODE_BIG_CIRCLE)
+        self.release(items.line, 'line', Tag.NODE_LINE)
+
+    def get_link_type(self, index: int) -> str:
+        if self.layout.link_geometry.arc[index]:
+            return 'arc'
+        return 'line'
+
+    def place_link(self, index: int) -> None:
+        item_type = self.get_link_type(index)
+        item = self.link_items.get(index)
+        if item is None:
+            item = self.acquire(item_type, Tag.LINK)
+            self.link_items[index] = item
+        if index in self.scene.link_colors:
+            color = self.scene.link_colors[index]
+            width = LINK_WIDTH * 2 * self.current_zoom
+        else:
+            color = LINK_COLOR
+            width = LINK_WIDTH * self.current_zoom
+        shape = self.layout.link_geometry.get_shape(index)
+        if item_type == 'line':
+            self.coords(item, *self.layout_to_canvas(*shape[:2]),
+                        *self.layout_to_canvas(*shape[2:]))
+            self.itemconfigure(item, fill=color, width=width)
+            return
+        centre_x, centre_y, radius, start, extent = shape
+        self.coords(item, *self.layout_to_canvas(
+                        centre_x - radius, centre_y - radius),
+                    *self.layout_to_canvas(
+                        centre_x + radius, centre_y + radius))
+        self.itemconfigure(item, start=start, extent=extent, outline=color,
+                           width=width)
+
+    def release_link(self, index: int) -> None:
+        self.release(self.link_items.pop(index), self.get_link_type(index),
+                     Tag.LINK)
+
+    def place_flags(self) -> None:
+        """Draw all the Character Flags again, there are only a few."""
+        for item in self.flag_items:
+            self.delete(item)
+        self.flag_items.clear()
+        for flag in self.scene.flags:
+            x, y = self.layout_to_canvas(flag.x, flag.y)
+            text = self.create_text(x, y, text=flag.name, font=self.flag_font,
+                                    tags=Tag.FLAG_TEXT)
+            self.flag_items.append(text)
+            self.flag_items.append(self.create_rectangle(
+                *self.bbox(text), fill=flag.color, outline=flag.color,
+                tags=Tag.FLAG_RECTANGLE))
+            if flag.node_index is not None:
+                node = self.layout.nodes[flag.node_index]
+                self.flag_items.append(self.create_line(
+                    *self.layout_to_canvas(node.x, node.y), x, y,
+                    width=LINK_WIDTH * self.current_zoom, fill=flag.color,
+                    tags=Tag.FLAG_LINE))
+        self.new_items = True
+
+
+# extra part of the canvas drawn around the view, relative to its size
+VIEW_MARGIN = 0.5
+# from the bottom
+LAYERS = (
+    Tag.LINK,
+    Tag.FLAG_LINE,
+    Tag.NODE_BIG_CIRCLE,
+    Tag.NODE_LINE,
+    Tag.NODE_CIRCLE,
+    Tag.NODE_ICON,
+    Tag.NODE_TEXT,
+    Tag.FLAG_RECTANGLE,
+    Tag.FLAG_TEXT,
+)
@@ -0,0 +1,199 @@
+import argparse
+import json
+import os
+import struct
+import sys
+import time
+from collections.abc import Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import chain
+
+from .data.cluster import CLUSTER_LENGTH
+from .data.content import (parse_node_contents, read_node_contents_csv,
+                           read_node_contents_dat)
+from .data.layout import parse_layout, read_layout_csv, read_layout_dat
+from .data.link import LINK_LENGTH, LINK_STRUCT, NO_INDEX
+from .data.node import NODE_LENGTH, NODE_STRUCT
+from .data.node_types import get_node_types
+
+
+def read_layout_files(layout_path: str,
+                      node_contents_path: str,
+                      ) -> tuple[bytes, bytes, bytes, bytes]:
+    if '{}' in layout_path:
+        records = read_layout_csv(layout_path)
+    else:
+        records = read_layout_dat(layout_path)
+    if node_contents_path.endswith('.csv'):
+        node_contents = read_node_contents_csv(node_contents_path)
+    else:
+        node_contents = read_node_contents_dat(node_contents_path)
+    return *records, node_contents
+
+
+def check_records(cluster_data: bytes,
+                  node_data: bytes,
+                  link_data: bytes,
+                  node_contents_data: bytes,
+                  ) -> tuple[list[dict], list[dict]]:
+    errors = []
+    warnings = []
+    for name, data, length in (('clusters', cluster_data, CLUSTER_LENGTH),
+                               ('nodes', node_data, NODE_LENGTH),
+                               ('links', link_data, LINK_LENGTH)):
+        if len(data) % length:
+            errors.append({'check': 'record_length', 'table': name,
+                           'length': len(data), 'record_length': length})
+    if errors:
+        return errors, warnings
+
+    node_type_count = len(get_node_types())
+    cluster_count = len(cluster_data) // CLUSTER_LENGTH
+    nodes = list(NODE_STRUCT.iter_unpack(node_data))
+    links = list(LINK_STRUCT.iter_unpack(link_data))
+
+    def add_issue(issues: list[dict], check: str, items: list[int]) -> None:
+        if items:
+            issues.append({'check': check, 'count': len(items),
+                           'items': items})
+
+    add_issue(errors, 'node_cluster_index_out_of_range',
+              [i for i, n in enumerate(nodes) if n[3] >= cluster_count])
+    add_issue(errors, 'link_node_index_out_of_range',
+              [i for i, (node_1, node_2, _) in enumerate(links)
+               if node_1 >= len(nodes) or node_2 >= len(nodes)])
+    add_issue(errors, 'link_centre_index_out_of_range',
+              [i for i, (_, _, centre) in enumerate(links)
+               if centre != NO_INDEX and centre >= len(nodes)])
+    add_issue(warnings, 'original_content_index_out_of_range',
+              [i for i, n in enumerate(nodes) if n[2] >= node_type_count])
+    add_issue(warnings, 'content_index_out_of_range',
+              [i for i, c in enumerate(node_contents_data)
+               if c >= node_type_count])
+    if len(node_contents_data) != len(nodes):
+        warnings.append({'check': 'node_contents_count',
+                         'nodes': len(nodes),
+                         'node_contents': len(node_contents_data)})
+    linked_nodes = set()
+    for node_1, node_2, _ in links:
+        linked_nodes.add(node_1)
+        linked_nodes.add(node_2)
+    add_issue(warnings, 'orphan_nodes',
+              [i for i in range(len(nodes)) if i not in linked_nodes])
+    return errors, warnings
+
+
+def validate_layout(layout_path: str, node_contents_path: str) -> dict:
+    report = {'layout': layout_path, 'node_contents': node_contents_path}
+    try:
+        datas = read_layout_files(layout_path, node_contents_path)
+    except (OSError, ValueError, struct.error) as error:
+        errors = [{'check': 'read', 'error': str(error)}]
+        warnings = []
+    else:
+        errors, warnings = check_records(*datas)
+    if not errors:
+        try:
+            parse_layout(*datas[:3], parse_node_contents(datas[3]))
+        except Exception as error:
+            errors.append({'check': 'parse', 'error': repr(error)})
+    report['valid'] = not errors
+    report['errors'] = errors
+    report['warnings'] = warnings
+    return report
+
+
+def read_manifest(file_path: str) -> Iterator[tuple[str, str] | dict]:
+    """Yield the (layout, node contents) paths of each non-empty line,
+    or an invalid report for the lines that are not a pair of paths.
+    """
+    directory = os.path.dirname(os.path.abspath(file_path))
+    with open(file_path, encoding='utf-8') as file_object:
+        for line_number, line in enumerate(file_object, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            paths = [p.strip() for p in line.split(',')]
+            if len(paths) != 2 or not all(paths):
+                error = {'check': 'manifest_line', 'line': line_number,
+                         'error': f'expected "LAYOUT,NODE_CONTENTS", got '
+                                  f'{line!r}'}
+                yield {'manifest': file_path, 'valid': False,
+                       'errors': [error], 'warnings': []}
+                continue
+            layout_path, node_contents_path = paths
+            yield (os.path.join(directory, layout_path),
+                   os.path.join(directory, node_contents_path))
+
+
+def validate_layouts(pairs: Iterable[tuple[str, str] | dict],
+                     max_workers: int | None = None,
+                     ) -> Iterator[dict]:
+    """Validate the layouts in a process pool, yielding reports as soon as
+    they are ready. Only a few jobs per worker are queued at a time.
+    Reports already in `pairs`, like the ones of bad manifest lines, are
+    yielded as they are.
+    """
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    max_pending = max_workers * 4
+    pairs = iter(pairs)
+    with ProcessPoolExecutor(max_workers) as executor:
+        pending = set()
+        while True:
+            for pair in pairs:
+                if isinstance(pair, dict):
+                    yield pair
+                    continue
+                layout_path, node_contents_path = pair
+                pending.add(executor.submit(
+                    validate_layout, os.path.abspath(layout_path),
+                    os.path.abspath(node_contents_path)))
+                if len(pending) >= max_pending:
+                    break
+            if not pending:
+                return
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='python -m ffx_sphere_grid_viewer.validate',
+        description='Validate custom Sphere Grid layout files and print one '
+                    'JSON report per layout.')
+    parser.add_argument(
+        'paths', nargs='*', metavar='LAYOUT NODE_CONTENTS',
+        help='pairs of layout (dat01.dat or "{}_dat01.csv") and node '
+             'contents (dat09.dat or dat09.csv) files')
+    parser.add_argument(
+        '-f', '--file', help='file with one "LAYOUT,NODE_CONTENTS" per line')
+    parser.add_argument(
+        '-j', '--jobs', type=int, default=None,
+        help='number of worker processes (default: number of CPUs)')
+    args = parser.parse_args(argv)
+    if not args.paths and args.file is None:
+        parser.error('give some layout and node contents paths or --file')
+    if len(args.paths) % 2:
+        parser.error('layout and node contents paths must come in pairs')
+    if args.jobs is not None and args.jobs < 1:
+        parser.error('--jobs must be at least 1')
+    pairs = zip(args.paths[::2], args.paths[1::2])
+    if args.file is not None:
+        pairs = chain(pairs, read_manifest(args.file))
+
+    start = time.perf_counter()
+    total = invalid = 0
+    for report in validate_layouts(pairs, args.jobs):
+        total += 1
+        invalid += not report['valid']
+        print(json.dumps(report), flush=True)
+    summary = {'total': total, 'invalid': invalid,
+               'seconds': round(time.perf_counter() - start, 3)}
+    print(json.dumps({'summary': summary}), flush=True)
+    return 1 if invalid else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
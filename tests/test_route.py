@@ -0,0 +1,54 @@
+import contextlib
+import io
+import unittest
+
+from ffx_sphere_grid_viewer.route import main
+
+
+def run_main(*argv: str) -> tuple[int, str, str]:
+    """Exit status, standard output and standard error of `main`."""
+    stdout, stderr = io.StringIO(), io.StringIO()
+    with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+        try:
+            status = main([*argv, '-j', '1'])
+        except SystemExit as exit:
+            status = exit.code
+    return status, stdout.getvalue(), stderr.getvalue()
+
+
+class TestRouteMain(unittest.TestCase):
+    def test_unknown_target_name(self) -> None:
+        status, stdout, stderr = run_main('0', 'Nonexistent')
+        self.assertEqual(status, 2)
+        self.assertEqual(stdout, '')
+        self.assertIn('no Node has the content Nonexistent', stderr)
+
+    def test_negative_target_index(self) -> None:
+        status, stdout, stderr = run_main('0', '-3')
+        self.assertEqual(status, 2)
+        self.assertEqual(stdout, '')
+        self.assertIn('target -3 is not a Node index', stderr)
+
+    def test_target_index_past_the_last_node(self) -> None:
+        status, _, stderr = run_main('0', '99999')
+        self.assertEqual(status, 2)
+        self.assertIn('target 99999 is not a Node index', stderr)
+
+    def test_start_out_of_range(self) -> None:
+        status, _, stderr = run_main('5000', '3')
+        self.assertEqual(status, 2)
+        self.assertIn('start must be a Node index', stderr)
+
+    def test_target_name(self) -> None:
+        status, stdout, _ = run_main('0', 'auto-life')
+        self.assertEqual(status, 0)
+        self.assertNotIn('"order": []', stdout)
+
+    def test_route(self) -> None:
+        status, stdout, _ = run_main('0', '3', '5')
+        self.assertEqual(status, 0)
+        self.assertIn('"order": [3, 5]', stdout.splitlines()[-1])
+
+
+if __name__ == '__main__':
+    unittest.main()
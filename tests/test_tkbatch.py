@@ -0,0 +1,51 @@
+import tkinter as tk
+import unittest
+
+from ffx_sphere_grid_viewer.tkbatch import quote_tcl_word
+
+
+class TestQuoteTclWord(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tcl = tk.Tcl()
+
+    def parse(self, value: object) -> object:
+        """Read back the word for `value` with Tcl, splitting it like
+        `value` is nested.
+        """
+        return self.split(self.tcl.eval(f'set x {quote_tcl_word(value)}'),
+                          value)
+
+    def split(self, word: str, value: object) -> object:
+        if not isinstance(value, (tuple, list)):
+            return word
+        return tuple(self.split(element, v) for element, v in zip(
+            self.tcl.splitlist(word), value, strict=True))
+
+    def test_words(self) -> None:
+        for value in ['a', 'a b', '', '{', 'a}', '$x [y]', 'q"', 'a\\',
+                      'a\nb', ';', 'x{y}z', 1, 2.5]:
+            with self.subTest(value=value):
+                self.assertEqual(self.parse(value), str(value))
+
+    def test_lists(self) -> None:
+        values = [
+            ('a b', ('c d', 'e')),
+            (4, 2),
+            (),
+            ('', ('',), ()),
+            ('a{', '}b', '$x [y]', 'q"', 'back\\', 'new\nline'),
+            ((('x y', ('z w', '{')),), '}'),
+            ['list', ['of', ['lists']]],
+        ]
+        for value in values:
+            with self.subTest(value=value):
+                self.assertEqual(self.parse(value), self.as_strings(value))
+
+    def as_strings(self, value: object) -> object:
+        if isinstance(value, (tuple, list)):
+            return tuple(self.as_strings(v) for v in value)
+        return str(value)
+
+
+if __name__ == '__main__':
+    unittest.main()
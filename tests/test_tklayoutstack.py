@@ -0,0 +1,58 @@
+import copy
+import tkinter as tk
+import unittest
+
+from ffx_sphere_grid_viewer.data.layout import Layout, LayoutType, get_layout
+from ffx_sphere_grid_viewer.tklayoutstack import TkLayoutStack
+
+
+class FakeCanvas(tk.Frame):
+    """Only keeps what a Sphere Grid canvas needs for the stack, the
+    edits are cleared when the Layout is drawn again.
+    """
+    def __init__(self, parent: tk.Widget, **kwargs) -> None:
+        super().__init__(parent, **kwargs)
+        self.layout: Layout | None = None
+        self.edits: dict[int, str] = {}
+
+    def draw_layout(self, layout: Layout) -> None:
+        self.layout = layout
+        self.edits.clear()
+
+    def reset(self) -> None:
+        self.edits.clear()
+
+    def resize_scrollregion(self) -> None:
+        pass
+
+
+class TestTkLayoutStack(unittest.TestCase):
+    def setUp(self) -> None:
+        try:
+            self.root = tk.Tk()
+        except tk.TclError:
+            self.skipTest('no display')
+        self.root.withdraw()
+        self.stack = TkLayoutStack(self.root, FakeCanvas, lambda _: None)
+
+    def tearDown(self) -> None:
+        self.root.destroy()
+
+    def test_edits_survive_cycling_all_layouts(self) -> None:
+        custom = copy.deepcopy(get_layout(LayoutType.ORIGINAL))
+        layouts = [custom, *(get_layout(t) for t in LayoutType)]
+        canvases = []
+        for i, layout in enumerate(layouts):
+            self.stack.draw_layout(layout)
+            self.stack.canvas.edits[0] = f'edit {i}'
+            canvases.append(self.stack.canvas)
+        for _ in range(2):
+            for i, layout in enumerate(layouts):
+                self.stack.draw_layout(layout)
+                self.assertIs(self.stack.canvas, canvases[i])
+                self.assertEqual(self.stack.canvas.edits, {0: f'edit {i}'})
+        self.assertTrue(all(c.winfo_exists() for c in canvases))
+
+
+if __name__ == '__main__':
+    unittest.main()